@@ -3,18 +3,18 @@
 ユーザーの書いたマクロを取得して
 マクロを動かす関数にわたす
 """
-import ctypes
+
+import argparse
 import os
+import signal
 import sys
 import time
 from logging import getLogger
 from pathlib import Path
-from typing import Callable
+from typing import Callable, Optional
 
 import measurement_manager as mm
 import variables
-import win32api
-import win32con
 from define import read_deffile
 from macro import get_macro, get_macro_recalculate, get_macro_split, get_macropath
 from macro_grammar import macro_grammer_check
@@ -27,10 +27,17 @@ from log import set_user_log, setlog
 logger = getLogger(__name__)
 
 
-def main() -> None:
+def main(
+    defpath: Optional[str] = None,
+    macropath: Optional[str] = None,
+    headless: bool = False,
+) -> None:
     """
     測定マクロを動かすための準備をするスクリプト
 
+    defpath, macropathを渡したときはダイアログを出さずにそのファイルを使う.
+    headlessのときはダイアログ, グラフのウィンドウ, コンソールからの入力を使わずに測定を最後まで動かす
+
     実装としては
 
     定義ファイル選択
@@ -44,13 +51,13 @@ def main() -> None:
     measurementManager._measure_startを実行
     """
     # 定義ファイル読み取り
-    read_deffile()
+    read_deffile(defpath)
 
     # ユーザー側にlogファイル表示
     set_user_log(USER_VARIABLES.TEMPDIR)
 
     # マクロファイルのパスを取得
-    macropath, _, macrodir = get_macropath()
+    macropath, _, macrodir = get_macropath(macropath)
 
     # scriptsフォルダーを検索パスに追加
     # これがなくても動くっぽいけどわかりやすさのために記述
@@ -69,7 +76,7 @@ def main() -> None:
     on_forced_termination(lambda: mm.finish())
 
     # 測定開始
-    mm.start_macro(macro)
+    mm.start_macro(macro, headless=headless)
 
 
 def on_forced_termination(func: Callable[[None], None]) -> None:
@@ -99,6 +106,25 @@ def on_forced_termination(func: Callable[[None], None]) -> None:
             for i in range(100):
                 time.sleep(1)
 
+    # Windows以外ではSIGTERM(killなど)とSIGHUP(端末を閉じたとき)で終了する
+    if sys.platform != "win32":
+        main_pid = os.getpid()
+
+        def signal_handler(signum, frame):
+            # forkで作ったグラフのプロセスにもこの設定が引き継がれるので､ そちらでは普通に終了する(terminateで終われるように)
+            if os.getpid() != main_pid:
+                signal.signal(signum, signal.SIG_DFL)
+                os.kill(os.getpid(), signum)
+                return
+            func()
+
+        signal.signal(signal.SIGTERM, signal_handler)
+        signal.signal(signal.SIGHUP, signal_handler)
+        return
+
+    import win32api  # Windowsでしか使えないのでここで読み込む
+    import win32con
+
     # イベントが起きたときにconsoleCtrHandlerを実行するようにPCに命令
     win32api.SetConsoleCtrlHandler(consoleCtrHandler, True)
 
@@ -166,23 +192,49 @@ def setting() -> None:
     """変数のセット"""
     variables.init(Path.cwd())
 
-    # 簡易編集モードをOFFにするためのおまじない
-    # (簡易編集モードがONだと、画面をクリックしたときに処理が停止してしまう)
-    kernel32 = ctypes.windll.kernel32
-    # 簡易編集モードとENABLE_WINDOW_INPUT と ENABLE_VIRTUAL_TERMINAL_INPUT をOFFに
-    mode = 0xFDB7  # 16進数
-    kernel32.SetConsoleMode(kernel32.GetStdHandle(-10), mode)
+    if sys.platform == "win32":
+        import ctypes
+
+        # 簡易編集モードをOFFにするためのおまじない
+        # (簡易編集モードがONだと、画面をクリックしたときに処理が停止してしまう)
+        kernel32 = ctypes.windll.kernel32
+        # 簡易編集モードとENABLE_WINDOW_INPUT と ENABLE_VIRTUAL_TERMINAL_INPUT をOFFに
+        mode = 0xFDB7  # 16進数
+        kernel32.SetConsoleMode(kernel32.GetStdHandle(-10), mode)
 
     setlog()
 
 
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    """コマンドライン引数の解析
+
+    python MAIN.py MEAS --headless --define foo.def --macro bar.py
+    のようにするとダイアログなどを一切出さずに測定を最後まで動かせる(LinuxやCIでの動作確認, 長時間の試験用)
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "mode", nargs="?", default="", help="MEAS, SPLIT, RECALCULATEのどれか"
+    )
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        help="ダイアログ, グラフのウィンドウ, コンソールの入力を使わない",
+    )
+    parser.add_argument("--define", help="定義ファイルのパス(--headlessのときは必須)")
+    parser.add_argument("--macro", help="測定マクロのパス(--headlessのときは必須)")
+    args = parser.parse_args(argv)
+    if args.headless and (args.define is None or args.macro is None):
+        parser.error("--headlessのときは--defineと--macroを指定してください")
+    if args.headless and args.mode.upper() not in ("", "MEAS"):
+        parser.error("--headlessはMEASでのみ使えます")
+    return args
+
+
 if __name__ == "__main__":
     setting()
 
-    mode: str = ""
-    args = sys.argv
-    if len(args) > 1:
-        mode = args[1].upper()
+    args = parse_args(sys.argv[1:])
+    mode: str = "MEAS" if args.headless else args.mode.upper()
 
     # 引数によって測定モードか分割モードかを判定
     while True:
@@ -193,7 +245,7 @@ if __name__ == "__main__":
     # 処理を開始
     try:
         if mode == "MEAS":
-            main()
+            main(args.define, args.macro, headless=args.headless)
         elif mode == "SPLIT":
             split_only()
         elif mode == "RECALCULATE":
@@ -202,6 +254,9 @@ if __name__ == "__main__":
     except MyException as e:
         print("*****************Error*****************")
         print(e.message)  # MyExceptionならメッセージだけを表示
+        if args.headless:  # 入力は待たずに終了コードで知らせる
+            logger.exception("")
+            sys.exit(1)
         input("*****************Error*****************")
         print("↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓詳細↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓↓")
         logger.exception("")
@@ -209,5 +264,7 @@ if __name__ == "__main__":
     except Exception as e:
         print("*****************Error*****************")
         logger.exception("")
+        if args.headless:
+            sys.exit(1)
         # コンソールウィンドウが落ちないように入力待ちを入れる
         input("*****************Error*****************")
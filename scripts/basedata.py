@@ -2,12 +2,34 @@ from __future__ import annotations
 
 import re
 import textwrap
+from operator import attrgetter
+from types import MemberDescriptorType
 from typing import Any
 
 from utility import MyException
 
 
-class BaseData:
+class BaseDataMeta(type):
+    """BaseDataを継承したクラスの変数を__slots__にするメタクラス
+
+    __slots__はクラスが作られる前に決める必要があるので__init_subclass__ではなくここで追加する.
+    インスタンスごとの__dict__がなくなるのでupdateのたびにインスタンスを作るときの時間とメモリが減る.
+    コンストラクタを書いたクラスはデフォルト値を使えたり代入した順に並んだりするので今まで通り__dict__を使う
+    """
+
+    def __new__(mcls, name, bases, namespace, **kwargs):
+        if "__slots__" not in namespace and "__init__" not in namespace:
+            annotations = namespace.get("__annotations__", {})
+            # Noneはデフォルト値なしとして扱ってきたので消してスロットにする
+            for v in annotations:
+                if v in namespace and namespace[v] is None:
+                    del namespace[v]
+            # デフォルト値のある変数はスロットにできない(エラーは__init_subclass__で出す)
+            namespace["__slots__"] = tuple(v for v in annotations if v not in namespace)
+        return super().__new__(mcls, name, bases, namespace, **kwargs)
+
+
+class BaseData(metaclass=BaseDataMeta):
     """ユーザーマクロで使えるデータを保持するクラス
 
     利点としては
@@ -16,15 +38,20 @@ class BaseData:
     2. ラベル化の際に単位の情報も載せられる(単位はインスタンス変数と同名のクラス変数に格納)
     3. iterableなのでsave関数にそのまま渡せば展開される
     4. 自動的にdataclassになるので、コンストラクタが自動生成される
+    5. コンストラクタを自動生成したときは変数が__slots__になるので、インスタンスの生成が速くメモリも少ない
     """
 
+    __slots__ = ()
+    _fields: tuple = ()  # 変数名. 継承したクラスではアノテーションの順に並ぶ
+    _get_fields = None  # 全ての変数をまとめて取り出す関数(変数が__slots__のときだけ)
+
     class BaseDataError(MyException):
         """データを保持するクラス関係のえらー"""
 
     def __setattr__(self, __name: str, __value: Any) -> None:
         """あとから要素を追加するのを阻止"""
 
-        if __name in self.__class__.__dict__.get("__annotations__").keys():
+        if __name in self._fields:
             super().__setattr__(__name, __value)
         else:
             raise self.BaseDataError(
@@ -59,33 +86,44 @@ class BaseData:
                     'を継承したクラスの変数は、{変数名}:"[{単位}]"の形にしてください \n 例) voltage:"[mV]"  \n     loopnumber:"" (単位がないときは "" をつける)'
                 )
 
+        cls._fields = tuple(annotations.keys())
+        if "__init__" not in cls.__dict__.keys():
+            # attrgetterは変数が1つのときはタプルにせずに値を返すので揃える
+            getter = attrgetter(*cls._fields) if cls._fields else lambda self: ()
+            cls._get_fields = staticmethod(
+                getter if len(cls._fields) != 1 else lambda self: (getter(self),)
+            )
+        else:  # 親クラスのものを使わないように消す
+            cls._get_fields = None
+
         # コンストラクタが定義されてなければ自動的に定義
         if "__init__" not in cls.__dict__.keys():
             parameter_text = ""
             assign_text = ""
-            default = False
+            setters = {}
             for parameter_name in annotations.keys():
-                if cls.__dict__.get(parameter_name) is None:
+                value = cls.__dict__.get(parameter_name)
+                # スロットはデフォルト値ではない
+                if type(value) is MemberDescriptorType:
                     parameter_text += f"{parameter_name},"
                 else:
                     raise cls.BaseDataError(
                         f"{cls.__name__}クラスの変数定義の方法にエラーが存在します。\nBaseDataを継承したクラスではデフォルト値を設定することはできません。"
                     )
 
-                assign_text += f"self.{parameter_name}={parameter_name};"
+                # 変数名は決まっているので__setattr__の確認を通さずにスロットに直接書き込む
+                setters[f"_set_{parameter_name}"] = value.__set__
+                assign_text += f"_set_{parameter_name}(self,{parameter_name});"
 
             parameter_text = parameter_text[:-1]
 
             init_text = f"""
             def __init__(self,{parameter_text}):
                 {assign_text}
-                
-
-            cls.__init__ = __init__
-
             """
             init_text = textwrap.dedent(init_text)
-            exec(init_text)  # 文字列で書いたコードを実行
+            exec(init_text, setters)  # 文字列で書いたコードを実行
+            cls.__init__ = setters["__init__"]
 
         return super().__init_subclass__(**kwargs)  # これはおまじない
 
@@ -102,9 +140,19 @@ class BaseData:
         text = text[:-3]
         return text
 
+    def __values(self) -> tuple:
+        """変数の値を並べる
+
+        コンストラクタを自動生成したクラスはアノテーションの順(to_labelの列の順).
+        コンストラクタを書いたクラスは今まで通り代入した順で､ 値を入れていない変数は飛ばす
+        """
+        if self._get_fields is None:
+            return tuple(self.__dict__.values())
+        return self._get_fields(self)
+
     def __iter__(self):
         """配列として扱えるようにするための関数"""
-        yield from list(self.__dict__.values())  # 変数をリストにして返す
+        return iter(self.__values())
 
     def __str__(self) -> str:
-        return ",".join([str(s) for s in self.__dict__.values()])
+        return ",".join(map(str, self.__values()))
@@ -0,0 +1,116 @@
+"""BaseDataを継承したクラスの1行あたりの生成と展開の時間とメモリの計測
+
+updateの中で毎回データのインスタンスを作ってsaveに渡すときの処理を想定している.
+変更前(__slots__なし, インスタンスごとの__dict__)のBaseDataも同じ内容で計測して並べて表示する.
+scriptsフォルダ直下の関数を使うのでこのフォルダで実行する
+    python bench_basedata.py [行数]
+"""
+
+import sys
+import textwrap
+import time
+import tracemalloc
+
+sys.path.append("../")
+
+from basedata import BaseData
+
+
+class LegacyBaseData:
+    """変更前のBaseData(クラス定義の確認は省略). 変数はインスタンスの__dict__に入る"""
+
+    def __setattr__(self, __name, __value) -> None:
+        if __name in self.__class__.__dict__.get("__annotations__").keys():
+            super().__setattr__(__name, __value)
+        else:
+            raise AttributeError(__name)
+
+    def __init_subclass__(cls, **kwargs) -> None:
+        annotations = cls.__dict__.get("__annotations__")
+        parameter_text = ",".join(annotations.keys())
+        assign_text = "".join(f"self.{name}={name};" for name in annotations.keys())
+        init_text = f"""
+        def __init__(self,{parameter_text}):
+            {assign_text}
+
+        cls.__init__ = __init__
+        """
+        exec(textwrap.dedent(init_text))
+        return super().__init_subclass__(**kwargs)
+
+    def __iter__(self):
+        yield from list(self.__dict__.values())
+
+    def __str__(self) -> str:
+        return ",".join([str(s) for s in self.__dict__.values()])
+
+
+class Data(BaseData):
+    time: "[s]"
+    temperature: "[K]"
+    voltage: "[mV]"
+    current: "[mA]"
+    resistance: "[ohm]"
+
+
+class LegacyData(LegacyBaseData):
+    time: "[s]"
+    temperature: "[K]"
+    voltage: "[mV]"
+    current: "[mA]"
+    resistance: "[ohm]"
+
+
+def measure(name: str, func, rows: int, repeat: int = 5) -> None:
+    """repeat回実行して一番速かったときの1行あたりの時間を表示"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    print(f"{name:<40}: {best / rows * 1e9:10.1f} ns/行")
+
+
+def memory_per_row(cls, rows: int) -> float:
+    """rows個のインスタンスを保持したときの1行あたりのメモリ(byte)"""
+    tracemalloc.start()
+    data = [cls(i, 1.0, 2.0, 3.0, 4.0) for i in range(rows)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del data
+    return size / rows
+
+
+def bench(cls, suffix: str, values: list, rows: int) -> None:
+    measure(f"生成{suffix}", lambda: [cls(*v) for v in values], rows)
+    measure(
+        f"キーワード引数で生成{suffix}",
+        lambda: [
+            cls(time=t, temperature=T, voltage=V, current=I, resistance=R)
+            for t, T, V, I, R in values
+        ],
+        rows,
+    )
+    data = [cls(*v) for v in values]
+    measure(f"展開 (list){suffix}", lambda: [list(d) for d in data], rows)
+    measure(
+        f"saveと同じ文字列化{suffix}",
+        lambda: [",".join(map(str, d)) for d in data],
+        rows,
+    )
+    measure(
+        f"生成して文字列化{suffix}",
+        lambda: [",".join(map(str, cls(*v))) for v in values],
+        rows,
+    )
+    print(
+        f"{f'1行あたりのメモリ{suffix}':<40}: {memory_per_row(cls, rows):10.1f} byte/行"
+    )
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    values = [(float(i), 300.0, 1.5, 0.1, 15.0) for i in range(rows)]
+    print(f"rows: {rows}")
+    bench(LegacyData, " (変更前)", values, rows)
+    bench(Data, "", values, rows)
@@ -0,0 +1,101 @@
+"""calibration.pyのキャリブレーションファイルの読み込みと1点あたりの変換時間の計測
+
+scriptsフォルダ直下の関数を使うのでこのフォルダで実行する
+    python bench_calibration.py [点数]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+
+sys.path.append("../")
+
+import calibration
+from calibration import TMRCalibrationManager
+
+
+def make_calib_file(filepath: str, rows: int = 3000) -> None:
+    """白金測温抵抗体の校正ファイルと同じ形式(温度,抵抗値)のファイルを作る"""
+    temperature = np.linspace(4, 400, rows)
+    resistance = 100 * (1 + 3.9083e-3 * (temperature - 273.15))
+    with open(filepath, "w", encoding="utf-8") as f:
+        f.write("T [K],R [ohm]\n")
+        for t, r in zip(temperature.tolist(), resistance.tolist()):
+            f.write(f"{t},{r}\n")
+
+
+def measure(name: str, func, points: int, repeat: int = 3) -> None:
+    """repeat回実行して一番速かったときの1点あたりの時間を表示"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    if points == 0:
+        print(f"{name:<40}: {best * 1e3:10.3f} ms")
+    else:
+        print(f"{name:<40}: {best / points * 1e9:10.1f} ns/点")
+
+
+def bench_load(dirpath: str, filepath: str) -> None:
+    """キャッシュがないときとあるときのset_own_calib_fileの時間"""
+
+    def load():
+        TMRCalibrationManager().set_own_calib_file(filepath)
+
+    def load_without_cache():
+        shutil.rmtree(os.path.join(dirpath, "calibration_cache"), ignore_errors=True)
+        load()
+
+    with mock.patch.object(
+        calibration, "SHARED_VARIABLES", SimpleNamespace(TEMPDIR=Path(dirpath))
+    ):
+        measure("set_own_calib_file (キャッシュなし)", load_without_cache, 0)
+        load()
+        measure("set_own_calib_file (キャッシュあり)", load, 0)
+
+
+if __name__ == "__main__":
+    points = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    dirpath = tempfile.mkdtemp()
+    try:
+        filepath = os.path.join(dirpath, "calib.txt")
+        make_calib_file(filepath)
+        bench_load(dirpath, filepath)
+        manager = TMRCalibrationManager()
+        manager.set_own_calib_file(filepath)
+        x = np.random.default_rng(0).uniform(0, 160, points)
+        x_list = x.tolist()
+        print(f"points: {points}")
+
+        try:
+            from scipy import interpolate
+
+            data = np.loadtxt(filepath, delimiter=",", skiprows=1)
+            legacy = interpolate.interp1d(
+                data[:, 1], data[:, 0], bounds_error=False, fill_value="extrapolate"
+            )
+            measure(
+                "interp1dで1点ずつ (変更前)",
+                lambda: [legacy(v) for v in x_list],
+                points,
+            )
+        except ImportError:
+            print("scipyがないので変更前の計測は省略")
+        measure(
+            "calibration (1点ずつ)",
+            lambda: [manager.calibration(v) for v in x_list],
+            points,
+        )
+        measure(
+            "calibration_many (まとめて)", lambda: manager.calibration_many(x), points
+        )
+    finally:
+        shutil.rmtree(dirpath)
@@ -0,0 +1,74 @@
+"""measurement_managerのループの時間の集計(LoopProfiler)が1回あたりにかかる時間の計測
+
+scriptsフォルダ直下の関数を使うのでこのフォルダで実行する
+    python bench_loop_profiler.py [回数]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.append("../")
+
+from measurement_manager_support import LoopProfiler
+
+
+def measure(name: str, func, count: int, repeat: int = 5) -> float:
+    """repeat回実行して一番速かったときの1回あたりの時間(ns)を表示して返す"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    per_call = best / count * 1e9
+    print(f"{name:<40}: {per_call:10.1f} ns/回")
+    return per_call
+
+
+def timed_loop(profiler: LoopProfiler, count: int) -> None:
+    """measure_startのループと同じくupdateとsaveを時間を測りながら呼ぶ(中身は空)"""
+    record = profiler.record
+    record_iteration = profiler.record_iteration
+    perf_counter_ns = time.perf_counter_ns
+    for _ in range(count):
+        start = perf_counter_ns()
+        save_start = time.perf_counter_ns()
+        record(LoopProfiler.SAVE, time.perf_counter_ns() - save_start)
+        record_iteration(LoopProfiler.UPDATE, perf_counter_ns() - start)
+
+
+def bare_loop(count: int) -> None:
+    for _ in range(count):
+        pass
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    print(f"count: {count}")
+    profiler = LoopProfiler()
+    measure(
+        "record",
+        lambda: [profiler.record(LoopProfiler.UPDATE, 1000) for _ in range(count)],
+        count,
+    )
+    bare = measure("空のループ", lambda: bare_loop(count), count)
+    timed = measure(
+        "update+saveの計測 (csvなし)", lambda: timed_loop(LoopProfiler(), count), count
+    )
+    dirpath = tempfile.mkdtemp()
+    try:
+
+        def with_csv():
+            profiler = LoopProfiler()
+            profiler.set_csv(os.path.join(dirpath, "profile.csv"))
+            timed_loop(profiler, count)
+            profiler.close()
+
+        timed_csv = measure("update+saveの計測 (csvあり)", with_csv, count)
+    finally:
+        shutil.rmtree(dirpath)
+    print(
+        f"1回のupdateあたりの増加: csvなし {timed - bare:.1f} ns, csvあり {timed_csv - bare:.1f} ns"
+    )
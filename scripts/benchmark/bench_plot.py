@@ -0,0 +1,270 @@
+"""グラフ描画の処理時間の計測
+
+- 測定プロセスからグラフ描画プロセスへ点を渡すときの1点あたりの時間
+- 描画プロセスで線に点を追加するときの1回の更新あたりの時間
+- 点が増えたときの1フレームの描画時間(max_pointsで間引いたときとの比較)
+- flowwidthで横幅の外の点を消すときの1回あたりの時間
+- ラベルが多いときに全体を描き直す場合と線だけを描き直す(blit)場合の1回の更新あたりの時間
+- renew_intervalごとに描き直す場合とmax_fpsで点が来たら描き直す場合の遅れとCPU時間
+
+scriptsフォルダ直下の関数を使うのでこのフォルダで実行する
+    python bench_plot.py [点数]
+"""
+
+import sys
+import threading
+import time
+from multiprocessing import Lock, Manager, Value
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+sys.path.append("../")
+
+import plot
+from plot_buffer import PlotBuffer
+
+
+def measure(name: str, func, points: int) -> None:
+    start = time.perf_counter()
+    func()
+    print(f"{name:<40}: {(time.perf_counter() - start) / points * 1e6:8.2f} us/点")
+
+
+def bench_manager_list(points: int) -> None:
+    """変更前のManager().listとLockでの受け渡し"""
+    share_list = Manager().list()
+    lock = Lock()
+
+    def run():
+        for i in range(points):
+            lock.acquire()
+            share_list.append((i, i * 0.5, "default"))
+            lock.release()
+
+    measure("Manager().list + Lock (変更前)", run, points)
+
+
+def bench_plot_buffer(points: int) -> None:
+    plot_buffer = PlotBuffer(capacity=points)
+
+    def run():
+        for i in range(points):
+            plot_buffer.write(i, i * 0.5, "default")
+
+    measure("PlotBuffer.write", run, points)
+    plot_buffer.read()
+
+    # 1回のupdateで1000点のスペクトルを得る場合
+    x = np.arange(1000, dtype=np.float64)
+    y = np.sin(x)
+
+    def run_many():
+        for _ in range(points // 1000):
+            plot_buffer.write_many(x, y, "default")
+
+    measure("PlotBuffer.write_many (1000点ずつ)", run_many, points)
+    plot_buffer.close()
+
+
+def bench_line_update(total: int, per_tick: int = 100) -> None:
+    """1回の更新でper_tick点ずつ追加してtotal点になるまでの1回あたりの時間(描画時の配列変換recacheを含む)"""
+    figure, ax = plt.subplots()
+    x = np.arange(per_tick, dtype=np.float64)
+
+    (line,) = ax.plot([], [])
+    xarray, yaaray = [], []
+
+    def run_list():  # 変更前: リストに追加してリストのままset_data
+        for _ in range(total // per_tick):
+            xarray.extend(x.tolist())
+            yaaray.extend(x.tolist())
+            line.set_data(xarray, yaaray)
+            line.recache()
+
+    (line2,) = ax.plot([], [])
+    lineobj = plot.PlotWindow.LineObj(line2)
+
+    def run_lineobj():
+        for _ in range(total // per_tick):
+            lineobj.extend(x, x)
+            lineobj.update_line()
+            line2.recache()
+
+    for name, func in (
+        ("list + set_data (変更前)", run_list),
+        ("LineObj", run_lineobj),
+    ):
+        start = time.perf_counter()
+        func()
+        print(
+            f"{name + f' ({total}点まで)':<40}: {(time.perf_counter() - start) / (total // per_tick) * 1e3:8.3f} ms/回"
+        )
+    plt.close(figure)
+
+
+def bench_lod(total: int, max_points: int = 4000) -> None:
+    """total点の線に100点追加して描画し直すときの1フレームあたりの時間"""
+    rng = np.random.default_rng(0)
+    x = np.arange(total, dtype=np.float64)
+    y = np.cumsum(rng.normal(size=total))
+    for name, points in (
+        ("描画 (間引きなし)", 0),
+        (f"描画 (max_points={max_points})", max_points),
+    ):
+        figure, ax = plt.subplots()
+        (line,) = ax.plot([], [], marker=".")
+        lineobj = plot.PlotWindow.LineObj(line, max_points=points)
+        lineobj.extend(x[:-1000], y[:-1000])
+        lineobj.update_line()
+        ax.set_xlim(0, total)
+        ax.set_ylim(y.min(), y.max())
+        figure.canvas.draw()
+        start = time.perf_counter()
+        for i in range(10):
+            new = slice(total - 1000 + i * 100, total - 900 + i * 100)
+            lineobj.extend(x[new], y[new])
+            lineobj.update_line()
+            figure.canvas.draw()
+        print(
+            f"{name + f' ({total}点)':<40}: {(time.perf_counter() - start) / 10 * 1e3:8.1f} ms/フレーム"
+        )
+        plt.close(figure)
+
+
+def bench_flowwidth(total: int) -> None:
+    """total点が横幅の中にある線で100点追加するたびに横幅の外の点を消すときの1回あたりの時間"""
+    x = np.arange(total * 2, dtype=np.float64)
+
+    def legacy_cut(xarray, xmin):  # 変更前: 先頭から1点ずつ調べてリストをスライス
+        cut = 0
+        for i, xvalue in enumerate(xarray):
+            if xvalue < xmin:
+                continue
+            else:
+                cut = max(i - 1, 0)
+                break
+        return xarray[cut:]
+
+    xarray = x[:total].tolist()
+    start = time.perf_counter()
+    for i in range(100):
+        xarray.extend(x[total + i * 100 : total + (i + 1) * 100].tolist())
+        xarray = legacy_cut(xarray, xarray[-1] - total)
+    print(
+        f"{f'flowwidth (変更前) ({total}点)':<40}: {(time.perf_counter() - start) / 100 * 1e3:8.3f} ms/回"
+    )
+
+    figure, ax = plt.subplots()
+    (line,) = ax.plot([], [])
+    lineobj = plot.PlotWindow.LineObj(line)
+    lineobj.extend(x[:total], x[:total])
+    start = time.perf_counter()
+    for i in range(100):
+        new = x[total + i * 100 : total + (i + 1) * 100]
+        lineobj.extend(new, new)
+        lineobj.cut_before(new[-1] - total)
+    print(
+        f"{f'LineObj.cut_before ({total}点)':<40}: {(time.perf_counter() - start) / 100 * 1e3:8.3f} ms/回"
+    )
+    plt.close(figure)
+
+
+def bench_blit(labels: int = 22, points: int = 500) -> None:
+    """labels本の線(凡例つき)にそれぞれ1点ずつ追加して描画し直すときの1回の更新あたりの時間"""
+    rng = np.random.default_rng(0)
+    for name, blit in (("更新 (全体を描き直す)", False), ("更新 (blit)", True)):
+        plot_buffer = PlotBuffer()
+        plot_info = dict(
+            xlog=False,
+            ylog=False,
+            renew_interval=0,
+            flowwidth=0,
+            line=False,
+            legend=True,
+        )
+        window = plot.PlotWindow(plot_buffer, None, blit=blit, **plot_info)
+        # GUIのバックエンドと同じく1回の更新で全体の描画が1回になるようにする
+        plt.ioff()
+        for label in range(labels):
+            plot_buffer.write_many(np.arange(points), rng.random(points) + label, label)
+        window.renew_window()
+        window._figure.canvas.draw()
+        start = time.perf_counter()
+        for i in range(50):
+            for label in range(labels):  # 範囲の余白に収まる点を追加する
+                plot_buffer.write(points + i, label + rng.random(), label)
+            window.renew_window()
+            if not blit:
+                window._figure.canvas.draw()
+        print(
+            f"{name + f' ({labels}本)':<40}: {(time.perf_counter() - start) / 50 * 1e3:8.1f} ms/回"
+        )
+        plt.close(window._figure)
+        plot_buffer.close()
+
+
+def bench_renew_schedule(sweep: float = 1.0, idle: float = 2.0) -> None:
+    """sweep秒間5msごとに点を送ってからidle秒間何も送らないときのCPU時間と点が届いてから描かれるまでの遅れ"""
+    for name, kwargs in (
+        ("renew_interval=0.05", dict(renew_interval=0.05)),
+        ("max_fps=20, renew_interval=1", dict(renew_interval=1, max_fps=20)),
+    ):
+        plot_buffer = PlotBuffer()
+        isfinish = Value("i", 0)
+        plot_info = dict(xlog=False, ylog=False, flowwidth=0, line=False, legend=False)
+        window = plot.PlotWindow(plot_buffer, isfinish, **plot_info, **kwargs)
+        plt.ioff()
+        delays, cpu = [], {}
+        renew_window = window.renew_window
+
+        def renew_and_draw():  # 描き直した時刻と点を送った時刻(x)の差を遅れとする
+            sizes = {label: len(lineobj) for label, lineobj in window.linedict.items()}
+            renew_window()
+            window._figure.canvas.draw()
+            now = time.perf_counter()
+            for label, lineobj in window.linedict.items():
+                new = lineobj.xarray[sizes.get(label, 0) :]
+                delays.extend((now - new).tolist())
+
+        def send():
+            end = time.perf_counter() + sweep
+            while time.perf_counter() < end:
+                plot_buffer.write(time.perf_counter(), 0, "a")
+                time.sleep(0.005)
+            cpu["idle"] = time.process_time()
+            time.sleep(idle)
+            cpu["idle"] = time.process_time() - cpu["idle"]
+            isfinish.value = 1
+
+        window.renew_window = renew_and_draw
+        thread = threading.Thread(target=send)
+        start = time.process_time()
+        thread.start()
+        window.run()
+        thread.join()
+        print(
+            f"{name:<40}: 遅れ平均 {np.mean(delays) * 1e3:6.1f} ms,  最大 {np.max(delays) * 1e3:6.1f} ms,"
+            f"  CPU {time.process_time() - start:5.2f} s (点が来ない間 {cpu['idle']:5.2f} s)"
+        )
+        plt.close(window._figure)
+        plot_buffer.close()
+
+
+if __name__ == "__main__":
+    points = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print(f"points: {points}")
+    bench_manager_list(points)
+    bench_plot_buffer(points)
+    for total in (10000, 100000):
+        bench_line_update(total)
+    for total in (10000, 100000, 1000000):
+        bench_lod(total)
+    for total in (100000, 1000000):
+        bench_flowwidth(total)
+    bench_blit()
+    bench_renew_schedule()
@@ -0,0 +1,44 @@
+"""グラフ描画のプロセスを起動してから最初の点を読み出すまでの時間の計測
+
+prewarmで先にプロセスを起動しておいた場合とrun_plot_windowで起動する場合を比べる.
+Windowsと同じspawnでプロセスを起動する
+
+scriptsフォルダ直下の関数を使うのでこのフォルダで実行する
+    python bench_plot_process.py
+"""
+
+import multiprocessing
+import sys
+import time
+
+sys.path.append("../")
+
+from measurement_manager_support import PlotAgency
+
+
+def time_to_first_point(prewarm: bool) -> float:
+    """run_plot_windowを呼んでからプロットした点が描画プロセスに読み出されるまでの時間(秒)"""
+    plot_agency = PlotAgency()
+    plot_agency.set_plot_info(renew_interval=0.01)
+    if prewarm:
+        plot_agency.prewarm()
+        time.sleep(5)  # startの実行中に読み込みが終わっているとする
+    start = time.perf_counter()
+    plot_agency.run_plot_window()
+    plot_agency.plot(0, 0)
+    while plot_agency.plot_buffer.pending_count > 0:
+        time.sleep(0.001)
+    elapsed = time.perf_counter() - start
+    plot_agency.stop_renew_plot_window()
+    plot_agency.close()
+    return elapsed
+
+
+if __name__ == "__main__":
+    multiprocessing.set_start_method("spawn", force=True)
+    for name, prewarm in (
+        ("run_plot_windowで起動", False),
+        ("prewarmで起動済み", True),
+    ):
+        best = min(time_to_first_point(prewarm) for _ in range(3))
+        print(f"{name:<40}: {best * 1e3:8.1f} ms")
@@ -0,0 +1,175 @@
+"""split.pyの処理時間の計測
+
+scriptsフォルダ直下の関数を使うのでこのフォルダで実行する
+    python bench_split.py [行数]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append("../")
+
+import split
+import utility as util
+
+
+def make_tmr_file(filepath: str, rows: int, freq_num: int = 16) -> None:
+    """TMR_permittivity.pyと同じ形式(8列)の測定ファイルを作る"""
+    rng = np.random.default_rng(0)
+    t = np.arange(rows) * 0.5
+    temperature = 300 + 100 * np.sin(t / 3000) + rng.normal(0, 0.05, rows)
+    frequency = 10 ** (3 + (np.arange(rows) % freq_num) * 0.2)
+    data = np.column_stack(
+        [t, frequency, temperature] + [rng.random(rows) for _ in range(5)]
+    )
+    with open(filepath, "w", encoding="utf-8") as f:
+        f.write("s=1.0[mm2], d=0.5[mm], V=1[V]\n")
+        f.write("0:time [s],  1:frequency [Hz],  2:temperature [K],  3:...\n")
+        for row in data.tolist():
+            f.write(",".join(map(str, row)) + "\n")
+
+
+def measure(name: str, func, repeat: int = 3):
+    """repeat回実行して一番速かった時間を表示"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    print(f"{name:<40}: {best:8.3f} s")
+    return result
+
+
+def legacy_file_open(filepath: str):
+    """変更前のfile_open(ファイル全体で文字コード判別して1行ずつfloat変換)"""
+    label = ""
+    data = []
+    with open(filepath, "r", encoding=util.get_encode_type(filepath)) as file:
+        while True:
+            line_raw = file.readline()
+            line = line_raw.strip()
+            if line == "":
+                break
+            try:
+                data.append([float(s) for s in line.split(",")])
+            except Exception:
+                label += line_raw
+    return data, label
+
+
+def bench_file_open(filepath: str) -> None:
+    measure("file_open (変更前)", lambda: legacy_file_open(filepath))
+    measure("file_open", lambda: split.file_open(filepath))
+
+
+def legacy_heating_cooling_split(data, T_index, sample_and_cutout_num, step):
+    """変更前のheating_cooling_split(1点ずつリングバッファの和をとる). thresholdなしの場合"""
+    sample_num, cutout_num = sample_and_cutout_num
+    samples_hc = [
+        1 if data[i + step][T_index] - data[i][T_index] > 0 else -1
+        for i in range(sample_num)
+    ]
+    count = sample_num
+    previous_state, state, split_points_hc = -5, 0, []
+    while True:
+        sum_count = sum(samples_hc)
+        new_state = (
+            1 if sum_count > cutout_num else (-1 if sum_count < -cutout_num else 0)
+        )
+        if state != new_state:
+            if previous_state == new_state:
+                del split_points_hc[-1]
+            else:
+                if state != 0:
+                    split_points_hc.append(count)
+                if new_state != 0:
+                    split_points_hc.append(count - sample_num)
+                    previous_state = new_state
+        if count >= len(data) - step:
+            if len(split_points_hc) % 2 == 1:
+                split_points_hc.append(count)
+            break
+        state = new_state
+        temp_grad = data[count + step][T_index] - data[count][T_index]
+        samples_hc[count % sample_num] = 1 if temp_grad > 0 else -1
+        count += 1
+    return [
+        data[split_points_hc[i] : split_points_hc[i + 1]]
+        for i in range(0, len(split_points_hc), 2)
+    ]
+
+
+def bench_heating_cooling_split(data) -> None:
+    args = dict(T_index=2, sample_and_cutout_num=(150, 120), step=30)
+    data_list = data.tolist()
+    measure(
+        "heating_cooling_split (変更前)",
+        lambda: legacy_heating_cooling_split(data_list, **args),
+        repeat=1,
+    )
+    measure("heating_cooling_split", lambda: split.heating_cooling_split(data, **args))
+
+
+def legacy_create_file(filepath: str, data, label: str = "") -> None:
+    """変更前のcreate_file(文字列の+=でファイル全体を作ってから書き込む)"""
+    text = ""
+    for array1d in data:
+        temp = ""
+        for element in array1d:
+            temp += str(element) + ","
+        text += temp[:-1] + "\n"
+    with open(filepath, "w", encoding="utf-8") as f:
+        f.write(label)
+        f.write(text)
+
+
+def bench_create_file(dirpath: str, data) -> None:
+    def run(func, **kwargs):
+        path = os.path.join(dirpath, "out.txt")
+        if os.path.isfile(path):
+            os.remove(path)
+        func(path, data, label="label\n", **kwargs)
+
+    measure("create_file (変更前)", lambda: run(legacy_create_file))
+    measure("create_file", lambda: run(split.create_file))
+    measure('create_file (fmt="%.10g")', lambda: run(split.create_file, fmt="%.10g"))
+
+
+def bench_TMR_split(filepath: str) -> None:
+    args = dict(T_index=2, f_index=1, freq_num=16, step=30)
+    for name, kwargs in (
+        ("TMR_split", {}),
+        ("TMR_split (workers=4)", dict(workers=4)),
+        ("TMR_split (workers=4, use_process)", dict(workers=4, use_process=True)),
+    ):
+        folder = (
+            name.replace(" ", "").replace("(", "_").replace(")", "").replace(",", "_")
+        )
+        measure(
+            name,
+            lambda: split.TMR_split(
+                filepath, name_temperaturesplitfolder=folder, **args, **kwargs
+            ),
+            repeat=1,
+        )
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    dirpath = tempfile.mkdtemp()
+    try:
+        filepath = os.path.join(dirpath, "bench.txt")
+        make_tmr_file(filepath, rows)
+        print(f"rows: {rows}")
+        bench_file_open(filepath)
+        data = split.file_open(filepath)[0]
+        bench_heating_cooling_split(data)
+        bench_create_file(dirpath, data)
+        bench_TMR_split(filepath)
+    finally:
+        shutil.rmtree(dirpath)
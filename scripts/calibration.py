@@ -1,10 +1,14 @@
 """キャリブレーションに使う関数"""
+
+import bisect
+import hashlib
 import os
+import struct
 from logging import getLogger
 from pathlib import Path
 from typing import Callable, Optional
 
-from scipy import interpolate
+import numpy as np
 from utility import MyException, get_encode_type
 from variables import SHARED_VARIABLES
 
@@ -15,6 +19,86 @@ class CalibrationError(MyException):
     """キャリブレーション関連のエラー"""
 
 
+# キャリブレーションファイルを読み込んで並び替えた配列のキャッシュ. ヘッダーの後ろにx,yをfloat64でそのまま並べる
+CACHE_MAGIC = b"SSRCALIB1"
+# magic, 元ファイルのmtime_ns, サイズ, sha256, 行数
+CACHE_HEADER = struct.Struct("<9sqq32sq")
+
+
+def _cache_path(filepath_calib: Path) -> Optional[Path]:
+    """キャッシュファイルのパス. 共有TEMPフォルダがまだ設定されていなければNone"""
+    try:
+        tempdir = SHARED_VARIABLES.TEMPDIR
+    except ValueError:
+        return None
+    key = hashlib.sha1(str(filepath_calib.resolve()).encode("utf-8")).hexdigest()
+    return tempdir / "calibration_cache" / (key + ".bin")
+
+
+def _load_cache(filepath_calib: Path) -> Optional[tuple[np.ndarray, np.ndarray]]:
+    """キャッシュが元ファイルと一致していれば(x, y)を返す. なければNone
+
+    mtimeとサイズが同じならファイルの中身は読まない. 違っていても中身のハッシュが同じなら使う
+    """
+    cache_path = _cache_path(filepath_calib)
+    if cache_path is None or not cache_path.is_file():
+        return None
+    try:
+        raw = cache_path.read_bytes()
+        magic, mtime_ns, size, digest, rows = CACHE_HEADER.unpack_from(raw)
+        if magic != CACHE_MAGIC or len(raw) != CACHE_HEADER.size + rows * 16:
+            return None
+        stat = filepath_calib.stat()
+        if (stat.st_mtime_ns, stat.st_size) != (mtime_ns, size):
+            if hashlib.sha256(filepath_calib.read_bytes()).digest() != digest:
+                return None
+            # 次からはmtimeだけで判定できるように
+            _save_cache(filepath_calib, *_split_table(raw, rows), digest)
+        return _split_table(raw, rows)
+    except (OSError, struct.error) as e:
+        logger.warning(
+            "キャリブレーションのキャッシュ%sを読み込めませんでした : %s",
+            str(cache_path),
+            e,
+        )
+        return None
+
+
+def _split_table(raw: bytes, rows: int) -> tuple[np.ndarray, np.ndarray]:
+    table = np.frombuffer(raw, dtype="<f8", count=rows * 2, offset=CACHE_HEADER.size)
+    return table[:rows], table[rows:]
+
+
+def _save_cache(
+    filepath_calib: Path, x: np.ndarray, y: np.ndarray, digest: Optional[bytes] = None
+) -> None:
+    """(x, y)をキャッシュに書き込む. 書きかけのファイルを読まれないように別名で書いてから置き換える"""
+    cache_path = _cache_path(filepath_calib)
+    if cache_path is None:
+        return
+    try:
+        stat = filepath_calib.stat()
+        if digest is None:
+            digest = hashlib.sha256(filepath_calib.read_bytes()).digest()
+        cache_path.parent.mkdir(exist_ok=True)
+        temp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+        with temp_path.open("wb") as f:
+            f.write(
+                CACHE_HEADER.pack(
+                    CACHE_MAGIC, stat.st_mtime_ns, stat.st_size, digest, len(x)
+                )
+            )
+            f.write(np.ascontiguousarray(x, dtype="<f8").tobytes())
+            f.write(np.ascontiguousarray(y, dtype="<f8").tobytes())
+        os.replace(temp_path, cache_path)
+    except OSError as e:
+        logger.warning(
+            "キャリブレーションのキャッシュ%sを作成できませんでした : %s",
+            str(cache_path),
+            e,
+        )
+
+
 class TMRCalibrationManager:
     """TMRの温度校正を行う
 
@@ -29,10 +113,20 @@ class TMRCalibrationManager:
         set_own_calib_file(filepath_calib:str): キャリブレーションを指定して温度校正を行います。普通は使いません。
 
         calibration(x:float):float               入力xに対して線形補間を行ったyを返します
+
+        calibration_many(x:array):numpy.ndarray  配列xの各要素に対して線形補間を行ったyをまとめて返します
     """
 
     calib_file_name: str
-    interpolate_func: Optional[Callable[[float], float]] = None  # 変換の関数
+    # 変換の関数(互換のため残している. calibration_manyと同じ)
+    interpolate_func: Optional[Callable[[float], float]] = None
+    __x: Optional[np.ndarray] = None  # 抵抗値(昇順)
+    __y: Optional[np.ndarray] = None  # 抵抗値に対応する温度
+    __slope: Optional[np.ndarray] = None  # 各区間の傾き
+    # calibrationで1点ずつ変換するとき用にfloatのリストにしたもの
+    __x_list: list[float] = []
+    __y_list: list[float] = []
+    __slope_list: list[float] = []
 
     def set_shared_calib_file(self) -> None:
         """キャリブレーションファイルを共有フォルダから取得してインスタンスにセット"""
@@ -74,6 +168,8 @@ class TMRCalibrationManager:
     def __set(self, filepath_calib: Path) -> None:  # プラチナ温度計の抵抗値を温度に変換するためのファイルを読み込み
         """キャリブレーションファイルの2列目をx,1列目をyとして線形補間関数を作る.
 
+        一度読み込んだファイルは並び替えた配列を共有TEMPフォルダにキャッシュしておき､ 次からはそれを使う
+
         Parameter
         ---------
 
@@ -92,6 +188,14 @@ class TMRCalibrationManager:
                 + "'にアクセスしようとしましたが存在しませんでした."
             )
 
+        self.calib_file_name = filepath_calib.parts[1]
+        logger.info("calibration : %s", str(filepath_calib))
+
+        cache = _load_cache(filepath_calib)
+        if cache is not None:
+            self.__set_table(*cache, is_sorted=True)
+            return
+
         with filepath_calib.open(
             mode="r", encoding=get_encode_type(filepath_calib)
         ) as file:
@@ -115,23 +219,77 @@ class TMRCalibrationManager:
                 except Exception:
                     pass
 
-        self.calib_file_name = filepath_calib.parts[1]
-        logger.info("calibration : %s", str(filepath_calib))
+        if len(x) < 2:
+            raise CalibrationError(
+                "キャリブレーションファイル"
+                + str(filepath_calib)
+                + "には数値の行が2行以上必要です"
+            )
+
+        self.__set_table(np.array(x, dtype=np.float64), np.array(y, dtype=np.float64))
+        _save_cache(filepath_calib, self.__x, self.__y)
 
-        self.interpolate_func = interpolate.interp1d(
-            x, y, bounds_error=False, fill_value="extrapolate"
-        )  # 線形補間関数定義
+    def __set_table(
+        self, x: np.ndarray, y: np.ndarray, is_sorted: bool = False
+    ) -> None:
+        """線形補間に使う配列をセットする. is_sortedでなければxの昇順に並び替える"""
+        if not is_sorted:
+            order = np.argsort(x, kind="mergesort")  # scipyのinterp1dと同じ並び順にする
+            x, y = x[order], y[order]
+        self.__x = x
+        self.__y = y
+        self.__x_list = self.__x.tolist()
+        self.__y_list = self.__y.tolist()
+        self.__slope = np.diff(self.__y) / np.diff(self.__x)
+        self.__slope_list = self.__slope.tolist()
+        self.interpolate_func = self.calibration_many
 
     def calibration(self, x: float) -> float:
-        """プラチナ温度計の抵抗値xに対応する温度yを線形補間で返す"""
+        """プラチナ温度計の抵抗値xに対応する温度yを線形補間で返す
+
+        範囲外のxは両端の区間を延長して求める(scipyのinterp1dのfill_value="extrapolate"と同じ値になる)
+        """
+        if self.__x is None:
+            raise CalibrationError("キャリブレーションファイルが読み込まれていません")
         try:
-            y = self.interpolate_func(x)
-        except ValueError as e:
+            x = float(x)
+        except (TypeError, ValueError) as e:
             raise CalibrationError(
-                "入力されたデータ " + str(x) + " がキャリブレーションファイルのデータ範囲外になっている可能性があります"
+                "入力されたデータ " + str(x) + " は数値に変換できません"
             ) from e
-        except NameError as e:
-            raise CalibrationError("キャリブレーションファイルが読み込まれていない可能性があります") from e
-        except Exception as e:
-            raise CalibrationError("予期せぬエラーが発生しました") from e
-        return y
+
+        # 1点だけならnumpyを通さずにfloatのまま計算した方が速い
+        index = (
+            min(max(bisect.bisect_left(self.__x_list, x), 1), len(self.__x_list) - 1)
+            - 1
+        )
+        return (
+            self.__slope_list[index] * (x - self.__x_list[index]) + self.__y_list[index]
+        )
+
+    def calibration_many(self, x) -> np.ndarray:
+        """抵抗値の配列xの各要素に対応する温度をまとめて線形補間で求める
+
+        Parameter
+        ---------
+
+        x : array_like
+            抵抗値の配列(numpyの配列やリスト. 1列分のデータなど)
+
+        Returns
+        -------
+
+        y : numpy.ndarray
+            xと同じ形の温度の配列. 各要素はcalibrationで1点ずつ変換したものと同じ値になる
+        """
+        if self.__x is None:
+            raise CalibrationError("キャリブレーションファイルが読み込まれていません")
+        try:
+            x = np.asarray(x, dtype=np.float64)
+        except (TypeError, ValueError) as e:
+            raise CalibrationError(
+                "入力されたデータは数値の配列に変換できません"
+            ) from e
+
+        index = np.clip(np.searchsorted(self.__x, x), 1, len(self.__x) - 1) - 1
+        return self.__slope[index] * (x - self.__x[index]) + self.__y[index]
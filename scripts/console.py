@@ -0,0 +1,106 @@
+"""
+コンソールからのキー入力の確認
+
+Windowsではmsvcrtでキーボードのバッファーを､ それ以外ではselectで標準入力を見る
+(LinuxやCIのマシンでも測定を動かせるようにするため)
+"""
+
+import os
+import sys
+import threading
+import weakref
+from typing import Optional
+
+if sys.platform == "win32":
+    import msvcrt
+else:
+    import select
+    import termios
+
+
+def flush_input() -> None:
+    """既に入っている入力を捨てる"""
+    if sys.platform == "win32":
+        while msvcrt.kbhit():
+            msvcrt.getwch()
+        return
+    if sys.stdin is not None and not sys.stdin.closed and sys.stdin.isatty():
+        termios.tcflush(sys.stdin, termios.TCIFLUSH)
+
+
+def _close_fds(*fds: int) -> None:
+    for fd in fds:
+        os.close(fd)
+
+
+class ConsoleReader:
+    """コンソールから1行ずつ読む. 別スレッドでreadlineを待っている間にcloseで待つのをやめさせられる
+
+    Windows以外では標準入力とclose用のパイプをselectで待つので､ 入力があればすぐに読める.
+    (sys.stdin.readlineで待つと測定の終了後もスレッドが標準入力を読もうとして､ 終了時のinputと取り合いになる)
+    1バイトずつ読んで改行で止めるので､ 次の行以降は読まずに標準入力に残る(closeの後のinputで読める)
+    Windowsではselectが標準入力に使えないのでmsvcrt.kbhitを0.1秒ごとに確認する
+    """
+
+    POLL_INTERVAL = 0.1  # Windowsでの確認の間隔(秒)
+
+    def __init__(self, fd: Optional[int] = None) -> None:
+        """fdを省略したときは標準入力から読む"""
+        self.__lock = threading.Lock()
+        self.__closed = False
+        if sys.platform == "win32":
+            self.__stop = threading.Event()
+            return
+        if fd is None:
+            try:
+                fd = sys.stdin.fileno()
+            except (AttributeError, OSError, ValueError):  # 標準入力がないとき
+                fd = None
+        self.__fd = fd
+        self.__line = b""  # 読みかけの行
+        self.__wake_r, self.__wake_w = os.pipe()
+        # パイプはreadlineを待っているスレッドからも参照がなくなったときに閉じる
+        weakref.finalize(self, _close_fds, self.__wake_r, self.__wake_w)
+
+    def readline(self) -> Optional[str]:
+        """1行読むまで待って改行を除いて返す. closeされたか標準入力が閉じられたときはNoneを返す"""
+        if sys.platform == "win32":
+            while not self.__stop.is_set():
+                if msvcrt.kbhit():
+                    try:
+                        return input()
+                    except EOFError:
+                        return None
+                self.__stop.wait(self.POLL_INTERVAL)
+            return None
+
+        if self.__fd is None:
+            return None
+        try:
+            while True:
+                readable, _, _ = select.select([self.__fd, self.__wake_r], [], [])
+                if self.__wake_r in readable:
+                    return None
+                char = os.read(self.__fd, 1)
+                if char == b"":  # 標準入力が閉じられた
+                    return None
+                if char == b"\n":
+                    break
+                self.__line += char
+        except (OSError, ValueError):
+            return None
+        line, self.__line = self.__line, b""
+        return line.decode(
+            getattr(sys.stdin, "encoding", None) or "utf-8", errors="replace"
+        ).rstrip("\r")
+
+    def close(self) -> None:
+        """readlineで待っているのをやめさせる(スレッドの終了は待たない)"""
+        with self.__lock:
+            if self.__closed:
+                return
+            self.__closed = True
+            if sys.platform == "win32":
+                self.__stop.set()
+                return
+            os.write(self.__wake_w, b"x")
@@ -13,8 +13,8 @@ class DefineFileError(MyException):
     """定義ファイル関係のエラー"""
 
 
-def get_deffile() -> Path:
-    """定義ファイルのパスの取得"""
+def get_deffile(defpath: Optional[Path] = None) -> Path:
+    """定義ファイルのパスの取得. defpathを渡したときはダイアログを出さずにそれを使う"""
     # 前回の定義ファルのパスが保存されているファイル
     path_deffilepath = SHARED_VARIABLES.TEMPDIR / "deffilepath"
     path_deffilepath.touch()
@@ -27,13 +27,18 @@ def get_deffile() -> Path:
         predefdir = str(predefpath.parent)
         predeffilename = predefpath.name
 
-    print("定義ファイル選択...")
-    defpath = ask_open_filename(
-        filetypes=[("定義ファイル", "*.def")],
-        title="定義ファイルを選んでください",
-        initialdir=predefdir,
-        initialfile=predeffilename,
-    )
+    if defpath is None:
+        print("定義ファイル選択...")
+        defpath = ask_open_filename(
+            filetypes=[("定義ファイル", "*.def")],
+            title="定義ファイルを選んでください",
+            initialdir=predefdir,
+            initialfile=predeffilename,
+        )
+    else:
+        defpath = Path(defpath).absolute()
+        if not defpath.is_file():
+            raise DefineFileError(f"定義ファイル{defpath}が存在しません")
 
     if defpath.is_file():
         # 今回の定義ファイルのパスを保存
@@ -42,9 +47,9 @@ def get_deffile() -> Path:
     return defpath
 
 
-def read_deffile() -> None:
+def read_deffile(defpath: Optional[Path] = None) -> None:
     """定義ファイルを読み込んで各フォルダのパスを取得"""
-    path_deffile = get_deffile()
+    path_deffile = get_deffile(defpath)
     logger.info("define file:%s", path_deffile.stem)
 
     datadir = None
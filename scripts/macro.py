@@ -6,6 +6,7 @@ from importlib.util import module_from_spec, spec_from_loader
 from logging import getLogger
 from pathlib import Path
 from types import ModuleType
+from typing import Optional
 
 from utility import MyException, ask_open_filename
 from variables import SHARED_VARIABLES, USER_VARIABLES
@@ -17,20 +18,26 @@ class MacroError(MyException):
     """マクロ関連のエラー"""
 
 
-def get_macropath() -> tuple[Path, str, Path]:
-    """前回のマクロ名が保存されたファイルのパス"""
+def get_macropath(macropath: Optional[Path] = None) -> tuple[Path, str, Path]:
+    """マクロのパスの取得. macropathを渡したときはダイアログを出さずにそれを使う"""
+    # 前回のマクロ名が保存されたファイルのパス
     path_premacroname = SHARED_VARIABLES.TEMPDIR / "premacroname"
     path_premacroname.touch()
 
     premacroname = path_premacroname.read_text(encoding="utf-8")
 
-    # .ssrは勝手に作った拡張子
-    macropath = ask_open_filename(
-        filetypes=[("pythonファイル", "*.py *.ssr")],
-        title="マクロを選択してください",
-        initialdir=str(USER_VARIABLES.MACRODIR),
-        initialfile=premacroname,
-    )
+    if macropath is None:
+        # .ssrは勝手に作った拡張子
+        macropath = ask_open_filename(
+            filetypes=[("pythonファイル", "*.py *.ssr")],
+            title="マクロを選択してください",
+            initialdir=str(USER_VARIABLES.MACRODIR),
+            initialfile=premacroname,
+        )
+    else:
+        macropath = Path(macropath).absolute()
+        if not macropath.is_file():
+            raise MacroError(f"マクロ{macropath}が存在しません")
 
     macrodir = macropath.parent
     macroname = macropath.stem
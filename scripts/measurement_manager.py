@@ -3,7 +3,8 @@
 ユーザーのマクロ側から呼び出せる関数などはほとんどここにあります
 一部処理はmeasurement_manager_supportに切り出しています
 """
-import msvcrt
+
+import os
 import sys
 import threading
 import time
@@ -11,12 +12,15 @@ from logging import getLogger
 from typing import Optional, Union
 
 import calibration as calib
+import console
 from measurement_manager_support import (
     CommandReceiver,
     FileManager,
+    LoopProfiler,
     MeasurementState,
     MeasurementStep,
     PlotAgency,
+    UpdateScheduler,
 )
 from utility import get_date_text
 from variables import USER_VARIABLES
@@ -24,10 +28,13 @@ from variables import USER_VARIABLES
 logger = getLogger(__name__)
 
 
-def start_macro(macro) -> None:
-    """measurement_manager起動"""
+def start_macro(macro, headless: bool = False) -> None:
+    """measurement_manager起動
+
+    headlessがTrueのときはダイアログ, グラフのウィンドウ, コンソールからの入力を使わずに最後まで動かす
+    """
     global _measurement_manager
-    _measurement_manager = MeasurementManager(macro)
+    _measurement_manager = MeasurementManager(macro, headless=headless)
     _measurement_manager.measure_start()
 
 
@@ -37,24 +44,98 @@ def finish() -> None:
     _measurement_manager.is_measuring = False
 
 
-def set_file(filename: str = None, add_date: bool = True):
+def set_file(
+    filename: str = None,
+    add_date: bool = True,
+    flush_rows: int = 1,
+    flush_interval: float = 0,
+    fsync_interval: float = 0,
+    async_write: bool = False,
+    queue_size: int = 1000,
+    format: str = "txt",
+):
     """ファイル名をセット
 
     Parameter
     ---------
     filename : str
-        ファイル名
+        ファイル名. formatが"npy"で拡張子がないときは".npy"をつける
     add_date : bool
         ファイル名の先頭に日付をつけるかどうか
+    flush_rows : int (>=0)
+        この行数saveするごとにファイルに反映する. 0のときは行数では反映しない
+        (測定が速くて書き込みが負担になるときは大きくする)
+    flush_interval : float (>=0)
+        前回の反映からこの秒数が経っていればファイルに反映する(saveが呼ばれなくても反映する). 0のときは時間では反映しない
+        (flush_rowsとflush_intervalがどちらも0のときは測定終了時にまとめて反映)
+    fsync_interval : float (>=0)
+        この秒数ごとにディスクへの書き出しを保証する(PCが落ちたときの対策). 0のときはしない.
+        ファイルへの反映のときに行うのでflush_rowsかflush_intervalも設定すること(どちらも0だと測定終了時にしか行わない)
+    async_write : bool
+        Trueのときはファイルへの書き込みを別スレッドで行う. 保存先への書き込みが遅くてもupdateが止まらない
+    queue_size : int (>0)
+        async_writeのときに書き込み待ちにできる行数. これを超えると書き込みが追いつくまでsaveが待つ
+    format : "txt" or "npy"
+        "npy"のときはテキストではなくfloat64のバイナリで保存する(numpy.loadで一瞬で読める).
+        数値しか保存できず､ ラベルは"{ファイル名}_label.txt"に書き込まれる
     """
 
     if filename is not None and add_date:
-        filename=f"{filename}{get_date_text()}.txt"
-    
-    if filename is not None:
-        _measurement_manager.file_manager.set_file(filepath=f"{USER_VARIABLES.DATADIR}/{filename}")
-    else:
-        _measurement_manager.file_manager.set_file(filepath=None)
+        filename = f"{filename}{get_date_text()}.{format}"
+    elif (
+        filename is not None and format == "npy" and os.path.splitext(filename)[1] == ""
+    ):
+        # 拡張子がないとsplit.file_openで形式がわからない(txtのときは今まで通りつけない)
+        filename = f"{filename}.{format}"
+
+    filepath = f"{USER_VARIABLES.DATADIR}/{filename}" if filename is not None else None
+    # ダイアログを出さずに日付のファイル名にする
+    if filepath is None and _measurement_manager.headless:
+        filepath = f"{USER_VARIABLES.DATADIR}/{get_date_text()}.{format}"
+    _measurement_manager.file_manager.set_file(
+        filepath=filepath,
+        flush_rows=flush_rows,
+        flush_interval=flush_interval,
+        fsync_interval=fsync_interval,
+        async_write=async_write,
+        queue_size=queue_size,
+        format=format,
+    )
+
+
+def set_online_split(
+    T_index: int,
+    f_index: int,
+    freq_num: int = 16,
+    sample_and_cutout_num: tuple[int, int] = (150, 120),
+    step: int = 10,
+    threshold: float = 0,
+    name_temperaturesplitfolder: str = None,
+    name_frequencesplitfile: str = None,
+) -> None:
+    """saveしたデータを測定中にTMR_splitと同じように分割していく
+
+    分割後のファイルは測定中に追記されていくので､ 測定が終わった時点で分割も終わっている.
+    set_fileより前に呼ぶ(同じファイルを作ろうとしてエラーになるのでsplit関数でTMR_splitは呼ばないこと)
+
+    Parameter
+    ---------
+    T_index, f_index, freq_num, sample_and_cutout_num, step, threshold, name_temperaturesplitfolder, name_frequencesplitfile :
+        split.TMR_splitと同じ
+    """
+    if _measurement_manager.state.current_step != MeasurementStep.START:
+        logger.warning(sys._getframe().f_code.co_name + "はstart関数内で用いてください")
+    _measurement_manager.file_manager.set_online_split(
+        T_index=T_index,
+        f_index=f_index,
+        freq_num=freq_num,
+        sample_and_cutout_num=sample_and_cutout_num,
+        step=step,
+        threshold=threshold,
+        name_temperaturesplitfolder=name_temperaturesplitfolder,
+        name_frequencesplitfile=name_frequencesplitfile,
+    )
+
 
 def set_file_name(filename: str, add_date: bool = True) -> None:
     logger.warning("関数set_file_nameは非推奨です。 set_fileを使ってください")
@@ -98,7 +179,17 @@ def write_file(text: str) -> None:
 
 
 def set_plot_info(
-    line=False, xlog=False, ylog=False, renew_interval=1, legend=False, flowwidth=0
+    line=False,
+    xlog=False,
+    ylog=False,
+    renew_interval=1,
+    legend=False,
+    flowwidth=0,
+    max_points=0,
+    blit=False,
+    max_fps=0,
+    snapshot_interval=0,
+    snapshot_format="png",
 ) -> None:  # プロット情報の入力
     """グラフ描画プロセスに渡す値はここで設定する.
 
@@ -121,6 +212,22 @@ def set_plot_info(
 
     flowwidth : float (>0)
         これが0より大きい値のとき. グラフの横軸は固定され､横にプロットが流れるようなグラフになる.
+
+    max_points : int (>=0)
+        これが0より大きい値のとき. 1本の線の点がこれを超えたら形を保ったまま間引いて描画する(長時間の測定用).
+
+    blit : bool
+        Trueのとき. 線だけを描き直して更新を軽くする(表示範囲には余白がつく).
+
+    max_fps : float (>=0)
+        これが0より大きい値のとき. 新しい点が来たらすぐに(最大で1秒にmax_fps回)描き直す.
+        点が来ないときはrenew_interval秒ごとに確認するだけになる.
+
+    snapshot_interval : float (>=0)
+        これが0より大きい値のとき. ウィンドウを出さずにこの間隔(秒)でグラフを"{データのファイル名}_plot.png"に保存する.
+
+    snapshot_format : str ("png" or "svg")
+        保存する画像の形式
     """
 
     if _measurement_manager.state.current_step != MeasurementStep.START:
@@ -132,9 +239,72 @@ def set_plot_info(
         renew_interval=renew_interval,
         legend=legend,
         flowwidth=flowwidth,
+        max_points=max_points,
+        blit=blit,
+        max_fps=max_fps,
+        snapshot_interval=snapshot_interval,
+        snapshot_format=snapshot_format,
     )
 
 
+def set_update_interval(interval: float) -> None:
+    """updateを一定の間隔(秒)で呼ぶようにする. startで呼ぶ
+
+    呼ぶ時刻は最初のupdateからintervalの整数倍の時刻に合わせるので､ update内の処理の時間で周期がずれていかない.
+    (update内でtime.sleepで間隔を調整する必要はない)
+    間に合わなかった回数と呼んだ時刻の遅れ(jitter)は測定の終了時にログに出る
+
+    Parameter
+    ---------
+    interval : float (>0)
+        updateを呼ぶ間隔(秒)
+    """
+    if _measurement_manager.state.current_step != MeasurementStep.START:
+        logger.warning(sys._getframe().f_code.co_name + "はstart関数内で用いてください")
+    _measurement_manager.update_scheduler = UpdateScheduler(interval)
+
+
+def set_command_source(console: bool = True, port: Optional[int] = None) -> None:
+    """on_commandに渡すコマンドの入力元を設定する. startで呼ぶ
+
+    Parameter
+    ---------
+    console : bool
+        コンソールからの入力を受け付けるか
+
+    port : int or None
+        intのときは127.0.0.1のこのポートでソケットの接続を受け付けて､ 送られてきた1行を1つのコマンドとする.
+        0のときは空いているポートを使う(ポート番号はコンソールに表示される). スクリプトから測定を操作するとき用
+    """
+    if _measurement_manager.state.current_step != MeasurementStep.START:
+        logger.warning(sys._getframe().f_code.co_name + "はstart関数内で用いてください")
+    # headlessのときはコンソールからは受け付けない
+    use_console = console and not _measurement_manager.headless
+    _measurement_manager.command_receiver.set_source(use_console=use_console, port=port)
+
+
+def set_loop_profile(csv_filepath: Optional[str] = None) -> None:
+    """測定ループの各処理にかかった時間を1回ごとにcsvに書き込む. startで呼ぶ
+
+    update, save, plot, コマンドの処理(on_command)の時間はこれを呼ばなくても常に集計していて､ 測定の終了時にログに出る.
+    どの処理で時間がかかっているかを1回ごとに見たいときに使う
+
+    Parameter
+    ---------
+    csv_filepath : str or None
+        書き込むcsvのファイルのパス. Noneのときは測定データのファイル名の後ろに_profileをつけたcsvにする
+    """
+    if _measurement_manager.state.current_step != MeasurementStep.START:
+        logger.warning(sys._getframe().f_code.co_name + "はstart関数内で用いてください")
+    if csv_filepath is not None and type(csv_filepath) is not str:
+        raise LoopProfiler.LoopProfilerError(
+            "set_loop_profileの引数に問題があります : csv_filepathの型はstrかNoneです"
+        )
+    # 測定データのファイル名はstartの後で決まることがあるのでcsvはmeasure_startで開く
+    _measurement_manager.loop_profile = True
+    _measurement_manager.loop_profile_csv = csv_filepath
+
+
 def dont_make_file():
     """ファイルを作成しないときはこれを呼ぶ
 
@@ -154,7 +324,7 @@ def save_data(*data: Union[tuple, str]) -> None:
 def save(*data: Union[tuple, str]) -> None:  # データ保存
     """引数のデータをファイルに書き込む.
 
-    この関数が呼ばれるごとに書き込みの反映( __savefile.flush)をおこなっているので途中で測定が落ちてもそれまでのデータは残るようになっている.
+    書き込みの反映はset_fileで設定したタイミング(デフォルトではこの関数が呼ばれるごと)で行うので途中で測定が落ちてもそれまでのデータは残るようになっている.
     stringの引数にも対応しているので､測定のデータは測定マクロ側でstringで保持しておいて最後にまとめて書き込むことも可能.
 
     Parameter
@@ -168,7 +338,11 @@ def save(*data: Union[tuple, str]) -> None:  # データ保存
         & (MeasurementStep.UPDATE | MeasurementStep.END)
     ):
         logger.warning(sys._getframe().f_code.co_name + "はupdateもしくはend関数内で用いてください")
+    start = time.perf_counter_ns()
     _measurement_manager.file_manager.save(*data)
+    _measurement_manager.loop_profiler.record(
+        LoopProfiler.SAVE, time.perf_counter_ns() - start
+    )
 
 
 plot_data_flag = False
@@ -186,7 +360,7 @@ def plot(x: float, y: float, label: str = "default") -> None:
     """データをグラフ描画プロセスに渡す.
 
     labelが変わると色が変わる
-    __share_listは測定プロセスとグラフ描画プロセスの橋渡しとなるリストでバッファーの役割をする
+    plot_bufferは測定プロセスとグラフ描画プロセスの橋渡しとなるバッファー
 
     Parameter
     ---------
@@ -203,13 +377,48 @@ def plot(x: float, y: float, label: str = "default") -> None:
         logger.warning(sys._getframe().f_code.co_name + "はstartもしくはupdate関数内で用いてください")
 
     if _measurement_manager.is_measuring:
+        start = time.perf_counter_ns()
         _measurement_manager.plot_agency.plot(x, y, label)
+        _measurement_manager.loop_profiler.record(
+            LoopProfiler.PLOT, time.perf_counter_ns() - start
+        )
+
+
+def plot_many(x, y, label: str = "default") -> None:
+    """複数の点をまとめてグラフ描画プロセスに渡す.
+
+    1回のupdateでスペクトルなど多数の点を得るときはplotを繰り返すよりこちらを使う方が速い
+
+    Parameter
+    ---------
+
+    x,y : 1次元の配列(numpy.ndarrayやlist)
+        プロットのx,y座標. 同じ長さにする
+
+    label : string or float
+        全ての点に共通の識別ラベル(plotと同じ).
+    """
+
+    if _measurement_manager.state.current_step != MeasurementStep.UPDATE:
+        logger.warning(
+            sys._getframe().f_code.co_name
+            + "はstartもしくはupdate関数内で用いてください"
+        )
+
+    if _measurement_manager.is_measuring:
+        start = time.perf_counter_ns()
+        _measurement_manager.plot_agency.plot_many(x, y, label)
+        _measurement_manager.loop_profiler.record(
+            LoopProfiler.PLOT, time.perf_counter_ns() - start
+        )
 
 
 def no_plot() -> None:
     """プロット画面を出さないときに呼ぶ"""
     if _measurement_manager.state.current_step != MeasurementStep.START:
         logger.warning(sys._getframe().f_code.co_name + "はstart関数内で用いてください")
+    # 先に起動しておいたグラフのプロセスを終了する
+    _measurement_manager.plot_agency.close()
     _measurement_manager.plot_agency = PlotAgency.NoPlotAgency()
 
 
@@ -219,8 +428,13 @@ class MeasurementManager:
     file_manager = None
     plot_agency = None
     command_receiver = None
+    update_scheduler: Optional[UpdateScheduler] = None
+    loop_profiler: Optional[LoopProfiler] = None
+    loop_profile = False
+    loop_profile_csv: Optional[str] = None
     state = MeasurementState()
     is_measuring = False
+    headless = False
     _dont_make_file = False
 
     @classmethod
@@ -231,11 +445,15 @@ class MeasurementManager:
     def get_measurement_state(cls) -> MeasurementState:
         return cls.state
 
-    def __init__(self, macro) -> None:
+    def __init__(self, macro, headless: bool = False) -> None:
         self.macro = macro
+        self.headless = headless
         self.file_manager = FileManager()
-        self.plot_agency = PlotAgency()
+        self.plot_agency = PlotAgency.NoPlotAgency() if headless else PlotAgency()
         self.command_receiver = CommandReceiver(self.state)
+        self.loop_profiler = LoopProfiler()
+        if headless:
+            self.command_receiver.set_source(use_console=False)
         self.set_measurement_state(self.state)
 
     def measure_start(self) -> None:
@@ -247,59 +465,107 @@ class MeasurementManager:
         logger.debug("measurement start")
         self.state.current_step = MeasurementStep.READY
 
-        while msvcrt.kbhit():  # 既に入っている入力は消す
-            msvcrt.getwch()
+        console.flush_input()  # 既に入っている入力は消す
 
         self.state.current_step = MeasurementStep.START
-
-
-        if self.macro.start is not None:
-            self.macro.start()
-        if (not self._dont_make_file) and (self.file_manager.filepath is None):
-            self.file_manager.set_file(filepath=f"{USER_VARIABLES.DATADIR}/{get_date_text()}.txt")
-
-        self.plot_agency.run_plot_window()  # グラフウィンドウの立ち上げ
-
-        while msvcrt.kbhit():  # 既に入っている入力は消す
-            msvcrt.getwch()
-
-        if self.macro.on_command is not None:
-            self.command_receiver.initialize()
-
-        print("measuring start...")
-        self.state.current_step = MeasurementStep.UPDATE
-
-        self.is_measuring = True
-        while True:  # 測定終了までupdateを回す
-            if not self.is_measuring:
-                break
-            command = self.command_receiver.get_command()
-            if command is None:
-                flag = self.macro.update()
-                if (flag is not None) and not flag:
-                    logger.debug("return False from update function")
+        self.plot_agency.prewarm()  # matplotlibの読み込みはstartと並行して行う
+
+        try:
+            if self.macro.start is not None:
+                self.macro.start()
+            if (not self._dont_make_file) and (self.file_manager.filepath is None):
+                self.file_manager.set_file(filepath=f"{USER_VARIABLES.DATADIR}/{get_date_text()}.txt")
+
+            # グラフウィンドウの立ち上げ
+            self.plot_agency.run_plot_window(self.file_manager.filepath)
+
+            if self.loop_profile:
+                if self.loop_profile_csv is not None:
+                    self.loop_profiler.set_csv(self.loop_profile_csv)
+                elif self.file_manager.filepath is not None:
+                    self.loop_profiler.set_csv(
+                        os.path.splitext(self.file_manager.filepath)[0] + "_profile.csv"
+                    )
+                else:
+                    logger.warning(
+                        "ファイルを作らないときはset_loop_profileでcsv_filepathを指定してください"
+                    )
+
+            console.flush_input()  # 既に入っている入力は消す
+
+            if self.macro.on_command is not None:
+                self.command_receiver.initialize()
+
+            print("measuring start...")
+            self.state.current_step = MeasurementStep.UPDATE
+
+            # 毎回の属性の参照を減らすためにローカル変数にしておく
+            record_iteration = self.loop_profiler.record_iteration
+            perf_counter_ns = time.perf_counter_ns
+            self.is_measuring = True
+            while True:  # 測定終了までupdateを回す
+                if not self.is_measuring:
+                    break
+                command = self.command_receiver.get_command()
+                if command is None:
+                    # 間隔が決まっているときは次の時刻まで待つ(コマンドが来たらすぐに起きる)
+                    if self.update_scheduler is None or self.update_scheduler.wait(
+                        interrupt=self.command_receiver.arrived
+                    ):
+                        start = perf_counter_ns()
+                        flag = self.macro.update()
+                        record_iteration(LoopProfiler.UPDATE, perf_counter_ns() - start)
+                        if (flag is not None) and not flag:
+                            logger.debug("return False from update function")
+                            self.is_measuring = False
+                else:
+                    start = perf_counter_ns()
+                    # コマンドが入っていればコマンドを呼ぶ
+                    self.macro.on_command(command)
+                    record_iteration(LoopProfiler.COMMAND, perf_counter_ns() - start)
+
+                if self.plot_agency.is_plot_window_forced_terminated():
+                    logger.debug("measurement has finished because plot window closed")
                     self.is_measuring = False
-            else:
-                self.macro.on_command(command)  # コマンドが入っていればコマンドを呼ぶ
-
-            if self.plot_agency.is_plot_window_forced_terminated():
-                logger.debug("measurement has finished because plot window closed")
-                self.is_measuring = False
 
-        self.state.current_step = MeasurementStep.FINISH_MEASURE
-        self.plot_agency.stop_renew_plot_window()
-
-        while msvcrt.kbhit():  # 既に入っている入力は消す
-            msvcrt.getwch()
-
-        print("measurement has finished...")
-
-        if self.macro.end is not None:
-            self.state.current_step = MeasurementStep.END
-            self.macro.end()
-
-        if not self._dont_make_file:
-            self.file_manager.close()  # ファイルはend関数の後で閉じる
+            self.state.current_step = MeasurementStep.FINISH_MEASURE
+            self.plot_agency.stop_renew_plot_window()
+            self.command_receiver.close()
+            if self.update_scheduler is not None:
+                self.update_scheduler.log_summary()
+
+            console.flush_input()  # 既に入っている入力は消す
+
+            print("measurement has finished...")
+
+            if not self._dont_make_file:
+                # 書き込み待ちのデータを全て書き込んでからendへ
+                self.file_manager.drain()
+
+            if self.macro.end is not None:
+                self.state.current_step = MeasurementStep.END
+                self.macro.end()
+                # end関数の中でのsaveもcsvの1行にする
+                self.loop_profiler.end_iteration()
+
+            if not self._dont_make_file:
+                self.file_manager.close()  # ファイルはend関数の後で閉じる
+        finally:
+            # update()などでエラーが出ても書き込みスレッドのキューやバッファーに残っている行を書き出してからファイルを閉じる
+            # (MAINがエラーを受け取ってすぐに終了しても書き込み途中のデータが失われないように.
+            # 正常に終わったときは閉じてあるので何もしない)
+            if not self._dont_make_file:
+                try:
+                    try:
+                        self.file_manager.drain()
+                    finally:
+                        self.file_manager.close()
+                except Exception:
+                    logger.exception("ファイルを閉じるときにエラーが発生しました")
+
+        # end関数の中でのsaveも含めて集計をログに出す
+        self.loop_profiler.close()
+        self.loop_profiler.log_summary()
 
         self.state.current_step = MeasurementStep.AFTER
 
@@ -314,6 +580,9 @@ class MeasurementManager:
 
     def end(self):
         """終了処理. コンソールからの終了と､グラフウィンドウを閉じたときの終了の2つを実行できるようにスレッドを用いる"""
+        if self.headless:  # 待たずに終了する
+            self.plot_agency.close()
+            return
 
         def wait_enter():  # コンソール側の終了
             nonlocal endflag, windowclose  # nonlocalを使うとクロージャーになる
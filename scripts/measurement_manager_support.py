@@ -3,19 +3,26 @@ measurement_managerモジュールで利用するクラスの詰め合わせ
 """
 
 
-import msvcrt
 import os
+import queue
+import socket
+import struct
 import threading
 import time
+from collections import deque
 from enum import Flag, auto
 from logging import getLogger
-from multiprocessing import Lock, Manager, Process, Value
+from multiprocessing import Pipe, Process, Value
 from pathlib import Path
 from typing import List, Optional, Union
 
+import console
+import numpy as np
 import plot
 import pyperclip
+import split
 from basedata import BaseData
+from plot_buffer import PlotBuffer
 from utility import MyException, ask_save_filename, get_date_text
 from variables import USER_VARIABLES
 
@@ -74,50 +81,534 @@ class FileManager:  # ファイルの管理
     class FileError(MyException):
         """ファイル関連のエラー"""
 
+    class FlushTimer:
+        """interval秒ごとに別スレッドからflush_if_dueを呼ぶ
+
+        書き込みのときだけ時間を確認していると､ updateの中で長く待っている間などは前に書いた行が反映されないため
+        """
+
+        def __init__(self, flush_if_due, interval: float) -> None:
+            self.__flush_if_due = flush_if_due
+            self.__interval = interval
+            self.__stop = threading.Event()
+            self.__thread = threading.Thread(target=self.__run, daemon=True)
+            self.__thread.start()
+
+        def __run(self) -> None:
+            while not self.__stop.wait(self.__interval):
+                self.__flush_if_due()
+
+        def stop(self) -> None:
+            self.__stop.set()
+            self.__thread.join()
+
     class FileIO:
-        """実際にファイルに書き込みをする部分"""
-        __filepath=None
-        def __init__(self,filepath) -> None:
-            self.__filepath=filepath
-            self.__file = open(filepath,"x",encoding="utf-8")
-
-        def write(self,text) -> None:
-            self.__file.write(text)
+        """実際にファイルに書き込みをする部分
+
+        書き込まれた文字列は一度バッファーにためておき､ flush_rows行ごともしくはflush_interval秒ごとにまとめてファイルに反映する.
+        flush_intervalは書き込みがなくてもFlushTimerのスレッドが確認するので､ 書いた行は遅くとも2*flush_interval秒後には反映される.
+        どちらも0のときはcloseされるまで反映しない.
+        fsync_intervalが0より大きいときは反映のたびにその間隔でos.fsyncを呼び､ OS側のバッファーもディスクに書き出す(途中で落ちたときの対策)
+        """
+
+        __filepath = None
+
+        def __init__(
+            self,
+            filepath,
+            flush_rows: int = 1,
+            flush_interval: float = 0,
+            fsync_interval: float = 0,
+        ) -> None:
+            self.__filepath = filepath
+            self.__file = open(filepath, "x", encoding="utf-8")
+            self.__flush_rows = flush_rows
+            self.__flush_interval = flush_interval
+            self.__fsync_interval = fsync_interval
+            self.__buffer: List[str] = []
+            self.__last_flush = self.__last_fsync = time.monotonic()
+            # FlushTimerのスレッドと書き込みが同時にバッファーを触らないように
+            self.__lock = threading.Lock()
+            self.__timer = (
+                FileManager.FlushTimer(self.flush_if_due, flush_interval)
+                if flush_interval > 0
+                else None
+            )
+
+        def write(self, text) -> None:
+            with self.__lock:
+                self.__buffer.append(text)
+                if self.__flush_rows > 0 and len(self.__buffer) >= self.__flush_rows:
+                    self.__flush()
+                elif (
+                    self.__flush_interval > 0
+                    and time.monotonic() - self.__last_flush >= self.__flush_interval
+                ):
+                    self.__flush()
+
+        def flush_if_due(self) -> None:
+            """前回の反映からflush_interval秒経っていれば反映する"""
+            with self.__lock:
+                if (
+                    self.__file is not None
+                    and time.monotonic() - self.__last_flush >= self.__flush_interval
+                ):
+                    self.__flush()
+
+        def flush(self) -> None:
+            """バッファーの中身をファイルに反映"""
+            with self.__lock:
+                self.__flush()
+
+        def __flush(self, fsync: bool = False) -> None:
+            """fsyncがTrueのときはfsync_intervalによらずos.fsyncを呼ぶ(fsync_intervalが0のときは呼ばない)"""
+            if self.__buffer:
+                self.__file.write("".join(self.__buffer))
+                self.__buffer.clear()
             self.__file.flush()
 
+            now = time.monotonic()
+            self.__last_flush = now
+            if self.__fsync_interval > 0 and (
+                fsync or now - self.__last_fsync >= self.__fsync_interval
+            ):
+                os.fsync(self.__file.fileno())
+                self.__last_fsync = now
+
+        def drain(self) -> None:
+            """書き込み待ちの処理がなくなるまで待つ. 同期的に書き込んでいるので何もしない"""
+
         def close(self):
-            self.__file.close()
-            self.__file=None
+            if self.__timer is not None:
+                self.__timer.stop()
+            with self.__lock:
+                self.__flush(fsync=True)
+                self.__file.close()
+                self.__file = None
+
+        @property
+        def filepath(self) -> str:
+            """ファイルのパス"""
+            return self.__filepath
+
+    class NpyFileIO:
+        """数値データをfloat64のバイナリ(.npy)として書き込む部分
+
+        ファイルを行数分確保してからメモリマップし､ 1行ずつ配列に詰めていく. 確保した行数が足りなくなったら倍に広げる.
+        ヘッダーの行数は反映のたびに書き直すので途中で落ちてもそれまでのデータはnumpy.loadで読める.
+        closeのときに実際の行数に切り詰める.
+        ラベルなどの文字列は同じフォルダの"{ファイル名}_label.txt"に書き込む.
+        反映のタイミングの引数はFileIOと同じ
+        """
+
+        HEADER_SIZE = 128  # ヘッダーの長さを固定しておけば行数が増えても書き直せる
+        INITIAL_ROWS = 1024
+
+        def __init__(
+            self,
+            filepath,
+            flush_rows: int = 1,
+            flush_interval: float = 0,
+            fsync_interval: float = 0,
+        ) -> None:
+            self.__filepath = filepath
+            self.__file = open(filepath, "x+b")
+            self.__flush_rows = flush_rows
+            self.__flush_interval = flush_interval
+            self.__fsync_interval = fsync_interval
+            self.__labelIO = FileManager.FileIO(
+                filepath=self.label_filepath(filepath),
+                flush_rows=1,
+                fsync_interval=fsync_interval,
+            )
+            self.__array: Optional[np.memmap] = None
+            self.__rows = 0
+            self.__unflushed_rows = 0
+            self.__last_flush = self.__last_fsync = time.monotonic()
+            self.__write_header()
+            # FlushTimerのスレッドと書き込みが同時にファイルを触らないように
+            self.__lock = threading.Lock()
+            self.__timer = (
+                FileManager.FlushTimer(self.flush_if_due, flush_interval)
+                if flush_interval > 0
+                else None
+            )
+
+        @staticmethod
+        def label_filepath(filepath) -> str:
+            """ラベルを書き込むファイルのパス"""
+            root, _ = os.path.splitext(str(filepath))
+            return root + "_label.txt"
+
+        def __write_header(self) -> None:
+            cols = self.__array.shape[1] if self.__array is not None else 0
+            header = "{'descr': '<f8', 'fortran_order': False, 'shape': (%d, %d), }" % (
+                self.__rows,
+                cols,
+            )
+            # magic(6)+version(2)+長さ(2)+改行(1)
+            header = header.ljust(self.HEADER_SIZE - 11) + "\n"
+            self.__file.seek(0)
+            self.__file.write(
+                b"\x93NUMPY\x01\x00"
+                + struct.pack("<H", len(header))
+                + header.encode("latin1")
+            )
+            self.__file.flush()
+
+        def __allocate(self, capacity: int, cols: int) -> None:
+            """ファイルをcapacity行分に広げてメモリマップし直す"""
+            if self.__array is not None:
+                self.__array.flush()
+                self.__array = None
+            self.__file.truncate(self.HEADER_SIZE + capacity * cols * 8)
+            self.__array = np.memmap(
+                self.__file,
+                dtype="<f8",
+                mode="r+",
+                offset=self.HEADER_SIZE,
+                shape=(capacity, cols),
+            )
+
+        def write_row(self, row) -> None:
+            """1行分の数値を書き込む"""
+            with self.__lock:
+                self.__write_row(row)
+
+        def __write_row(self, row) -> None:
+            if self.__array is None:
+                self.__allocate(self.INITIAL_ROWS, len(row))
+            elif len(row) != self.__array.shape[1]:
+                raise FileManager.FileError(
+                    f"npy形式では列の数を変えることはできません(最初の行は{self.__array.shape[1]}列, 今回は{len(row)}列)"
+                )
+            elif self.__rows >= self.__array.shape[0]:
+                self.__allocate(self.__array.shape[0] * 2, self.__array.shape[1])
+
+            self.__array[self.__rows] = row
+            self.__rows += 1
+            self.__unflushed_rows += 1
+            if self.__flush_rows > 0 and self.__unflushed_rows >= self.__flush_rows:
+                self.__flush()
+            elif (
+                self.__flush_interval > 0
+                and time.monotonic() - self.__last_flush >= self.__flush_interval
+            ):
+                self.__flush()
+
+        def write(self, text) -> None:
+            """文字列はラベル用のファイルに書き込む"""
+            self.__labelIO.write(text)
+
+        def set_columns(self, columns: str) -> None:
+            """列名をラベル用のファイルに書き込む(既に同じものが書いてあれば何もしない)"""
+            self.__labelIO.flush()
+            with open(self.__labelIO.filepath, "r", encoding="utf-8") as f:
+                if columns in f.read():
+                    return
+            self.__labelIO.write(columns + "\n")
+
+        def flush_if_due(self) -> None:
+            """前回の反映からflush_interval秒経っていれば反映する"""
+            with self.__lock:
+                if (
+                    self.__file is not None
+                    and time.monotonic() - self.__last_flush >= self.__flush_interval
+                ):
+                    self.__flush()
+
+        def flush(self) -> None:
+            """書き込んだ行をファイルに反映"""
+            with self.__lock:
+                self.__flush()
+
+        def __flush(self, fsync: bool = False) -> None:
+            """fsyncがTrueのときはfsync_intervalによらずos.fsyncを呼ぶ(fsync_intervalが0のときは呼ばない)"""
+            if self.__array is not None:
+                self.__array.flush()
+            self.__write_header()
+            self.__unflushed_rows = 0
+
+            now = time.monotonic()
+            self.__last_flush = now
+            if self.__fsync_interval > 0 and (
+                fsync or now - self.__last_fsync >= self.__fsync_interval
+            ):
+                os.fsync(self.__file.fileno())
+                self.__last_fsync = now
+
+        def drain(self) -> None:
+            """書き込み待ちの処理がなくなるまで待つ. 同期的に書き込んでいるので何もしない"""
+
+        def close(self) -> None:
+            if self.__timer is not None:
+                self.__timer.stop()
+            with self.__lock:
+                self.__flush()
+                cols = self.__array.shape[1] if self.__array is not None else 0
+                self.__array = None
+                # 余分に確保した分を切り詰める
+                self.__file.truncate(self.HEADER_SIZE + self.__rows * cols * 8)
+                if self.__fsync_interval > 0:
+                    os.fsync(self.__file.fileno())
+                self.__file.close()
+                self.__file = None
+            self.__labelIO.close()
 
         @property
         def filepath(self) -> str:
             """ファイルのパス"""
             return self.__filepath
 
+    class OnlineSplitIO:
+        """書き込んだ内容を測定中の分割(split.OnlineTMRSplitter)にも渡す"""
+
+        def __init__(
+            self,
+            fileIO: Union["FileManager.FileIO", "FileManager.NpyFileIO"],
+            splitter: split.OnlineTMRSplitter,
+        ) -> None:
+            self.__fileIO = fileIO
+            self.__splitter = splitter
+
+        def write(self, text) -> None:
+            self.__fileIO.write(text)
+            self.__splitter.feed_text(text)
+
+        def write_row(self, row) -> None:
+            self.__fileIO.write_row(row)
+            self.__splitter.feed_row(row)
+
+        def set_columns(self, columns: str) -> None:
+            self.__fileIO.set_columns(columns)
+            self.__splitter.feed_text(columns + "\n")
+
+        def drain(self) -> None:
+            self.__fileIO.drain()
+
+        def close(self) -> None:
+            try:
+                self.__fileIO.close()
+            finally:
+                self.__splitter.close()
+
+        @property
+        def filepath(self) -> str:
+            """ファイルのパス"""
+            return self.__fileIO.filepath
+
+    class AsyncFileIO:
+        """FileIOへの書き込みを専用のスレッドで行う
+
+        writeは書き込む文字列をキューに詰めるだけなので､ ディスクへの書き込みが遅くても呼び出し側(update)は止まらない.
+        キューがいっぱいのときは空きができるまでwriteが待つ(書き込みが追いつかないときにメモリを食いつぶさないように)
+        書き込みスレッドで発生したエラーは次のwrite, drain, closeのときにFileErrorとして投げる
+        """
+
+        def __init__(
+            self,
+            fileIO: Union[
+                "FileManager.FileIO",
+                "FileManager.NpyFileIO",
+                "FileManager.OnlineSplitIO",
+            ],
+            queue_size: int = 1000,
+        ) -> None:
+            self.__fileIO = fileIO
+            self.__queue = queue.Queue(maxsize=queue_size)
+            self.__error: Optional[Exception] = None
+            self.__thread = threading.Thread(target=self.__write_thread)
+            self.__thread.daemon = True
+            self.__thread.start()
+
+        def __write_thread(self) -> None:
+            while True:
+                item = self.__queue.get()
+                try:
+                    if item is None:  # closeから渡される終了の合図
+                        return
+                    func, arg = item
+                    # 一度エラーが起きたら以降の書き込みは捨てる
+                    if self.__error is None:
+                        func(arg)
+                except Exception as e:
+                    self.__error = e
+                finally:
+                    self.__queue.task_done()
+
+        def __raise_if_error(self) -> None:
+            if self.__error is not None:
+                error = self.__error
+                detail = error.message if isinstance(error, MyException) else str(error)
+                raise FileManager.FileError(
+                    f"ファイル{self.filepath}への書き込みでエラーが発生しました : {detail}"
+                ) from error
+
+        def write(self, text) -> None:
+            self.__raise_if_error()
+            self.__queue.put((self.__fileIO.write, text))
+
+        def write_row(self, row) -> None:
+            self.__raise_if_error()
+            self.__queue.put((self.__fileIO.write_row, row))
+
+        def set_columns(self, columns: str) -> None:
+            self.__raise_if_error()
+            self.__queue.put((self.__fileIO.set_columns, columns))
+
+        def drain(self) -> None:
+            """キューに入っている書き込みが全て終わるまで待つ"""
+            self.__queue.join()
+            self.__raise_if_error()
+
+        def close(self) -> None:
+            self.__queue.put(None)
+            self.__thread.join()
+            self.__fileIO.close()
+            self.__raise_if_error()
+
+        @property
+        def filepath(self) -> str:
+            """ファイルのパス"""
+            return self.__fileIO.filepath
+
     __prewrite: str = ""
     delimiter: str = ","
-    __fileIO:FileIO =None  
+    __fileIO: Union[FileIO, NpyFileIO, OnlineSplitIO, AsyncFileIO] = None
+    __format: str = "txt"
+    __has_columns: bool = False
+    __online_split: Optional[dict] = None
+    __is_closed: bool = False
 
     @property
     def filepath(self) -> str:
         """ファイルのパス"""
         return self.__fileIO.filepath if self.__fileIO is not None else None
 
-    def set_file(self,filepath=None):
+    def set_file(
+        self,
+        filepath=None,
+        flush_rows: int = 1,
+        flush_interval: float = 0,
+        fsync_interval: float = 0,
+        async_write: bool = False,
+        queue_size: int = 1000,
+        format: str = "txt",
+    ):
+        """ファイルを作成する
+
+        Parameter
+        ---------
+        filepath : str
+            作成するファイルのパス. Noneのときはダイアログを出す
+
+        flush_rows : int (>=0)
+            この行数書き込むごとにファイルに反映する. 0のときは行数では反映しない
+
+        flush_interval : float (>=0)
+            前回の反映からこの秒数が経っていればファイルに反映する(書き込みがなくても別スレッドで確認する). 0のときは時間では反映しない
+            (flush_rowsとflush_intervalがどちらも0のときはファイルを閉じるときにまとめて反映)
+
+        fsync_interval : float (>=0)
+            この秒数ごとにos.fsyncでディスクへの書き出しを保証する. 0のときはしない.
+            fsyncはファイルへの反映のときに行うので､ flush_rowsかflush_intervalも設定する必要がある
+            (どちらも0のときはファイルを閉じるときにしか行わない)
+
+        async_write : bool
+            Trueのときは書き込みを専用のスレッドで行う(ネットワークドライブなど書き込みが遅い場所に保存するとき用)
+
+        queue_size : int (>0)
+            async_writeのときに書き込み待ちにできる最大数. これを超えると空きができるまでsaveが待つ
+
+        format : "txt" or "npy"
+            "txt"ならカンマ区切りのテキスト､ "npy"ならfloat64のバイナリ(numpy.loadで読める)で保存する.
+            "npy"のときは数値しか保存できず, ラベルは"{ファイル名}_label.txt"に書き込まれる
+        """
+        if type(flush_rows) is not int or flush_rows < 0:
+            raise self.FileError(
+                "set_fileの引数に問題があります : flush_rowsは0以上のintです"
+            )
+        for name, value in (
+            ("flush_interval", flush_interval),
+            ("fsync_interval", fsync_interval),
+        ):
+            if type(value) is not float and type(value) is not int:
+                raise self.FileError(
+                    f"set_fileの引数に問題があります : {name}の型はintかfloatです"
+                )
+            if value < 0:
+                raise self.FileError(
+                    f"set_fileの引数に問題があります : {name}の値は0以上にする必要があります"
+                )
+        if type(async_write) is not bool:
+            raise self.FileError(
+                "set_fileの引数に問題があります : async_writeの値はboolです"
+            )
+        if type(queue_size) is not int or queue_size <= 0:
+            raise self.FileError(
+                "set_fileの引数に問題があります : queue_sizeは1以上のintです"
+            )
+        if format not in ("txt", "npy"):
+            raise self.FileError(
+                'set_fileの引数に問題があります : formatは"txt"か"npy"です'
+            )
+        if fsync_interval > 0 and flush_rows == 0 and flush_interval == 0:
+            logger.warning(
+                "flush_rowsとflush_intervalがどちらも0なのでfsync_intervalはファイルを閉じるときにしか効きません"
+            )
+
         if filepath is None:
-            self.__fileIO=FileManager.FileIO(filepath=ask_save_filename(filetypes=[("TEXT",".txt"),],defaultextension = "txt",initialdir=USER_VARIABLES.DATADIR,initialfile=get_date_text(),title="作成するファイル名を設定してください"))
-        else:
-            self.__fileIO=FileManager.FileIO(filepath=filepath)
+            filepath = ask_save_filename(
+                filetypes=[("NPY", ".npy")] if format == "npy" else [("TEXT", ".txt")],
+                defaultextension=format,
+                initialdir=USER_VARIABLES.DATADIR,
+                initialfile=get_date_text(),
+                title="作成するファイル名を設定してください",
+            )
+        self.__format = format
+        fileIO_class = FileManager.NpyFileIO if format == "npy" else FileManager.FileIO
+        self.__fileIO = fileIO_class(
+            filepath=filepath,
+            flush_rows=flush_rows,
+            flush_interval=flush_interval,
+            fsync_interval=fsync_interval,
+        )
+        # 分割はファイルへの書き込みと同じスレッドで行う
+        if self.__online_split is not None:
+            splitter = split.OnlineTMRSplitter(filepath, **self.__online_split)
+            self.__fileIO = FileManager.OnlineSplitIO(self.__fileIO, splitter)
+        if async_write:
+            self.__fileIO = FileManager.AsyncFileIO(
+                self.__fileIO, queue_size=queue_size
+            )
 
-        if self.__prewrite!="":
+        if self.__prewrite != "":
             self.__fileIO.write(self.__prewrite)
 
-        pyperclip.copy(os.path.basename(self.__fileIO.filepath)) #ファイル名はクリップボードにコピーしておく
+        try:
+            pyperclip.copy(
+                os.path.basename(self.__fileIO.filepath)
+            )  # ファイル名はクリップボードにコピーしておく
+        # クリップボードが使えない環境(GUIのないLinuxなど)
+        except pyperclip.PyperclipException:
+            logger.debug("ファイル名をクリップボードにコピーできませんでした")
 
+    def set_online_split(self, **kwargs) -> None:
+        """保存したデータを測定中にsplit.OnlineTMRSplitterで分割する. 引数はOnlineTMRSplitterにそのまま渡す
+
+        ファイルを作る前に呼ぶ必要がある
+        """
+        if self.__fileIO is not None:
+            raise self.FileError("set_online_splitはset_fileより前に呼んでください")
+        self.__online_split = kwargs
 
     def save(self, *args: Union[tuple, str]) -> None:
         """データ保存"""
 
+        if self.__format == "npy":
+            self.__save_row(args)
+            return
+
         text = ""
 
         for data in args:
@@ -129,6 +620,33 @@ class FileManager:  # ファイルの管理
         text = text[0:-1] + "\n"
         self.__fileIO.write(text)
 
+    def __save_row(self, args: tuple) -> None:
+        """引数を数値の1行にしてnpyファイルに書き込む"""
+        row = []
+        for data in args:
+            if issubclass(type(data), BaseData) or isinstance(data, (tuple, list)):
+                row.extend(data)
+            else:
+                row.append(data)
+        try:
+            row = [float(value) for value in row]
+        except (TypeError, ValueError) as e:
+            raise self.FileError(
+                f"npy形式のファイルには数値しか保存できません : {args}"
+            ) from e
+
+        if not self.__has_columns:  # 列名はBaseDataのラベルから作る
+            self.__has_columns = True
+            labels = [
+                type(data).to_label()
+                for data in args
+                if issubclass(type(data), BaseData)
+            ]
+            if labels:
+                self.__fileIO.set_columns(",  ".join(labels))
+
+        self.__fileIO.write_row(row)
+
     def write(self, text: str) -> None:
         """ファイルへの書き込み
 
@@ -139,8 +657,17 @@ class FileManager:  # ファイルの管理
         else:
             self.__fileIO.write(text)
 
+    def drain(self) -> None:
+        """書き込み待ちのデータが全てファイルに渡るまで待つ. ファイルを作っていないときや閉じた後は何もしない"""
+        if self.__fileIO is None or self.__is_closed:
+            return
+        self.__fileIO.drain()
+
     def close(self) -> None:
-        """ファイルを閉じる"""
+        """ファイルを閉じる. ファイルを作っていないときや2回目以降は何もしない"""
+        if self.__fileIO is None or self.__is_closed:
+            return
+        self.__is_closed = True
         self.__fileIO.close()
 
     
@@ -149,52 +676,410 @@ class FileManager:  # ファイルの管理
 class CommandReceiver:  # コマンドの入力を受け取るクラス
     """コマンドの入力を検知する
 
+    入力元(コンソール, ローカルのソケット)ごとのスレッドが受け取ったコマンドをキューに入れていき､
+    測定のループがget_commandで1つずつ取り出す. 複数のコマンドが続けて来てもキューに溜まるので取りこぼさない.
+    コマンドが来るとarrivedがセットされるので､ updateの間隔を待っている間でもすぐに起きられる
+
     Attributes
     ----------
 
-    __comand: Optional[str]
-        入力されたコマンド
+    __commands: deque[str]
+        入力されたコマンドのキュー
         スレッド間で共有する
-        コマンド入力がないときはNone
 
-    __isfinish:bool
-        測定の終了
+    arrived: threading.Event
+        キューにコマンドがあるときにセットされる
+
+    port: Optional[int]
+        コマンドを受け付けるソケットのポート番号(ソケットを使わないときはNone)
     """
 
-    __command: Optional[str] = None
+    class CommandReceiverError(MyException):
+        """コマンド入力関連の例外クラス"""
+
     __measurement_state = None
+    port: Optional[int] = None
 
     def __init__(self, measurement_state: MeasurementState) -> None:
         self.__measurement_state = measurement_state
+        self.__commands = deque()
+        self.__lock = threading.Lock()
+        self.arrived = threading.Event()
+        self.__console = True
+        self.__server: Optional[socket.socket] = None
+        self.__server_thread: Optional[threading.Thread] = None
+        self.__requested_port: Optional[int] = None
+        self.__console_reader: Optional[console.ConsoleReader] = None
+
+    def set_source(self, use_console: bool = True, port: Optional[int] = None) -> None:
+        """コマンドの入力元を設定する(initializeより前に呼ぶ)
+
+        Parameter
+        ---------
+        use_console : bool
+            コンソールからの入力を受け付けるか
+
+        port : int or None
+            intのときは127.0.0.1のこのポートでソケットの接続を受け付けて､ 1行を1つのコマンドとする(0なら空いているポート)
+        """
+        if type(use_console) is not bool:
+            raise self.CommandReceiverError(
+                "set_command_sourceの引数に問題があります : consoleの値はboolです"
+            )
+        if port is not None and (type(port) is not int or not 0 <= port <= 65535):
+            raise self.CommandReceiverError(
+                "set_command_sourceの引数に問題があります : portは0から65535のintかNoneです"
+            )
+        self.__console = use_console
+        self.__requested_port = port
 
     def initialize(self) -> None:
         """
-        別スレッドで__command_receive_threadを実行
+        入力元ごとに別スレッドで受け取りを始める
         """
-        cmthr = threading.Thread(target=self.__command_receive_thread)
-        cmthr.setDaemon(True)
-        cmthr.start()
+        if self.__console:
+            self.__console_reader = console.ConsoleReader()
+            cmthr = threading.Thread(
+                target=self.__command_receive_thread,
+                args=(self.__console_reader,),
+                daemon=True,
+            )
+            cmthr.start()
+        if self.__requested_port is not None:
+            self.__server = socket.create_server(("127.0.0.1", self.__requested_port))
+            self.port = self.__server.getsockname()[1]
+            logger.info("command port:%d", self.port)
+            print(f"command port: {self.port}")
+            self.__server_thread = threading.Thread(
+                target=self.__socket_accept_thread, args=(self.__server,), daemon=True
+            )
+            self.__server_thread.start()
+
+    def put_command(self, command: str) -> None:
+        """コマンドをキューに入れて待っている側を起こす"""
+        logger.info("command:%s", command)
+        with self.__lock:
+            self.__commands.append(command)
+            self.arrived.set()
+
+    # コマンドの入力待ち, これは別スレッドで動かす
+    def __command_receive_thread(self, reader: console.ConsoleReader) -> None:
+        """コンソールから1行ずつコマンドを受け取る. closeされるか標準入力が閉じられたら終わる"""
+        while True:
+            command = reader.readline()  # 入力があればすぐに戻る
+            if command is None:
+                break
+            if command != "" and self.__measurement_state.is_measuring():
+                self.put_command(command)
 
-    def __command_receive_thread(self) -> None:  # 終了コマンドの入力待ち, これは別スレッドで動かす
+    def __socket_accept_thread(self, server: socket.socket) -> None:
+        """ソケットへの接続を待つ. 接続ごとに受け取り用のスレッドを作る"""
         while True:
-            if (
-                msvcrt.kbhit() and self.__measurement_state.is_measuring()
-            ):  # 入力が入って初めてinputが動くように(inputが動くとその間ループを抜けられないので)
-                command = input()
-                if command != "":
-                    self.__command = command
-                    logger.info("command:%s", self.__command)
-                    while self.__command is not None:
-                        time.sleep(0.1)
-            elif self.__measurement_state.has_finished_measurement():
+            try:
+                connection, _ = server.accept()
+            except OSError:  # closeでソケットが閉じられた
+                break
+            # closeのshutdownで起こされたときは接続を受け付けずに終わる
+            if self.__server is not server:
+                connection.close()
                 break
-            time.sleep(0.1)
+            conthr = threading.Thread(
+                target=self.__socket_receive_thread, args=(connection,), daemon=True
+            )
+            conthr.start()
+
+    def __socket_receive_thread(self, connection: socket.socket) -> None:
+        """接続先から1行ずつコマンドを受け取る. 測定が終わったあとに来たコマンドは捨てる"""
+        with connection, connection.makefile("r", encoding="utf-8") as reader:
+            try:
+                for line in reader:
+                    command = line.strip()
+                    if (
+                        command != ""
+                        and not self.__measurement_state.has_finished_measurement()
+                    ):
+                        self.put_command(command)
+            except (OSError, UnicodeDecodeError):
+                logger.exception("コマンドの受け取りでエラーが発生しました")
+
+    def get_command(self) -> Optional[str]:
+        """受け取ったコマンドを古い順に1つ返す. なければNoneを返す"""
+        with self.__lock:
+            if not self.__commands:
+                return None
+            command = self.__commands.popleft()
+            if not self.__commands:
+                self.arrived.clear()
+            return command
+
+    def close(self) -> None:
+        """コンソールとソケットでの受け付けをやめる(終了時のinputとコンソールの入力を取り合わないように)"""
+        if self.__console_reader is not None:
+            self.__console_reader.close()
+            self.__console_reader = None
+        if self.__server is not None:
+            server, self.__server = self.__server, None
+            # Linuxではcloseだけではaccept中のスレッドが起きないのでshutdownで起こす
+            try:
+                server.shutdown(socket.SHUT_RDWR)
+            # 起こす前に終わっていたときやWindowsで待ち受けのソケットをshutdownできないとき
+            except OSError:
+                pass
+            server.close()
+            self.__server_thread.join(timeout=1)
+            if self.__server_thread.is_alive():
+                logger.warning("ソケットの受け付けのスレッドが終了しませんでした")
+            self.__server_thread = None
+
+
+class UpdateScheduler:
+    """updateを一定の間隔で呼ぶための待ち合わせをする
+
+    呼ぶ時刻は最初に呼んだ時刻からintervalの整数倍の格子の上にとる(perf_counterの単調な時計で測る).
+    updateにかかった時間は次の待ち時間から差し引くので､ 処理の時間で周期がずれていくことはない.
+    updateがintervalより長くかかって格子の時刻を過ぎてしまったときは､ 過ぎた時刻は飛ばして(overrun)
+    すぐに呼び､ その後も同じ格子に乗せる.
+
+    Attributes
+    ----------
+    interval : float
+        updateを呼ぶ間隔(秒)
+
+    count : int
+        updateを呼んだ回数
+
+    overrun_count : int
+        間に合わずに飛ばした格子の時刻の数
+    """
+
+    class UpdateSchedulerError(MyException):
+        """updateの間隔の設定関連の例外クラス"""
+
+    def __init__(self, interval: float) -> None:
+        if type(interval) is not float and type(interval) is not int:
+            raise self.UpdateSchedulerError(
+                "set_update_intervalの引数に問題があります : intervalの型はintかfloatです"
+            )
+        if interval <= 0:
+            raise self.UpdateSchedulerError(
+                "set_update_intervalの引数に問題があります : intervalの値は0より大きくする必要があります"
+            )
+        self.interval = interval
+        self.count = 0
+        self.overrun_count = 0
+        self.__next_time: Optional[float] = None  # 次にupdateを呼ぶ格子の時刻
+        # 格子の時刻からの遅れ(jitter)の集計
+        self.__delay_sum = 0.0
+        self.__delay_square_sum = 0.0
+        self.__delay_max = 0.0
+
+    def wait(
+        self, max_wait: float = 0.1, interrupt: Optional[threading.Event] = None
+    ) -> bool:
+        """次の格子の時刻まで待つ. ただしmax_wait秒待っても時刻にならなければFalseを返す(その間に終了などを確認するため)
+
+        interruptがセットされたとき(コマンドが来たときなど)も待つのをやめてFalseを返す.
+        Trueを返したときはすぐにupdateを呼ぶ
+        """
+        now = time.perf_counter()
+        if self.__next_time is None:  # 最初の1回で格子の原点を決める
+            self.__next_time = now
+        remaining = self.__next_time - now
+        if remaining > 0:
+            if interrupt is None:
+                time.sleep(min(remaining, max_wait))
+            elif interrupt.wait(min(remaining, max_wait)):
+                return False
+            now = time.perf_counter()
+            if now < self.__next_time:
+                return False
+
+        # 遅れが1周期以上なら過ぎた格子の時刻は飛ばす
+        missed = int((now - self.__next_time) // self.interval)
+        if missed > 0:
+            if self.overrun_count == 0:
+                logger.warning(
+                    "updateの処理がset_update_intervalの間隔(%g秒)に間に合っていません",
+                    self.interval,
+                )
+            self.overrun_count += missed
+            self.__next_time += missed * self.interval
+        delay = now - self.__next_time
+        self.count += 1
+        self.__delay_sum += delay
+        self.__delay_square_sum += delay * delay
+        self.__delay_max = max(self.__delay_max, delay)
+        self.__next_time += self.interval
+        return True
+
+    def summary(self) -> dict:
+        """updateを呼んだ回数と間に合わなかった数と遅れ(jitter)の平均､ 標準偏差､ 最大(秒)"""
+        mean = self.__delay_sum / self.count if self.count > 0 else 0.0
+        variance = (
+            self.__delay_square_sum / self.count - mean * mean
+            if self.count > 0
+            else 0.0
+        )
+        return {
+            "count": self.count,
+            "overrun_count": self.overrun_count,
+            "jitter_mean": mean,
+            "jitter_std": max(variance, 0.0) ** 0.5,
+            "jitter_max": self.__delay_max,
+        }
+
+    def log_summary(self) -> None:
+        """測定の終了時に集計をログに出す"""
+        summary = self.summary()
+        logger.info(
+            "update : 間隔 %g秒, %d回, 間に合わなかった数 %d, 遅れ 平均 %.2fms 標準偏差 %.2fms 最大 %.2fms",
+            self.interval,
+            summary["count"],
+            summary["overrun_count"],
+            summary["jitter_mean"] * 1e3,
+            summary["jitter_std"] * 1e3,
+            summary["jitter_max"] * 1e3,
+        )
+
+
+class LoopProfiler:
+    """測定ループの各処理(update, save, plot, コマンドの処理)にかかった時間の集計
+
+    時間はperf_counter_nsで測り､ 処理ごとに2のべき乗の幅のビン(ヒストグラム)に数える.
+    1回の記録はリストの添字に1を足すだけなので､ 常に有効にしておいても測定の邪魔にはならない.
+    saveとplotはupdateの中から呼ばれるので､ updateの時間にはsaveとplotの時間も含まれる.
 
-    def get_command(self) -> str:
-        """受け取ったコマンドを返す. なければNoneを返す"""
-        command = self.__command
-        self.__command = None
-        return command
+    csvのファイルを設定したときは､ updateかコマンドの処理を1回呼ぶごとにその間の各処理の時間を1行書き込む.
+
+    Attributes
+    ----------
+    iteration_count : int
+        updateかコマンドの処理を呼んだ回数(end関数を呼んだときはその1回も含む)
+    """
+
+    # 処理の番号
+    UPDATE = 0
+    SAVE = 1
+    PLOT = 2
+    COMMAND = 3
+    PHASES = ("update", "save", "plot", "command")
+    BIN_COUNT = 65  # int.bit_lengthの値(0～64). i番目のビンは[2^(i-1), 2^i)ナノ秒
+
+    class LoopProfilerError(MyException):
+        """ループの時間の集計関連の例外クラス"""
+
+    def __init__(self) -> None:
+        self.iteration_count = 0
+        self.__histograms = [[0] * self.BIN_COUNT for _ in self.PHASES]
+        self.__totals = [0] * len(self.PHASES)
+        self.__maxes = [0] * len(self.PHASES)
+        self.__iteration = [0] * len(self.PHASES)  # csvに書く1回分の時間
+        self.__csv = None
+        self.__start_ns = time.perf_counter_ns()
+
+    def set_csv(self, filepath: str) -> None:
+        """1回ごとの時間を書き込むcsvのファイルを設定する"""
+        if type(filepath) is not str:
+            raise self.LoopProfilerError(
+                "set_loop_profileの引数に問題があります : csv_filepathの型はstrです"
+            )
+        if self.__csv is not None:
+            self.__csv.close()
+        self.__csv = open(filepath, "w", encoding="utf-8")
+        self.__csv.write(
+            "iteration,time [s],"
+            + ",".join(f"{phase} [ns]" for phase in self.PHASES)
+            + "\n"
+        )
+        self.__start_ns = time.perf_counter_ns()
+        self.__iteration = [0] * len(self.PHASES)
+
+    def record(self, phase: int, elapsed_ns: int) -> None:
+        """処理phaseにelapsed_nsナノ秒かかったことを記録する"""
+        self.__histograms[phase][elapsed_ns.bit_length()] += 1
+        self.__totals[phase] += elapsed_ns
+        if elapsed_ns > self.__maxes[phase]:
+            self.__maxes[phase] = elapsed_ns
+        if self.__csv is not None:
+            self.__iteration[phase] += elapsed_ns
+
+    def record_iteration(self, phase: int, elapsed_ns: int) -> None:
+        """recordしてからend_iterationする
+
+        測定ループで毎回呼ぶので､ メソッドの呼び出しを減らすためにcsvがないときの処理をここにも書いている
+        """
+        self.__histograms[phase][elapsed_ns.bit_length()] += 1
+        self.__totals[phase] += elapsed_ns
+        if elapsed_ns > self.__maxes[phase]:
+            self.__maxes[phase] = elapsed_ns
+        if self.__csv is None:
+            self.iteration_count += 1
+        else:
+            self.__iteration[phase] += elapsed_ns
+            self.end_iteration()
+
+    def end_iteration(self) -> None:
+        """updateかコマンドの処理(またはend関数)を1回呼び終わったときに呼ぶ"""
+        self.iteration_count += 1
+        if self.__csv is not None:
+            elapsed = (time.perf_counter_ns() - self.__start_ns) / 1e9
+            self.__csv.write(
+                f"{self.iteration_count},{elapsed:.6f},{','.join(map(str, self.__iteration))}\n"
+            )
+            self.__iteration = [0] * len(self.PHASES)
+
+    def summary(self) -> dict:
+        """処理ごとの集計. 時間はナノ秒
+
+        中央値(p50)と99%点(p99)はヒストグラムから求めるのでビンの上端(2のべき乗)の値になる
+        """
+        summary = {}
+        for phase, name in enumerate(self.PHASES):
+            histogram = self.__histograms[phase]
+            count = sum(histogram)
+            summary[name] = {
+                "count": count,
+                "total": self.__totals[phase],
+                "mean": self.__totals[phase] / count if count > 0 else 0.0,
+                "p50": self.__quantile(histogram, count, 0.5),
+                "p99": self.__quantile(histogram, count, 0.99),
+                "max": self.__maxes[phase],
+                "histogram": list(histogram),
+            }
+        return summary
+
+    @staticmethod
+    def __quantile(histogram: List[int], count: int, q: float) -> int:
+        if count == 0:
+            return 0
+        cumulative = 0
+        for i, n in enumerate(histogram):
+            cumulative += n
+            if cumulative >= q * count:
+                return 1 << i if i > 0 else 0
+        return 1 << (len(histogram) - 1)
+
+    def log_summary(self) -> None:
+        """測定の終了時に集計をログに出す"""
+        for name, result in self.summary().items():
+            if result["count"] == 0:
+                continue
+            logger.info(
+                "処理時間 %s : %d回, 合計 %.3fs, 平均 %.1fus, 中央値 <%.1fus, 99%% <%.1fus, 最大 %.1fus",
+                name,
+                result["count"],
+                result["total"] / 1e9,
+                result["mean"] / 1e3,
+                result["p50"] / 1e3,
+                result["p99"] / 1e3,
+                result["max"] / 1e3,
+            )
+
+    def close(self) -> None:
+        """csvのファイルを閉じる"""
+        if self.__csv is not None:
+            self.__csv.close()
+            self.__csv = None
 
 
 class PlotAgency:
@@ -205,15 +1090,12 @@ class PlotAgency:
 
     Attributes
     ----------
-    share_list : List[tupple]
-        plot.pyと共有するリスト. これを使ってplot.py側にデータを送信する.
+    plot_buffer : PlotBuffer
+        plot.pyと共有するリングバッファ. これを使ってplot.py側にデータを送信する.
 
     __isfinish : Value
         これもplot.pyと共有。 測定の終了をplot.pyに伝える
 
-    process_lock : Lock
-        これもplot.pyと共有。 share_listへの書き込みを同時に行わないように
-
     plot_process: Process
         plot.pyを実行しているプロセス
     """
@@ -221,31 +1103,62 @@ class PlotAgency:
     class PlotAgentError(MyException):
         """プロット仲介クラス関連の例外クラス"""
 
-    share_list: List[tuple[float, float, str]]
+    plot_buffer: PlotBuffer
     __isfinish: Value
-    process_lock: Lock
-    plot_process: Process
+    plot_process: Optional[Process] = None
 
     def __init__(self) -> None:
         self.set_plot_info()
 
-    def run_plot_window(self) -> None:  # グラフと終了コマンド待ち処理を走らせる
-        """SSRではマルチプロセスを用いて測定プロセスとは別のプロセスでグラフの描画を行う.
+    def prewarm(self) -> None:
+        """グラフ描画用のプロセスを先に起動しておく.
 
-        Pythonのマルチプロセスでは必要な値はプロセスの作成時に渡しておかなくてはならないので､(例外あり)
-        ここではマルチプロセスの起動と必要な引数の受け渡しを行う.
+        子プロセスではmatplotlibの読み込みに数秒かかるので､ startの実行と並行して済ませておく.
+        plot_infoはrun_plot_windowで後からPipeで渡す. 既に起動しているときは何もしない
         """
-
-        self.share_list = Manager().list()  # プロセス間で共有できるリスト
+        if self.plot_process is not None:
+            return
+        self.plot_buffer = PlotBuffer()  # プロセス間で共有するリングバッファ
         self.__isfinish = Value("i", 0)  # 測定の終了を判断するためのint
-        self.process_lock = Lock()  # 2つのプロセスで同時に同じデータを触らないようにする排他制御のキー
+        receiver, self.__control = Pipe(duplex=False)  # plot_infoを渡す
         # グラフ表示は別プロセスで実行する
         self.plot_process = Process(
-            target=plot.start_plot_window,
-            args=(self.share_list, self.__isfinish, self.process_lock, self.plot_info),
+            target=plot.wait_plot_info,
+            args=(self.plot_buffer, self.__isfinish, receiver),
         )
         self.plot_process.daemon = True  # プロセスのデーモン化
         self.plot_process.start()  # マルチプロセス実行
+        receiver.close()  # 受信側は子プロセスだけが持つ
+
+    # グラフと終了コマンド待ち処理を走らせる
+    def run_plot_window(self, filepath=None) -> None:
+        """SSRではマルチプロセスを用いて測定プロセスとは別のプロセスでグラフの描画を行う.
+
+        Pythonのマルチプロセスでは必要な値はプロセスの作成時に渡しておかなくてはならないので､(例外あり)
+        プロセスはprewarmで先に起動しておき､ ここではplot_infoの受け渡しを行う(起動していなければここで起動する).
+
+        Parameter
+        ---------
+        filepath : str or None
+            測定データのファイルのパス. グラフを画像に保存するときは"{拡張子を除いたパス}_plot.png"に保存する.
+            Noneのときは"DATADIR/{日付}_plot.png"に保存する
+        """
+
+        plot_info = self.plot_info
+        if plot_info["snapshot_interval"] > 0:
+            plot_info = dict(plot_info, snapshot_path=self.snapshot_filepath(filepath))
+            logger.info("グラフは%sに保存されます", plot_info["snapshot_path"])
+        self.prewarm()
+        self.__control.send(plot_info)
+        self.__control.close()
+
+    def snapshot_filepath(self, filepath=None) -> str:
+        """グラフを保存する画像のパス"""
+        extension = self.plot_info["snapshot_format"]
+        if filepath is None:
+            return f"{USER_VARIABLES.DATADIR}/{get_date_text()}_plot.{extension}"
+        root, _ = os.path.splitext(str(filepath))
+        return f"{root}_plot.{extension}"
 
     def set_plot_info(
         self,
@@ -255,6 +1168,11 @@ class PlotAgency:
         renew_interval=1,
         legend=False,
         flowwidth=0,
+        max_points=0,
+        blit=False,
+        max_fps=0,
+        snapshot_interval=0,
+        snapshot_format="png",
     ) -> None:  # プロット情報の入力
         """グラフ描画プロセスに渡す値はここで設定する.
 
@@ -277,6 +1195,25 @@ class PlotAgency:
 
         flowwidth : float (>0)
             これが0より大きい値のとき. グラフの横軸は固定され､横にプロットが流れるようなグラフになる.
+
+        max_points : int (>=0)
+            これが0より大きい値のとき. 1本の線の点がこれを超えたら形を保ったまま間引いてだいたいこの点数以下で描画する.
+            (データは全て残るので拡大すると間引かれた点も見える. 長時間の測定でグラフが重くなるとき用)
+
+        blit : bool
+            Trueのとき. 軸や凡例を背景として保存しておき､ 更新では線だけを描き直す(ラベルが多いときに軽くなる).
+            表示範囲は余白をつけて広げるので､ はみ出したときだけ全体を描き直す
+
+        max_fps : float (>=0)
+            これが0より大きい値のとき. 新しい点が来たらrenew_intervalを待たずに(最大で1秒にmax_fps回)描き直す.
+            描き直しに時間がかかるときは間隔を延ばし､ 点が来ないときはrenew_interval秒ごとに確認するだけになる
+
+        snapshot_interval : float (>=0)
+            これが0より大きい値のとき. ウィンドウを出さずに､ この間隔(秒)でグラフを画像に保存する(GUIのないリモート接続用).
+            保存先は測定データのファイルと同じ場所の"{ファイル名}_plot.{snapshot_format}"(毎回上書き)
+
+        snapshot_format : str ("png" or "svg")
+            保存する画像の形式
         """
 
         if type(line) is not bool:
@@ -285,6 +1222,10 @@ class PlotAgency:
             raise self.PlotAgentError("set_plot_infoの引数に問題があります : xlog,ylogの値はboolです")
         if type(legend) is not bool:
             raise self.PlotAgentError("set_plot_infoの引数に問題があります : legendの値はboolです")
+        if type(blit) is not bool:
+            raise self.PlotAgentError(
+                "set_plot_infoの引数に問題があります : blitの値はboolです"
+            )
         if type(flowwidth) is not float and type(flowwidth) is not int:
             raise self.PlotAgentError(
                 "set_plot_infoの引数に問題があります : flowwidthの型はintかfloatです"
@@ -293,10 +1234,34 @@ class PlotAgency:
             raise self.PlotAgentError(
                 "set_plot_infoの引数に問題があります : flowwidthの値は0以上にする必要があります"
             )
+        if type(max_points) is not int or max_points < 0:
+            raise self.PlotAgentError(
+                "set_plot_infoの引数に問題があります : max_pointsは0以上のintです"
+            )
         if type(renew_interval) is not float and type(renew_interval) is not int:
             raise self.PlotAgentError(
                 "set_plot_infoの引数に問題があります : renew_intervalの型はintかfloatです"
             )
+        if type(max_fps) is not float and type(max_fps) is not int:
+            raise self.PlotAgentError(
+                "set_plot_infoの引数に問題があります : max_fpsの型はintかfloatです"
+            )
+        if max_fps < 0:
+            raise self.PlotAgentError(
+                "set_plot_infoの引数に問題があります : max_fpsの値は0以上にする必要があります"
+            )
+        if type(snapshot_interval) is not float and type(snapshot_interval) is not int:
+            raise self.PlotAgentError(
+                "set_plot_infoの引数に問題があります : snapshot_intervalの型はintかfloatです"
+            )
+        if snapshot_interval < 0:
+            raise self.PlotAgentError(
+                "set_plot_infoの引数に問題があります : snapshot_intervalの値は0以上にする必要があります"
+            )
+        if snapshot_format not in ("png", "svg"):
+            raise self.PlotAgentError(
+                'set_plot_infoの引数に問題があります : snapshot_formatは"png"か"svg"です'
+            )
         if renew_interval < 0:
             raise self.PlotAgentError(
                 "set_plot_infoの引数に問題があります : renew_intervalの型は0以上にする必要があります"
@@ -309,13 +1274,19 @@ class PlotAgency:
             "renew_interval": renew_interval,
             "legend": legend,
             "flowwidth": flowwidth,
+            "max_points": max_points,
+            "blit": blit,
+            "max_fps": max_fps,
+            "snapshot_interval": snapshot_interval,
+            "snapshot_format": snapshot_format,
         }
 
     def plot(self, x, y, label="default") -> None:
         """データをグラフ描画プロセスに渡す.
 
         labelが変わると色が変わる
-        __share_listは測定プロセスとグラフ描画プロセスの橋渡しとなるリストでバッファーの役割をする
+        plot_bufferは測定プロセスとグラフ描画プロセスの橋渡しとなるバッファー.
+        描画が追いつかずにバッファーがいっぱいのときは測定を止めないように点を捨てる
 
         Parameter
         ---------
@@ -329,18 +1300,59 @@ class PlotAgency:
         """
 
         if self.is_plot_window_alive():
-            data = (x, y, label)
-            self.process_lock.acquire()  #   ロックをかけて別プロセスからアクセスできないようにする
-            self.share_list.append(data)  # プロセス間で共有するリストにデータを追加
-            self.process_lock.release()  # ロック解除
+            if not self.plot_buffer.write(x, y, label):
+                self.__warn_dropped()
+
+    def plot_many(self, x, y, label="default") -> None:
+        """複数の点をまとめてグラフ描画プロセスに渡す. 1回の受け渡しで済むのでplotを繰り返すより速い
+
+        Parameter
+        ---------
+
+        x,y : 1次元の配列(numpy.ndarrayやlist)
+            プロットのx,y座標. 同じ長さにする
+
+        label : string or float
+            全ての点に共通の識別ラベル.
+        """
+        try:
+            x = np.asarray(x, dtype=np.float64).ravel()
+            y = np.asarray(y, dtype=np.float64).ravel()
+        except (TypeError, ValueError) as e:
+            raise self.PlotAgentError(
+                "plot_manyの引数に問題があります : x,yは数値の配列です"
+            ) from e
+        if len(x) != len(y):
+            raise self.PlotAgentError(
+                "plot_manyの引数に問題があります : xとyの長さが違います"
+            )
+
+        if self.is_plot_window_alive():
+            if self.plot_buffer.write_many(x, y, label) < len(x):
+                self.__warn_dropped()
+
+    __dropped_warned = False
+
+    def __warn_dropped(self) -> None:
+        if not self.__dropped_warned:
+            self.__dropped_warned = True
+            logger.warning("グラフの描画が追いつかないのでプロットする点を捨てています")
 
     def stop_renew_plot_window(self) -> None:
         """プロットウィンドウの更新を停止"""
         self.__isfinish.value = 1
+        if self.plot_buffer.dropped_count > 0:
+            logger.warning(
+                "描画が追いつかずに捨てた点の数 : %d", self.plot_buffer.dropped_count
+            )
 
     def close(self) -> None:
-        """プロットウィンドウを閉じる"""
+        """プロットウィンドウを閉じる(prewarmで起動しただけのプロセスも終了する)"""
+        if self.plot_process is None:
+            return
         self.plot_process.terminate()
+        self.plot_process.join()
+        self.plot_buffer.close()
 
     def is_plot_window_alive(self) -> bool:
         """self.plot_processが生きているかどうかを判定"""
@@ -360,21 +1372,23 @@ class PlotAgency:
         def __init__(self) -> None:
             """グラフを表示しないモード"""
 
-            def void(*args):
+            def void(*args, **kwargs):
                 """何も返さない関数"""
 
             def void_constant(value):
                 """定数を返す関数を返す関数"""
 
-                def void(*args):
+                def void(*args, **kwargs):
                     """定数を返す関数"""
                     return value
 
                 return void
 
+            self.prewarm = void
             self.run_plot_window = void
             self.set_plot_info = void
             self.plot = void
+            self.plot_many = void
             self.stop_renew_plot_window = void
             self.close = void
             self.is_plot_window_alive = void_constant(False)
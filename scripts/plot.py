@@ -3,11 +3,18 @@
     (データ数が増えてプロットに時間がかかっても測定に影響が出ないようにする)
 
 """
+
+import os
 import time
-from multiprocessing import Lock
-from typing import List, Optional
+from logging import getLogger
+from typing import Optional
 
+import matplotlib
 import matplotlib.pyplot as plt
+import numpy as np
+from plot_buffer import PlotBuffer
+
+logger = getLogger(__name__)
 
 # 色の配列
 colormap: tuple[str] = (
@@ -36,17 +43,143 @@ colormap: tuple[str] = (
 )
 
 
+def extend_range(
+    values: np.ndarray, min_value: Optional[float], max_value: Optional[float]
+) -> tuple[Optional[float], Optional[float], bool]:
+    """valuesが今までの範囲[min_value, max_value]の外にあれば範囲を広げる
+
+    範囲がまだないとき(None)は最初の点で範囲を決めるだけで広げたことにはしない. nanは無視する
+
+    Returns
+    -------
+    min_value, max_value : 新しい範囲
+    relim : 範囲を広げたかどうか
+    """
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return min_value, max_value, False
+    if max_value is None:
+        min_value = max_value = values[0].item()
+        values = values[1:]
+        if len(values) == 0:
+            return min_value, max_value, False
+
+    relim = False
+    if values.max() > max_value:
+        max_value = values.max().item()
+        relim = True
+    if values.min() < min_value:
+        min_value = values.min().item()
+        relim = True
+    return min_value, max_value, relim
+
+
+def decimate_indices(x: np.ndarray, y: np.ndarray, bucket: int) -> np.ndarray:
+    """点をbucket個ずつに区切り､ 各区間で形を保つのに必要な点の番号だけを返す(M4法をx,y両方に使ったもの)
+
+    区間ごとに最初と最後の点､ yが最小と最大の点､ xが最小と最大の点の最大6点を残すので､
+    時系列のグラフでも温度-抵抗のような散布図でも外形は変わらない. 最後の半端な区間は使わない
+
+    Returns
+    -------
+    indices : numpy.ndarray
+        残す点の番号(昇順)
+    """
+    num_bucket = len(x) // bucket
+    if num_bucket == 0:
+        return np.empty(0, dtype=np.int64)
+    x = x[: num_bucket * bucket].reshape(num_bucket, bucket)
+    y = y[: num_bucket * bucket].reshape(num_bucket, bucket)
+    candidates = np.column_stack(
+        [
+            np.zeros(num_bucket, dtype=np.int64),
+            np.full(num_bucket, bucket - 1, dtype=np.int64),
+            np.argmin(y, axis=1),
+            np.argmax(y, axis=1),
+            np.argmin(x, axis=1),
+            np.argmax(x, axis=1),
+        ]
+    )
+    candidates.sort(axis=1)
+    candidates += (np.arange(num_bucket, dtype=np.int64) * bucket)[:, np.newaxis]
+    candidates = candidates.ravel()
+    return candidates[np.concatenate([[True], candidates[1:] != candidates[:-1]])]
+
+
+def wait_plot_info(plot_buffer: PlotBuffer, isfinish, control) -> None:
+    """
+    先に起動しておいたプロセスで最初に実行される場所
+
+    このモジュール(matplotlib)の読み込みとバックエンドの準備を済ませて､ plot_infoがcontrolから届いたら描画を始める
+    """
+    matplotlib.get_backend()  # バックエンドのモジュールもここで読み込んでおく
+    try:
+        plot_info = control.recv()
+    except EOFError:  # plot_infoを送らずに閉じられたとき(no_plotなど)
+        return
+    finally:
+        control.close()
+    start_plot_window(plot_buffer, isfinish, plot_info)
+
+
 def start_plot_window(
-    share_list: List[tuple[float, float, str]],
+    plot_buffer: PlotBuffer,
     isfinish: bool,
-    lock: Lock,
     plot_info: dict,
 ) -> None:
     """
     別プロセスで最初に実行される場所
+
+    plot_infoのsnapshot_intervalが0より大きいときはウィンドウを出さずに画像に保存する
     """
+    plot_info = dict(plot_info)
+    snapshot_interval = plot_info.pop("snapshot_interval", 0)
+    snapshot_path = plot_info.pop("snapshot_path", None)
+    plot_info.pop("snapshot_format", None)  # 形式はsnapshot_pathの拡張子で決まる
+
+    if snapshot_interval > 0:
+        plt.switch_backend("Agg")  # ウィンドウを使わないバックエンドに切り替える
+        SnapshotWindow(
+            plot_buffer, isfinish, snapshot_path, snapshot_interval, **plot_info
+        ).run()
+    else:
+        PlotWindow(plot_buffer, isfinish, **plot_info).run()  # インスタンス作成, 実行
 
-    PlotWindow(share_list, isfinish, lock, **plot_info).run()  # インスタンス作成, 実行
+
+class RenewScheduler:
+    """グラフを描き直すまでの待ち時間を決める
+
+    描き直したあとは最大max_fps回/秒になるように待つ. 描き直すのにかかった時間が1回の間隔のうち
+    REDRAW_BUDGETの割合を超えるときは､ その割合に収まるまで待ち時間を延ばす(測定のプロセスにCPUを残す).
+    新しい点がないときは待ち時間を倍々に延ばしていき､ idle_interval秒で止める
+
+    Parameter
+    ---------
+    max_fps : float (>0)
+        1秒あたりの最大の描画回数
+
+    idle_interval : float
+        新しい点がないときの最大の待ち時間(秒)
+    """
+
+    REDRAW_BUDGET: float = 0.5
+
+    def __init__(self, max_fps: float, idle_interval: float) -> None:
+        self.min_interval = 1 / max_fps
+        self.idle_interval = max(idle_interval, self.min_interval)
+        self.__idle_wait = self.min_interval
+
+    def after_redraw(self, redraw_time: float) -> float:
+        """描き直したあとの待ち時間"""
+        self.__idle_wait = self.min_interval
+        budget_wait = redraw_time * (1 - self.REDRAW_BUDGET) / self.REDRAW_BUDGET
+        return max(self.min_interval - redraw_time, budget_wait)
+
+    def after_idle(self) -> float:
+        """新しい点がなかったときの待ち時間"""
+        wait = self.__idle_wait
+        self.__idle_wait = min(wait * 2, self.idle_interval)
+        return wait
 
 
 class PlotWindow:
@@ -54,15 +187,11 @@ class PlotWindow:
 
     Variables
     ---------
-    share_list :List
+    plot_buffer : PlotBuffer
         測定したデータを一時的に保管しておく場所
         非同期処理のため測定とプロットがずれるので, そのためにバッファーのようなものを挟む必要がある
-        測定側で測定データをshare_listに詰めていく
-        PlotWindowはshare_listのデータを取り込んでプロットした後に中身を消す
-        この処理が衝突しないようにlock(セマフォ)をかけて排他制御する
-
-    lock:
-        プロセス間の共有ファイルを同時に触らないためのロック
+        測定側で測定データをplot_bufferに詰めていく
+        PlotWindowはplot_bufferのデータを取り込んでプロットする(取り込んだ分はバッファーから消える)
 
     isfinish:
         測定が終了した可動化を判定.
@@ -83,23 +212,28 @@ class PlotWindow:
 
     def __init__(
         self,
-        share_list,
+        plot_buffer,
         isfinish,
-        lock,
         xlog,
         ylog,
         renew_interval,
         flowwidth,
         line,
         legend,
+        max_points=0,
+        blit=False,
+        max_fps=0,
     ) -> None:  # コンストラクタ
-        self.share_list = share_list
-        self.lock = lock
+        self.plot_buffer = plot_buffer
         self.interval = renew_interval
         self.flowwidth = flowwidth
         self.isfinish = isfinish
         self.legend = legend
         self.linestyle = None if line else "None"
+        self.max_points = max_points
+        self.max_fps = max_fps
+        # ラベル→LineObj(クラス変数のままだとインスタンス間で共有されるのでここで作る)
+        self.linedict = {}
 
         # プロットウィンドウを表示
         plt.ion()  # ここはコピペ
@@ -109,21 +243,45 @@ class PlotWindow:
             plt.xscale("log")  # 横軸をlogスケールに
         if ylog:
             plt.yscale("log")  # 縦軸をlogスケールに
+        self.xlog, self.ylog = xlog, ylog
+
+        # blitできるときは線以外(軸, 凡例)を背景として保存しておき､ 線だけを描き直す
+        self.blit = blit and self._figure.canvas.supports_blit
+        self.__background = None
+        if self.blit:
+            self._figure.canvas.mpl_connect("draw_event", self.__on_draw)
 
     def run(self) -> None:
-        """プロットの処理をループで回す"""
+        """プロットの処理をループで回す
+
+        max_fpsが0より大きいときは新しい点が来たらすぐ(最大max_fps回/秒)描き直し､ 点が来ないときは
+        ウィンドウの操作だけを受け付けながら間隔を延ばして待つ(最大renew_interval秒)
+        """
         interval: int = self.interval
-        while True:  # 一定時間ごとに更新
-            self.renew_window()
+        scheduler = RenewScheduler(self.max_fps, interval) if self.max_fps > 0 else None
+        while True:
+            if scheduler is None:  # 一定時間ごとに更新
+                self.renew_window()
+                wait = interval
+            elif self.plot_buffer.pending_count > 0:
+                start = time.perf_counter()
+                self.renew_window()
+                wait = scheduler.after_redraw(time.perf_counter() - start)
+            else:
+                self._figure.canvas.flush_events()
+                wait = scheduler.after_idle()
             if self.isfinish.value == 1 or (not plt.get_fignums()):  # 終了していたらbreak
+                if plt.get_fignums() and self.plot_buffer.pending_count > 0:
+                    self.renew_window()  # 最後に来た点まで描いておく
                 break
-            time.sleep(interval)
+            time.sleep(wait)
 
         if plt.get_fignums():
             plt.show(block=True)
 
     _count_label: int = 0
     linedict = {}
+    max_points: int = 0
     max_x: Optional[float] = None
     max_y: Optional[float] = None
     min_x: Optional[float] = None
@@ -131,32 +289,28 @@ class PlotWindow:
 
     def renew_window(self) -> None:
         """プロット画面の更新で呼ぶ関数"""
-        self.lock.acquire()  # 共有リストにロックをかける
-        # share_listのコピーを作成.(temp=share_listにすると参照になってしまうのでdel self.share_list[:]でtempも消えてしまう)
-        temp = self.share_list[:]  # [i for i in self.share_list]はかなり重い
-        del self.share_list[:]  # 共有リストは削除
-        self.lock.release()  # ロック解除
+        # 前回から増えた分を取り込む
+        x_values, y_values, label_ids = self.plot_buffer.read()
 
-        xrelim = False  # for文が1回も回らないことがあるのでここで宣言しておく
-        yrelim = False
-
-        for plotdata in temp:  # tempの中身をプロット
-            x_val, y_val, label = plotdata
+        # ラベルごとにまとめて線に追加する(色は初めて出てきたラベルの順に割り当てる)
+        unique_ids, first_index = np.unique(label_ids, return_index=True)
+        for label_id in unique_ids[np.argsort(first_index)].tolist():
+            is_label = label_ids == label_id
+            label = self.plot_buffer.label(label_id)
 
             if label not in self.linedict:  # 最初の一回だけは辞書に登録する
-                xarray = [x_val]
-                yaaray = [y_val]
                 color = colormap[(self._count_label) % len(colormap)]
                 self._count_label += 1
                 (line,) = self._ax.plot(
-                    xarray,
-                    yaaray,
+                    [],
+                    [],
                     marker=".",
                     color=color,
                     label=label,
                     linestyle=self.linestyle,
+                    animated=self.blit,  # blitするときは全体の再描画に含めない
                 )  # プロット
-                lineobj = self.LineObj(line, xarray, yaaray)  # 辞書に追加
+                lineobj = self.LineObj(line, max_points=self.max_points)  # 辞書に追加
                 self.linedict[label] = lineobj
 
                 if self.legend:
@@ -180,36 +334,22 @@ class PlotWindow:
                         ncol=ncol,
                     )
 
-            else:  # 2回目以降は色をキーにして辞書からLineObjをとってくる
+                self.__background = None  # 凡例が変わるので背景から描き直す
+
+            else:  # 2回目以降はラベルをキーにして辞書からLineObjをとってくる
                 lineobj = self.linedict[label]
-                lineobj.xarray.append(x_val)
-                lineobj.yaaray.append(y_val)
-                lineobj.line.set_data(lineobj.xarray, lineobj.yaaray)
-
-            # 今までの範囲の外にプロットしたときは範囲を更新
-            if self.max_x is None:
-                self.max_x = x_val
-            elif self.max_x < x_val:
-                self.max_x = x_val
-                xrelim = True
-
-            if self.max_y is None:
-                self.max_y = y_val
-            elif self.max_y < y_val:
-                self.max_y = y_val
-                yrelim = True
-
-            if self.min_x is None:
-                self.min_x = x_val
-            elif self.min_x > x_val:
-                self.min_x = x_val
-                xrelim = True
-
-            if self.min_y is None:
-                self.min_y = y_val
-            elif self.min_y > y_val:
-                self.min_y = y_val
-                yrelim = True
+            # まとめて追加してset_dataは1回だけ
+            lineobj.extend(x_values[is_label], y_values[is_label])
+            lineobj.update_line()
+
+        # 今までの範囲の外にプロットしたときは範囲を更新
+        self.min_x, self.max_x, xrelim = extend_range(x_values, self.min_x, self.max_x)
+        self.min_y, self.max_y, yrelim = extend_range(y_values, self.min_y, self.max_y)
+
+        if self.blit:
+            self.__renew_range_with_margin(xrelim, yrelim)
+            self.__redraw(len(x_values) > 0)
+            return
 
         if xrelim or yrelim:
             if self.flowwidth <= 0:
@@ -226,24 +366,324 @@ class PlotWindow:
 
                 # 範囲外のプロットは消す
                 for line_obj in self.linedict.values():
-                    xarray = line_obj.xarray
-                    yaaray = line_obj.yaaray
-                    cut = 0
-                    for i, xvalue in enumerate(xarray):
-                        if xvalue < xmin:
-                            continue
-                        else:
-                            cut = max(i - 1, 0)
-                            break
-                    line_obj.xarray = xarray[cut:]
-                    line_obj.yaaray = yaaray[cut:]
+                    line_obj.cut_before(xmin)
 
         self._figure.canvas.flush_events()  # グラフを再描画するおまじない
 
+    # blitのときに範囲を広げる際の余白(データの幅に対する割合). 範囲が少し広がるたびに全体を描き直さないようにする
+    LIMIT_MARGIN: float = 0.1
+
+    def __renew_range_with_margin(self, xrelim: bool, yrelim: bool) -> None:
+        """今の表示範囲からはみ出したときだけ余白をつけて範囲を広げる(範囲を変えたら背景を描き直す)"""
+        if self.flowwidth <= 0:
+            if xrelim and self.__expand_lim(
+                self._ax.get_xlim, self._ax.set_xlim, self.min_x, self.max_x, self.xlog
+            ):
+                self.__background = None
+        else:
+            xmin, xmax = self._ax.get_xlim()
+            if xrelim:
+                # 最初は横幅をflowwidthに合わせる. 以後は先頭が右端を超えたら余白の分だけ先まで一度に送る
+                is_width_changed = (
+                    abs(xmax - xmin - self.flowwidth) > self.flowwidth * 1e-9
+                )
+                if is_width_changed or self.max_x > xmax:
+                    xmax = self.max_x + self.flowwidth * self.LIMIT_MARGIN
+                    xmin = xmax - self.flowwidth
+                    self._ax.set_xlim(xmin, xmax)
+                    self.__background = None
+                for line_obj in self.linedict.values():  # 範囲外のプロットは消す
+                    line_obj.cut_before(xmin)
+        if yrelim and self.__expand_lim(
+            self._ax.get_ylim, self._ax.set_ylim, self.min_y, self.max_y, self.ylog
+        ):
+            self.__background = None
+
+    def __expand_lim(
+        self, get_lim, set_lim, min_value: float, max_value: float, log: bool
+    ) -> bool:
+        """[min_value, max_value]が今の範囲に収まっていなければ余白をつけて範囲を設定してTrueを返す"""
+        lower, upper = get_lim()
+        if lower <= min_value and max_value <= upper:
+            return False
+        if log and min_value > 0:  # 対数軸では対数をとった幅で余白をつける
+            margin = (max_value / min_value) ** self.LIMIT_MARGIN
+            set_lim(min_value / margin, max_value * margin)
+        else:
+            margin = (max_value - min_value) * self.LIMIT_MARGIN
+            set_lim(min_value - margin, max_value + margin)
+        return True
+
+    def __on_draw(self, event) -> None:
+        """全体を描き直したとき(範囲の変更, ウィンドウの拡大縮小など)に背景を取り直して線を描く"""
+        canvas = self._figure.canvas
+        self.__background = canvas.copy_from_bbox(self._figure.bbox)
+        for line_obj in self.linedict.values():
+            self._ax.draw_artist(line_obj.line)
+
+    def __redraw(self, is_updated: bool) -> None:
+        """背景が使えるときは背景を貼ってから線だけを描き直す. 新しい点がなければ何もしない"""
+        canvas = self._figure.canvas
+        if self.__background is None:
+            canvas.draw_idle()  # draw_eventで背景を取り直す
+        elif is_updated:
+            canvas.restore_region(self.__background)
+            for line_obj in self.linedict.values():
+                self._ax.draw_artist(line_obj.line)
+            canvas.blit(self._figure.bbox)
+        canvas.flush_events()
+
     class LineObj:
-        """matplotlibでプロットしたグラフの線1つにつきこれが1つ作られる"""
+        """matplotlibでプロットしたグラフの線1つにつきこれが1つ作られる
+
+        点はx,yそれぞれfloat64の配列に溜めていき､ 足りなくなったら容量を倍にする(1点あたりの追加はならしてO(1)).
+        set_dataには使っている範囲のviewを渡すので､ 点が増えてもリストから配列への変換は起きない
 
-        def __init__(self, line, xarray, yaaray):
+        max_pointsが0より大きいときは点がmax_pointsを超えるとdecimate_indicesで間引いた点だけを描画する(全ての点は残しておく).
+        間引きは前回までに区切った区間の続きから行い､ 間引いた点がmax_pointsを超えたら区間の長さを倍にしてやり直す
+        """
+
+        INITIAL_CAPACITY = 1024
+        INITIAL_BUCKET = 8
+
+        def __init__(self, line, max_points: int = 0):
             self.line = line
-            self.xarray = xarray
-            self.yaaray = yaaray
+            self.max_points = max_points
+            self.__x = np.empty(self.INITIAL_CAPACITY)
+            self.__y = np.empty(self.INITIAL_CAPACITY)
+            self.__start = 0  # 表示する点の先頭(flowwidthで古い点を消すと進む)
+            self.__end = 0
+            self.__is_sorted = True  # xが昇順に並んでいるか(時間が横軸のときなど)
+            self.__offset = 0  # self.__x[0]が最初から数えて何点目か(前に詰めると増える)
+            self.__reset_lod()
+
+        def __reset_lod(self) -> None:
+            self.__bucket = self.INITIAL_BUCKET
+            # 間引いて残す点(最初から数えた番号)
+            self.__lod_indices = np.empty(0, dtype=np.int64)
+            # ここより前は区切って間引き済み
+            self.__lod_end = self.__offset + self.__start
+            # 区間はここからbucket個ずつに区切る
+            self.__lod_origin = self.__lod_end
+
+        @property
+        def xarray(self) -> np.ndarray:
+            """表示する点のx座標(バッファーの読み取り専用のview. 点を追加したり消したりした後は取り直すこと)"""
+            return self.__readonly_view(self.__x)
+
+        @property
+        def yaaray(self) -> np.ndarray:
+            """表示する点のy座標(バッファーの読み取り専用のview. 点を追加したり消したりした後は取り直すこと)"""
+            return self.__readonly_view(self.__y)
+
+        def __readonly_view(self, buffer: np.ndarray) -> np.ndarray:
+            """外から書き換えて描画中のデータを壊さないように書き込みできないviewにする"""
+            view = buffer[self.__start : self.__end]
+            view.flags.writeable = False
+            return view
+
+        def __len__(self) -> int:
+            return self.__end - self.__start
+
+        def extend(self, x: np.ndarray, y: np.ndarray) -> None:
+            """点を末尾にまとめて追加する"""
+            num = len(x)
+            if num == 0:
+                return
+            if self.__is_sorted:  # 追加した点だけを見て昇順が続いているかを調べる
+                last = self.__x[self.__end - 1] if len(self) > 0 else x[0]
+                self.__is_sorted = bool(last <= x[0] and np.all(x[1:] >= x[:-1]))
+            if self.__end + num > len(self.__x):
+                self.__reserve(num)
+            self.__x[self.__end : self.__end + num] = x
+            self.__y[self.__end : self.__end + num] = y
+            self.__end += num
+
+        def __reserve(self, num: int) -> None:
+            """末尾にnum点入るようにする. 消した点の分で半分以上空くなら前に詰めるだけにして､ そうでなければ容量を倍にする"""
+            size = len(self)
+            capacity = len(self.__x)
+            if (size + num) * 2 > capacity:
+                capacity = max(capacity * 2, size + num)
+            x = np.empty(capacity) if capacity != len(self.__x) else self.__x
+            y = np.empty(capacity) if capacity != len(self.__y) else self.__y
+            # 同じ配列の中で前に詰めるときも重なりはnumpyが扱う
+            x[:size] = self.__x[self.__start : self.__end]
+            y[:size] = self.__y[self.__start : self.__end]
+            self.__x, self.__y = x, y
+            self.__offset += self.__start
+            self.__start, self.__end = 0, size
+
+        def cut(self, num: int) -> None:
+            """先頭のnum点を表示しないようにする"""
+            self.__start = min(self.__start + num, self.__end)
+
+        def cut_before(self, xmin: float) -> None:
+            """xがxminより小さい点を消す. 線が横幅の端で途切れないようにxmin未満の最後の1点は残す
+
+            xが昇順ならsearchsortedで二分探索するので点の数によらずほぼ一定の時間で済む
+            """
+            x = self.xarray
+            if self.__is_sorted:
+                index = int(np.searchsorted(x, xmin, side="left"))
+            else:  # 昇順でなければ最初にxmin以上になる点を探す
+                is_inside = x >= xmin
+                index = int(np.argmax(is_inside)) if is_inside.any() else len(x)
+            self.cut(max(index - 1, 0))
+
+        def update_line(self) -> None:
+            """今の点をmatplotlibの線に反映する"""
+            if self.max_points <= 0 or len(self) <= self.max_points:
+                self.__reset_lod()
+                self.line.set_data(self.xarray, self.yaaray)
+                return
+
+            self.__update_lod()
+            # まだ区切っていない末尾の点(区間1つ分未満)は毎回その場で間引く
+            tail_start = self.__lod_end - self.__offset
+            tail = self.__end - tail_start
+            tail_bucket = 1
+            while tail * 6 // tail_bucket > self.max_points // 2:
+                tail_bucket *= 2
+            if tail_bucket == 1:
+                tail_indices = np.arange(tail_start, self.__end)
+            else:
+                tail_indices = (
+                    decimate_indices(
+                        self.__x[tail_start : self.__end],
+                        self.__y[tail_start : self.__end],
+                        tail_bucket,
+                    )
+                    + tail_start
+                )
+                tail_indices = np.concatenate(
+                    [
+                        tail_indices,
+                        np.arange(
+                            tail_start + tail // tail_bucket * tail_bucket, self.__end
+                        ),
+                    ]
+                )
+            indices = np.concatenate([self.__lod_indices - self.__offset, tail_indices])
+            # 途中まで消した区間があっても先頭の点は描く
+            if len(indices) == 0 or indices[0] != self.__start:
+                indices = np.concatenate([[self.__start], indices])
+            self.line.set_data(self.__x[indices], self.__y[indices])
+
+        def __update_lod(self) -> None:
+            """前回の続きから間引いて､ 間引いた点がmax_pointsの半分を超えたら区間を長くしてやり直す"""
+            first = self.__offset + self.__start
+            # 表示しなくなった点を除く
+            self.__lod_indices = self.__lod_indices[
+                np.searchsorted(self.__lod_indices, first) :
+            ]
+            if self.__lod_end <= first:
+                self.__lod_end = self.__lod_origin = first
+            elif (first - self.__lod_origin) % self.__bucket != 0:
+                self.__redecimate_partial_bucket(first)
+
+            while True:
+                begin = self.__lod_end - self.__offset
+                indices = decimate_indices(
+                    self.__x[begin : self.__end],
+                    self.__y[begin : self.__end],
+                    self.__bucket,
+                )
+                self.__lod_indices = np.concatenate(
+                    [self.__lod_indices, indices + self.__lod_end]
+                )
+                self.__lod_end += (self.__end - begin) // self.__bucket * self.__bucket
+                if len(self.__lod_indices) <= self.max_points // 2:
+                    break
+                self.__bucket *= 2
+                self.__lod_indices = np.empty(0, dtype=np.int64)
+                self.__lod_end = self.__lod_origin = first
+
+        def __redecimate_partial_bucket(self, first: int) -> None:
+            """途中まで消した先頭の区間を残っている点だけで間引き直す
+
+            区間の最大や最小の点が消えた側にあると､ 残っている側の最大や最小が描かれなくなるため
+            """
+            bucket_end = (
+                self.__lod_origin
+                + ((first - self.__lod_origin) // self.__bucket + 1) * self.__bucket
+            )
+            begin = first - self.__offset
+            end = bucket_end - self.__offset
+            indices = decimate_indices(
+                self.__x[begin:end], self.__y[begin:end], end - begin
+            )
+            rest = self.__lod_indices[
+                np.searchsorted(self.__lod_indices, bucket_end) :
+            ]
+            self.__lod_indices = np.concatenate([indices + first, rest])
+
+
+class SnapshotWindow(PlotWindow):
+    """ウィンドウを出さずにsnapshot_interval秒ごとにグラフを画像ファイルに保存する(リモート接続のPCなどで使う)
+
+    点の取り込みや範囲の更新はPlotWindowと同じで､ 描画は保存するときだけ行う.
+    画像は一時ファイルに書いてから置き換えるので､ 開いている途中の画像が壊れることはない
+
+    Parameter
+    ---------
+    snapshot_path : str
+        保存先のパス. 拡張子(png, svgなど)で画像の形式が決まる
+
+    snapshot_interval : float (>0)
+        保存する間隔(秒). 前回から点が増えていないときは保存しない
+    """
+
+    def __init__(
+        self, plot_buffer, isfinish, snapshot_path, snapshot_interval, **plot_info
+    ) -> None:
+        plot_info["blit"] = False  # 保存するときに全体を描くのでblitはいらない
+        super().__init__(plot_buffer, isfinish, **plot_info)
+        plt.ioff()  # 線が変わるたびに描画しないようにする
+        self.snapshot_path = str(snapshot_path)
+        self.snapshot_interval = snapshot_interval
+        self.__is_changed = False
+
+    def renew_window(self) -> None:
+        if self.plot_buffer.pending_count > 0:
+            self.__is_changed = True
+        super().renew_window()
+
+    def save_snapshot(self) -> None:
+        """今のグラフを保存する
+
+        保存できなかったとき(画像を開いているビューアがある､ フォルダがないなど)は警告だけ出して次の保存で再び試す.
+        スナップショットのせいでプロットのプロセスが落ちて測定が止まらないようにするため
+        """
+        if not self.__is_changed:
+            return
+        root, ext = os.path.splitext(self.snapshot_path)
+        temppath = f"{root}.tmp{ext}"
+        try:
+            self._figure.savefig(temppath, format=ext[1:] or None)
+            os.replace(temppath, self.snapshot_path)
+        except (OSError, ValueError) as e:
+            logger.warning(
+                "スナップショット%sを保存できませんでした : %s", self.snapshot_path, e
+            )
+            try:
+                os.remove(temppath)
+            except OSError:
+                pass
+            return
+        self.__is_changed = False
+
+    def run(self) -> None:
+        """renew_interval秒ごとに点を取り込み､ snapshot_interval秒ごとと終了したときに保存する"""
+        next_snapshot = time.monotonic() + self.snapshot_interval
+        while True:
+            self.renew_window()
+            is_finished = self.isfinish.value == 1
+            now = time.monotonic()
+            if is_finished or now >= next_snapshot:
+                self.save_snapshot()
+                next_snapshot = now + self.snapshot_interval
+            if is_finished:
+                break
+            time.sleep(max(min(self.interval, next_snapshot - now), 0))
+        plt.close(self._figure)
@@ -0,0 +1,193 @@
+"""
+測定プロセスからグラフ描画プロセスへプロットする点を渡すためのリングバッファ
+
+点は(x, y, ラベル番号)のfloat64の組として共有メモリに書き込むので､ 1点あたりの受け渡しはメモリのコピーだけで済む.
+ラベルは最初に使われたときに番号を振ってPipeで描画プロセスに送る.
+"""
+
+import os
+import weakref
+from multiprocessing import Pipe
+from multiprocessing.shared_memory import SharedMemory
+from typing import Hashable, Optional
+
+import numpy as np
+
+HEADER_SIZE = 2  # head, tailの2つのint64
+RECORD_SIZE = 3  # x, y, ラベル番号
+
+
+def _release(shared_memory: SharedMemory, owner_pid: Optional[int]) -> None:
+    try:
+        shared_memory.close()
+    # 終了時でまだnumpyの配列が残っているときは閉じずにおく(プロセスの終了で解放される)
+    except BufferError:
+        pass
+    if os.getpid() == owner_pid:  # forkで複製されたオブジェクトからは削除しない
+        shared_memory.unlink()
+
+
+class PlotBuffer:
+    """書き込み側(測定プロセス)と読み出し側(描画プロセス)が1つずつのリングバッファ
+
+    共有メモリの先頭にhead(これまでに書き込んだ点の数)とtail(これまでに読み出した点の数)を置き､ その後ろに点を並べる.
+    headは書き込み側だけが､ tailは読み出し側だけが更新するのでロックはいらない.
+    書き込み側は点を書いてからheadを進め､ 読み出し側はheadを読んでから点を読む(8byteの整列した書き込みは途中の値が見えない).
+
+    バッファがいっぱいのときは書き込み側は待たずにその点を捨てる(捨てた数はdropped_countで確認できる).
+
+    Processの引数に渡すとpickleされて､ 子プロセス側では同じ共有メモリを読み出し側として開く.
+
+    Attributes
+    ----------
+    capacity : int
+        バッファに入れておける点の数
+
+    dropped_count : int
+        バッファがいっぱいで捨てた点の数(書き込み側のみ)
+    """
+
+    def __init__(self, capacity: int = 65536) -> None:
+        if type(capacity) is not int or capacity <= 0:
+            raise ValueError("capacityは1以上のintにしてください")
+        self.capacity = capacity
+        self.dropped_count = 0
+        self.__shared_memory = SharedMemory(
+            create=True, size=(HEADER_SIZE + RECORD_SIZE * capacity) * 8
+        )
+        self.__finalizer = weakref.finalize(
+            self, _release, self.__shared_memory, os.getpid()
+        )
+        self.__receiver, self.__sender = Pipe(duplex=False)
+        self.__label_ids: dict[Hashable, int] = {}  # 書き込み側: ラベル→番号
+        self.__labels: list[Hashable] = []  # 読み出し側: 番号→ラベル
+        self.__attach()
+        self.__header[0] = 0
+        self.__header[1] = 0
+
+    def __attach(self) -> None:
+        buffer = self.__shared_memory.buf
+        # 1点ずつの読み書きはnumpyを通すより型付きのmemoryviewの方が速い
+        self.__header = buffer[: HEADER_SIZE * 8].cast("q")
+        self.__record_view = buffer[HEADER_SIZE * 8 :].cast("d")
+        self.__records = np.ndarray(
+            (self.capacity, RECORD_SIZE),
+            dtype=np.float64,
+            buffer=buffer,
+            offset=HEADER_SIZE * 8,
+        )
+
+    def __getstate__(self) -> dict:
+        """子プロセスには共有メモリの名前と受信側のPipeだけを渡す"""
+        return {
+            "name": self.__shared_memory.name,
+            "capacity": self.capacity,
+            "receiver": self.__receiver,
+        }
+
+    def __setstate__(self, state: dict) -> None:
+        self.capacity = state["capacity"]
+        self.dropped_count = 0
+        self.__shared_memory = SharedMemory(name=state["name"])
+        # 共有メモリの削除は作成した側が行う
+        self.__finalizer = weakref.finalize(self, _release, self.__shared_memory, None)
+        self.__receiver = state["receiver"]
+        self.__sender = None
+        self.__label_ids = {}
+        self.__labels = []
+        self.__attach()
+
+    def write(self, x: float, y: float, label: Hashable) -> bool:
+        """1点書き込む. バッファがいっぱいで捨てたときはFalseを返す"""
+        head = self.__header[0]
+        if head - self.__header[1] >= self.capacity:
+            self.dropped_count += 1
+            return False
+        index = (head % self.capacity) * RECORD_SIZE
+        self.__record_view[index] = float(x)
+        self.__record_view[index + 1] = float(y)
+        self.__record_view[index + 2] = self.__label_id(label)
+        self.__header[0] = head + 1
+        return True
+
+    def write_many(self, x, y, label: Hashable) -> int:
+        """同じラベルの点をまとめて書き込む. 入りきらなかった点は捨てて､ 書き込んだ点の数を返す
+
+        Parameter
+        ---------
+        x, y : array_like
+            同じ長さの1次元配列
+        """
+        x = np.asarray(x, dtype=np.float64).ravel()
+        y = np.asarray(y, dtype=np.float64).ravel()
+        if len(x) != len(y):
+            raise ValueError("xとyの長さが違います")
+        head = self.__header[0]
+        num = min(len(x), self.capacity - (head - self.__header[1]))
+        self.dropped_count += len(x) - num
+        if num <= 0:
+            return 0
+
+        label_id = self.__label_id(label)
+        start = head % self.capacity
+        first = min(num, self.capacity - start)  # 末尾まで書いて残りは先頭から書く
+        for records, begin, end in (
+            (self.__records[start : start + first], 0, first),
+            (self.__records, first, num),
+        ):
+            records[: end - begin, 0] = x[begin:end]
+            records[: end - begin, 1] = y[begin:end]
+            records[: end - begin, 2] = label_id
+        self.__header[0] = head + num
+        return num
+
+    def __label_id(self, label: Hashable) -> float:
+        label_id = self.__label_ids.get(label)
+        if label_id is None:  # 初めてのラベルは点より先に読み出し側に送っておく
+            label_id = float(len(self.__label_ids))
+            self.__sender.send(label)
+            self.__label_ids[label] = label_id
+        return label_id
+
+    def read(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """書き込まれた点を全て読み出す
+
+        Returns
+        -------
+        x, y, label_id : numpy.ndarray
+            書き込まれた順の点. ラベルはlabelで番号から戻す
+        """
+        head = self.__header[0]
+        while self.__receiver.poll():  # headより前の点のラベルは必ず届いている
+            self.__labels.append(self.__receiver.recv())
+        tail = self.__header[1]
+        start, end = tail % self.capacity, head % self.capacity
+        if head - tail == 0:
+            records = self.__records[0:0].copy()
+        elif start < end:
+            records = self.__records[start:end].copy()
+        else:  # 末尾から先頭に回り込んでいる
+            records = np.concatenate([self.__records[start:], self.__records[:end]])
+        self.__header[1] = head
+        return records[:, 0], records[:, 1], records[:, 2].astype(np.int64)
+
+    @property
+    def pending_count(self) -> int:
+        """書き込まれてまだ読み出していない点の数"""
+        return self.__header[0] - self.__header[1]
+
+    def label(self, label_id: int) -> Hashable:
+        """readで読み出したラベル番号に対応するラベル"""
+        return self.__labels[label_id]
+
+    def close(self) -> None:
+        """共有メモリを閉じる. 作成した側では共有メモリを削除する"""
+        self.__header.release()
+        self.__record_view.release()
+        self.__records = None
+        self.__finalizer()
+
+    @property
+    def name(self) -> str:
+        """共有メモリの名前"""
+        return self.__shared_memory.name
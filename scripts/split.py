@@ -1,12 +1,19 @@
 """
 分割処理に使える関数がある
 """
+
+import locale
 import math
 import os
 import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from itertools import islice
 from logging import getLogger
-from typing import List
+from typing import List, Optional
 
+import numpy as np
 import utility as util
 from utility import MyException
 
@@ -57,62 +64,55 @@ def heating_cooling_split(
     sample_num = sample_and_cutout_num[0]
     cutout_num = sample_and_cutout_num[1]
 
-    def temp_judge(temp_grad):
-        nonlocal threshold
-        value = 1 if temp_grad > 0 else -1  # 温度が上昇していれば1, いなければ-1をサンプルにつめる
-        if threshold is not None and abs(temp_grad) < threshold:
-            value = 0
-        return value
-
-    samples_hc = []  # サンプルを入れる配列
-    count = 0
-    for i in range(sample_num):
-        if count >= len(data) - step:
-            logger.warning(
-                "データ数が少なすぎるかsample数が多すぎます. 必要最小データ数は"
-                + sys._getframe().f_code.co_name
-                + "の引数から設定できます"
-            )
-            return [data]
-
-        temp_grad = data[count + step][T_index] - data[count][T_index]
-
-        samples_hc.append(temp_judge(temp_grad))
-        count += 1
+    if len(data) - step < sample_num:
+        logger.warning(
+            "データ数が少なすぎるかsample数が多すぎます. 必要最小データ数は"
+            + sys._getframe().f_code.co_name
+            + "の引数から設定できます"
+        )
+        return [data]
+
+    if isinstance(data, np.ndarray):
+        temperature = data[:, T_index].astype(np.float64)
+    else:
+        temperature = np.array([row[T_index] for row in data], dtype=np.float64)
+
+    # step分離れた点との温度差が正なら1, 負なら-1, 絶対値がthreshold未満なら0
+    temp_grad = temperature[step:] - temperature[:-step]
+    samples_hc = np.where(temp_grad > 0, 1, -1)
+    if threshold is not None:
+        samples_hc[np.abs(temp_grad) < threshold] = 0
+
+    # counts[i]番目の点までのsample_num個のサンプルの和を累積和の差でまとめて計算
+    counts = np.arange(sample_num, len(data) - step + 1)
+    cumsum = np.concatenate(([0], np.cumsum(samples_hc)))
+    sum_counts = cumsum[counts] - cumsum[counts - sample_num]
+
+    # 閾値を設定してそれを超えるかどうかでheating(1),cooling(-1),どちらでもない(0)を判定
+    states = np.where(
+        sum_counts > cutout_num, 1, np.where(sum_counts < cutout_num * (-1), -1, 0)
+    )
+    previous_states = np.concatenate(([0], states[:-1]))
 
     previous_state = -5  # 一個前の昇温降温状態. 一度温度勾配がなくなった後に再び同じ方向に温度変化した場合に対応
-    state = 0  # 全体としての状態, heatingなら1,coolingなら-1,どっちでもなければ0
     split_points_hc = []  # 分割する点をいれる配列
-    while True:
-        sum_count = sum(samples_hc)  # 温度変化のサンプルの和をとる
+    for i in np.flatnonzero(states != previous_states):  # 状態が変わった点だけを見る
+        count = int(counts[i])
+        state = int(previous_states[i])
+        new_state = int(states[i])
 
-        if sum_count > cutout_num:  # 閾値を設定してそれを超えるかどうかでheating,coolingを判定
-            new_state = 1
-        elif sum_count < cutout_num * (-1):
-            new_state = -1
+        if previous_state == new_state:
+            del split_points_hc[-1]
         else:
-            new_state = 0
-
-        if state != new_state:  # 一個前の状態と違うならsplit_points_hcに情報を入れる
-            if previous_state == new_state:
-                del split_points_hc[-1]
-            else:
-                if state != 0:  # 一個前の状態がheating or cooling なら 分割の終わり
-                    split_points_hc.append(count)
-
-                if new_state != 0:  # 今の状態がheating or cooling なら 分割の始まり
-                    split_points_hc.append(count - sample_num)
-                    previous_state = new_state
-
-        if count >= len(data) - step:  # countが最後まできたら終了
-            if len(split_points_hc) % 2 == 1:  # 最後の分割範囲が閉じてなければ閉じる
+            if state != 0:  # 一個前の状態がheating or cooling なら 分割の終わり
                 split_points_hc.append(count)
-            break
 
-        state = new_state
-        temp_grad = data[count + step][T_index] - data[count][T_index]
-        samples_hc[count % sample_num] = temp_judge(temp_grad)
-        count += 1
+            if new_state != 0:  # 今の状態がheating or cooling なら 分割の始まり
+                split_points_hc.append(count - sample_num)
+                previous_state = new_state
+
+    if len(split_points_hc) % 2 == 1:  # 最後の分割範囲が閉じてなければ閉じる
+        split_points_hc.append(int(counts[-1]))
 
     new_data = []
     for i in range(0, len(split_points_hc), 2):  # split_points_hcの情報に基づいて分割
@@ -124,10 +124,13 @@ def heating_cooling_split(
 def cyclic_split(data: List, cycle_num: int) -> List[List]:
     """周期的に分割
 
+    i番目の配列にはdataのi, i+cycle_num, i+2*cycle_num, ...番目の要素が入る.
+    dataがnumpyの配列のときはコピーせずに元の配列のビューを返す
+
     Parameters
     ----------
 
-    data: List[float]
+    data: List[float] or numpy.ndarray
         分割する配列
 
     cycle_num: int
@@ -139,23 +142,7 @@ def cyclic_split(data: List, cycle_num: int) -> List[List]:
     new_data : 配列の配列
     """
 
-    count = 0
-    max_num = len(data)
-
-    new_data = [[] for i in range(cycle_num)]
-
-    while True:
-        for i in range(cycle_num):  # データを上から順番に周期的に振り分け
-            new_data[i].append(data[count])
-            count += 1
-            if count >= max_num:
-                break
-        else:
-            continue  # forループを正常に抜けたらcontinue
-
-        break  # breakでforループを抜けたときだけここが実行される
-
-    return new_data
+    return [data[i::cycle_num] for i in range(cycle_num)]
 
 
 def from_num_to_10Exx(num: float, significant_digits=2) -> str:
@@ -195,11 +182,13 @@ def file_open(filepath: str) -> tuple[List[List[float]], str, str, str]:
     ---------
     filepath : string
         見鋳込むファイルのpath(絶対パスを想定)
+        拡張子が.npyのとき(set_file(format="npy")で保存したファイル)はメモリマップした配列を返す
 
     Returns
     -------
     data : 二次元配列
         ファイルの中身を二次元配列に変換した物
+        列の数がそろっていればnumpyの二次元配列, そろっていなければfloatの配列の配列
 
     filename: str
         開いたファイルの名前
@@ -216,35 +205,53 @@ def file_open(filepath: str) -> tuple[List[List[float]], str, str, str]:
         0
     ]  # fileのpathからファイル名(拡張子抜き)を取得
 
-    file = open(filepath, "r", encoding=util.get_encode_type(filepath))  # ファイルを開く
+    # set_file(format="npy")で保存したファイル
+    if os.path.splitext(filepath)[1] == ".npy":
+        data = np.load(filepath, mmap_mode="r")  # メモリマップなので読み込みは一瞬
+        label = _npy_label(filepath)
+        print("非データ行 : ", label.count("\n"), ", データ行 : ", len(data))
+        if len(data) == 0:
+            raise SplitError("データ行が0行です. 読み取りに失敗しました.")
+        return data, filename, dirpath, label
+
+    text = _read_text(filepath)
+
+    # readlineで1行ずつ読んだときと同じく改行を残して行に分ける(最後の行は改行がないこともある)
+    lines = text.split("\n")
+    lines = [line + "\n" for line in lines[:-1]] + (
+        [lines[-1]] if lines[-1] != "" else []
+    )
+
+    # 空白だけの行があればそこで終了
+    for i, line_raw in enumerate(lines):
+        if line_raw.strip() == "":
+            lines = lines[:i]
+            break
 
-    # label =file.readline()+file.readline()#最初の2行はラベルだとしてそこは抜き出す
+    # 先頭の数字でない行をラベルとして切り出す
     label = ""
-    data = []
     num_label = 0
-    num_data = 0
-    while True:
-        line_raw = file.readline()
-        line = line_raw.strip()  # 前後空白削除
-
-        if line == "":  # 空なら終了
+    body_start = len(lines)
+    for i, line_raw in enumerate(lines):
+        if _line_to_floats(line_raw) is not None:
+            body_start = i
             break
+        label += line_raw
+        num_label += 1
 
-        line = line.replace("\n", "")  # 末尾の\nの削除
-
-        if line == "":  # 空行なら次の行へ
-            continue
-
+    # 残りはまとめて数値に変換する. 途中にラベル行があったり列数がそろっていなければ1行ずつ変換
+    body = lines[body_start:]
+    data = []
+    if len(body) > 0:
         try:
-            array_string = line.split(",")  # ","で分割して配列にする
-            array_float = [float(s) for s in array_string]  # 文字列からfloatに変換
-            data.append(array_float)
-            num_data += 1
-        except Exception:
-            label += line_raw
-            num_label += 1
-
-    file.close()
+            data = np.loadtxt(
+                body, delimiter=",", comments=None, dtype=np.float64, ndmin=2
+            )
+        except ValueError:
+            data, body_label, body_num_label = _parse_lines(body)
+            label += body_label
+            num_label += body_num_label
+    num_data = len(data)
 
     print("非データ行 : ", num_label, ", データ行 : ", num_data)
 
@@ -254,9 +261,81 @@ def file_open(filepath: str) -> tuple[List[List[float]], str, str, str]:
     return data, filename, dirpath, label
 
 
-def create_file(filepath: str, data: List[List], label: str = ""):
+def _read_text(filepath: str) -> str:
+    """ファイルの中身を文字列で返す
+
+    数字の行はASCIIなので文字コードはファイルの先頭だけで判別して､ それで読めなかったときだけファイル全体で判別し直す
+    """
+    with open(filepath, "rb") as file:
+        raw = file.read()
+
+    # 判別できなかったときはopenと同じ文字コード
+    default_encoding = locale.getpreferredencoding(False)
+    try:
+        text = raw.decode(
+            util.get_encode_type(filepath, max_bytes=1 << 16) or default_encoding
+        )
+    except UnicodeDecodeError:
+        text = raw.decode(util.get_encode_type(filepath) or default_encoding)
+    # テキストモードで開いたときと同じ改行にする
+    return text.replace("\r\n", "\n").replace("\r", "\n")
+
+
+def _line_to_floats(line: str) -> Optional[List[float]]:
+    """ ","区切りの1行をfloatの配列に変換する. 数字でない要素があればNoneを返す"""
+    try:
+        return [float(s) for s in line.strip().split(",")]
+    except ValueError:
+        return None
+
+
+def _parse_lines(lines: List[str]) -> tuple[List[List[float]], str, int]:
+    """1行ずつfloatの配列に変換する. 変換できない行はラベルとして扱う
+
+    Returns
+    -------
+    data : 二次元配列
+        変換できた行
+
+    label : str
+        変換できなかった行のテキスト
+
+    num_label : int
+        変換できなかった行の数
+    """
+    data = []
+    label = ""
+    num_label = 0
+    for line_raw in lines:
+        array_float = _line_to_floats(line_raw)
+        if array_float is None:
+            label += line_raw
+            num_label += 1
+        else:
+            data.append(array_float)
+    return data, label, num_label
+
+
+def _npy_label(filepath: str) -> str:
+    """npyファイルと一緒に保存されたラベルファイルの中身を返す"""
+    labelpath = os.path.splitext(filepath)[0] + "_label.txt"
+    if not os.path.isfile(labelpath):
+        return ""
+    with open(labelpath, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def create_file(
+    filepath: str,
+    data: List[List],
+    label: str = "",
+    fmt: Optional[str] = None,
+    chunk_rows: int = 10000,
+):
     """新規ファイル作成. フォルダがない場合は作る
 
+    データはchunk_rows行ずつ文字列にしてそのままファイルに書き込むので､ ファイル全体の文字列をメモリ上に作ることはない
+
     Parameters
     ----------
 
@@ -268,19 +347,14 @@ def create_file(filepath: str, data: List[List], label: str = ""):
 
     label : str
         ファイル冒頭のラベル
-    """
 
-    def array2d_to_text(array2d):
-        text = ""
-        for array1d in array2d:
-            temp = ""
-            for element in array1d:
-                temp += str(element) + ","
-            temp = temp[:-1]
-            temp += "\n"
-            text += temp
+    fmt : str
+        数値の書式(例 "%.6e"). numpy.savetxtでまとめて変換するので速い(列の数がそろっている必要がある)
+        Noneのときはstr()で変換したものをそのまま書き込む
 
-        return text
+    chunk_rows : int
+        一度に文字列に変換する行数
+    """
 
     dirpath = os.path.dirname(filepath)
     os.makedirs(dirpath, exist_ok=True)
@@ -293,7 +367,15 @@ def create_file(filepath: str, data: List[List], label: str = ""):
 
     with open(filepath, "x", encoding="utf-8") as f:
         f.write(label)
-        f.write(array2d_to_text(data))
+        for start in range(0, len(data), chunk_rows):
+            chunk = data[start : start + chunk_rows]
+            if fmt is not None:
+                np.savetxt(
+                    f, np.asarray(chunk, dtype=np.float64), fmt=fmt, delimiter=","
+                )
+            else:
+                rows = chunk.tolist() if isinstance(chunk, np.ndarray) else chunk
+                f.write("".join([",".join(map(str, row)) + "\n" for row in rows]))
 
 
 def TMR_bunkatsu(
@@ -321,6 +403,9 @@ def TMR_split(
     threshold: float = 0,
     name_temperaturesplitfolder: str = None,
     name_frequencesplitfile: str = None,
+    fmt: str = None,
+    workers: int = 1,
+    use_process: bool = False,
 ):
     """TMR用の分割関数.
 
@@ -354,10 +439,20 @@ def TMR_split(
 
     name_frequencesplitfile: str
         周波数分割後のファイル名(Noneのときは分割前のファイル名を使う)
+
+    fmt: str
+        分割後のファイルに書き込む数値の書式(例 "%.6e"). Noneのときは元の値をそのまま書き込む
+
+    workers: int
+        ファイルを同時に作成する数. 1のときは1つずつ順番に作成する
+
+    use_process: bool
+        Trueのときはスレッドではなくプロセスを使ってファイルを作成する(数値の文字列変換も並列になる)
     """
 
     print("bunkatsu start...")
     data, filename, dirpath, label = file_open(filepath)  # ファイルを開いて配列として取得
+    jobs = []  # (作成するファイルのパス, 書き込むデータ)
     count = 0
     for split_data in heating_cooling_split(
         data,
@@ -374,27 +469,15 @@ def TMR_split(
         if name_frequencesplitfile is None:
             name_frequencesplitfile = filename
 
-        new_dir = (
-            dirpath
-            + "\\"
-            + name_temperaturesplitfolder
-            + "_"
-            + str(count)
-            + "_"
-            + state
+        new_dir = os.path.join(
+            dirpath, name_temperaturesplitfolder + "_" + str(count) + "_" + state
         )
 
-        new_filepath = (
-            new_dir
-            + "\\"
-            + name_frequencesplitfile
-            + "_"
-            + str(count)
-            + "_"
-            + state
-            + "_all.txt"
+        new_filepath = os.path.join(
+            new_dir,
+            name_frequencesplitfile + "_" + str(count) + "_" + state + "_all.txt",
         )
-        create_file(filepath=new_filepath, data=split_data, label=label)
+        jobs.append((new_filepath, split_data))
 
         for split_split_data in cyclic_split(
             split_data, cycle_num=freq_num
@@ -403,21 +486,411 @@ def TMR_split(
 
             freq = from_num_to_10Exx(freq, significant_digits=3)
 
-            new_filepath = (
-                new_dir
-                + "\\"
-                + name_frequencesplitfile
+            new_filepath = os.path.join(
+                new_dir,
+                name_frequencesplitfile
                 + "_"
                 + str(count)
                 + "_"
                 + state
                 + "_"
                 + freq
-                + "Hz.txt"
+                + "Hz.txt",
             )  # ファイルのパスを設定
 
-            create_file(filepath=new_filepath, data=split_split_data, label=label)
+            jobs.append((new_filepath, split_split_data))
 
         count += 1
 
+    create_files(jobs, label=label, fmt=fmt, workers=workers, use_process=use_process)
+
     print("file has been completely splitted!!")
+
+
+def create_files(
+    jobs: List[tuple[str, List[List]]],
+    label: str = "",
+    fmt: Optional[str] = None,
+    workers: int = 1,
+    use_process: bool = False,
+) -> None:
+    """create_fileで複数のファイルをまとめて作成する. 進捗は作成したファイル数で表示する
+
+    Parameters
+    ----------
+
+    jobs : (str, 配列)の配列
+        作成するファイルのパスと書き込むデータの組
+
+    label, fmt :
+        create_fileに渡す引数
+
+    workers : int
+        同時に作成するファイルの数. 1のときは順番に作成する
+
+    use_process : bool
+        Trueならプロセス, Falseならスレッドで並列に作成する
+    """
+
+    if type(workers) is not int or workers < 1:
+        raise SplitError("workersは1以上のintにしてください")
+
+    # 並列に作成すると同じパスのどちらが先に作られるかが決まらないので先にはじいておく
+    duplicates = [
+        p for p, num in Counter(filepath for filepath, _ in jobs).items() if num > 1
+    ]
+    if duplicates:
+        raise SplitError(
+            "同じ名前のファイル"
+            + ", ".join(duplicates)
+            + "を作成しようとしています.\n解決できない場合はcyclic_splitの分割数などを見直してみてください"
+        )
+
+    def print_progress(done: int) -> None:
+        print(
+            f"\rcreate files... {done}/{len(jobs)}",
+            end="" if done < len(jobs) else "\n",
+        )
+
+    if workers == 1:
+        for done, (filepath, data) in enumerate(jobs, 1):
+            create_file(filepath=filepath, data=data, label=label, fmt=fmt)
+            print_progress(done)
+        return
+
+    executor_class = ProcessPoolExecutor if use_process else ThreadPoolExecutor
+    with executor_class(max_workers=workers) as executor:
+        futures = [
+            executor.submit(create_file, filepath, data, label, fmt)
+            for filepath, data in jobs
+        ]
+        try:
+            for done, future in enumerate(as_completed(futures), 1):
+                future.result()  # 作成中にエラーが起きていればここで投げられる
+                print_progress(done)
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+
+class OnlineTMRSplitter:
+    """測定中に1行ずつTMR_splitと同じ分割をしていくクラス
+
+    FileManagerに書き込まれた行を受け取り､ heating_cooling_splitと同じ昇温降温の判定とcyclic_splitと同じ周波数の振り分けを逐次行って､
+    分割後のファイルに追記していく. 測定の途中でも分割済みのファイルを開ける
+
+    昇温降温の始まりはsample_num点前にさかのぼり､ 昇温降温が途切れても同じ向きで再開すれば前の範囲に戻すので､
+    その判定に必要な行だけを手元に残しておく. フォルダ名のheating/coolingは判定した向きで付けておき､
+    範囲が終わったらTMR_splitと同じく最初と最後の温度の差で付け直す.
+    途中で増えたラベルの行はcloseのときにTMR_splitと同じく全部のファイルの先頭に入れ直す
+
+    分割の途中でエラーが起きても測定は止めず､ ログを出して以降の分割をやめる
+    """
+
+    class Segment:
+        """1つの昇温または降温の範囲の書き込み先"""
+
+        def __init__(
+            self, splitter: "OnlineTMRSplitter", count: int, state: str, start: int
+        ):
+            self.__splitter = splitter
+            self.__count = count
+            self.__state = state
+            self.written_upto = start  # この行番号の手前まで書き込み済み
+            self.__num_written = 0
+            self.__files = []
+            self.__labels = {}  # 作ったファイルの名前の末尾と書き込んだラベル
+            self.__first_T = None
+            self.__last_T = None
+            self.__all_file = self.__open("_all.txt")
+            self.__freq_files = []  # 周期内の位置ごとの書き込み先
+
+        def __path(self, state: str, suffix: str = "") -> str:
+            splitter = self.__splitter
+            name = "_" + str(self.__count) + "_" + state
+            return os.path.join(
+                splitter.dirpath,
+                splitter.folder_name + name,
+                splitter.file_name + name + suffix,
+            )
+
+        def __open(self, suffix: str):
+            filepath = self.__path(self.__state, suffix)
+            os.makedirs(os.path.dirname(filepath), exist_ok=True)
+            if os.path.isfile(filepath):
+                raise SplitError(
+                    "新規作成しようとしたファイル"
+                    + filepath
+                    + "は既に存在しています.削除してからやり直してください.\n解決できない場合はfreq_numなどを見直してみてください"
+                )
+            file = open(filepath, "x", encoding="utf-8")
+            file.write(self.__splitter.label)
+            self.__files.append(file)
+            self.__labels[suffix] = self.__splitter.label
+            return file
+
+        def write(self, rows: List[List[float]]) -> None:
+            if not rows:
+                return
+            T_index = self.__splitter.T_index
+            if self.__first_T is None:
+                self.__first_T = rows[0][T_index]
+            self.__last_T = rows[-1][T_index]
+            freq_num = self.__splitter.freq_num
+            lines = [",".join(map(str, row)) + "\n" for row in rows]
+            self.__all_file.write("".join(lines))
+            for row, line in zip(rows, lines):
+                cycle = self.__num_written % freq_num
+                # 周期の1巡目で周波数ごとのファイルを作る
+                if cycle == len(self.__freq_files):
+                    freq = from_num_to_10Exx(
+                        row[self.__splitter.f_index], significant_digits=3
+                    )
+                    self.__freq_files.append(self.__open("_" + freq + "Hz.txt"))
+                self.__freq_files[cycle].write(line)
+                self.__num_written += 1
+
+        def flush(self) -> None:
+            for file in self.__files:
+                file.flush()
+
+        def close(self) -> None:
+            for file in self.__files:
+                file.close()
+            self.__files = []
+
+        def finish(self) -> None:
+            """ファイルを閉じて､ TMR_splitと同じく最初と最後の温度の差でheating/coolingを付け直す
+
+            ノイズで判定の向きと温度の差の向きが食い違うことがあるため
+            """
+            self.close()
+            if self.__first_T is None:
+                return
+            state = "heating" if self.__last_T - self.__first_T > 0 else "cooling"
+            if state == self.__state:
+                return
+            folder = os.path.dirname(self.__path(state))
+            if os.path.exists(folder):
+                raise SplitError(
+                    "名前を付け直そうとしたフォルダ"
+                    + folder
+                    + "は既に存在しています.削除してからやり直してください"
+                )
+            os.rename(os.path.dirname(self.__path(self.__state)), folder)
+            for suffix in self.__labels:
+                os.rename(
+                    os.path.join(
+                        folder, os.path.basename(self.__path(self.__state, suffix))
+                    ),
+                    self.__path(state, suffix),
+                )
+            self.__state = state
+
+        def relabel(self, label: str) -> None:
+            """ファイルを作った後に増えたラベルの行を先頭に入れ直す"""
+            for suffix, written in self.__labels.items():
+                if written == label:
+                    continue
+                filepath = self.__path(self.__state, suffix)
+                with open(filepath, encoding="utf-8") as file:
+                    body = file.read()[len(written) :]
+                with open(filepath, "w", encoding="utf-8") as file:
+                    file.write(label + body)
+                self.__labels[suffix] = label
+
+    def __init__(
+        self,
+        filepath: str,
+        T_index: int,
+        f_index: int,
+        freq_num: int = 16,
+        sample_and_cutout_num: tuple[int, int] = (150, 120),
+        step: int = 10,
+        threshold: float = 0,
+        name_temperaturesplitfolder: str = None,
+        name_frequencesplitfile: str = None,
+        flush_interval: float = 1,
+    ):
+        """
+        Parameter
+        ---------
+
+        filepath : str
+            測定データのファイルのパス. 分割後のファイルはTMR_splitと同じ場所に同じ名前で作る
+
+        T_index, f_index, freq_num, sample_and_cutout_num, step, threshold, name_temperaturesplitfolder, name_frequencesplitfile :
+            TMR_splitと同じ
+
+        flush_interval : float
+            分割後のファイルをflushする間隔(秒)
+        """
+
+        if type(freq_num) is not int or freq_num < 1:
+            raise SplitError("freq_numは1以上のintにしてください")
+        filename = os.path.splitext(os.path.basename(filepath))[0]
+        self.dirpath = os.path.dirname(filepath)
+        self.folder_name = (
+            filename
+            if name_temperaturesplitfolder is None
+            else name_temperaturesplitfolder
+        )
+        self.file_name = (
+            filename if name_frequencesplitfile is None else name_frequencesplitfile
+        )
+        self.T_index = T_index
+        self.f_index = f_index
+        self.freq_num = freq_num
+        self.label = ""
+        self.__sample_num, self.__cutout_num = sample_and_cutout_num
+        self.__step = 1 if step == 0 else step
+        self.__threshold = threshold
+        self.__flush_interval = flush_interval
+        self.__last_flush = time.monotonic()
+
+        self.__rows = deque()  # 判定と書き込みに必要な行だけを残す
+        self.__first_index = 0  # self.__rows[0]の行番号
+        self.__num_rows = 0
+        self.__samples = deque()  # 直近sample_num点の判定値
+        self.__sum = 0
+        self.__state = 0
+        self.__previous_state = -5
+        self.__segment: Optional[OnlineTMRSplitter.Segment] = None
+        self.__segments: List[OnlineTMRSplitter.Segment] = []
+        self.__segment_count = 0
+        self.__failed = False
+        self.__text_ended = False  # 空白だけの行が来たか
+
+    def feed_text(self, text: str) -> None:
+        """ファイルに書き込まれた文字列を渡す. 数値の行はデータ､ それ以外はラベルとして扱う
+
+        file_openは空白だけの行までしか読まないので､ 同じく空白だけの行が来たらそれ以降は無視する
+        """
+        if self.__text_ended:
+            return
+        lines = text.split("\n")
+        if lines[-1] == "":  # 最後の改行の後ろは行ではない
+            lines.pop()
+        for line in lines:
+            if line.strip() == "":
+                self.__text_ended = True
+                return
+            row = _line_to_floats(line)
+            if row is None:
+                self.label += line + "\n"
+            else:
+                self.feed_row(row)
+
+    def feed_row(self, row: List[float]) -> None:
+        """1行分の数値を渡す"""
+        if self.__failed:
+            return
+        try:
+            self.__add_row(list(row))
+        except Exception:
+            self.__fail()
+
+    def close(self) -> None:
+        """残りを書き込んでファイルを閉じる"""
+        try:
+            if not self.__failed:
+                if 0 < self.__num_rows < self.__sample_num + self.__step:
+                    # 判定できるほど行がないときはheating_cooling_splitと同じく全体を1つの範囲とする
+                    rows = list(self.__rows)
+                    displacement = rows[-1][self.T_index] - rows[0][self.T_index]
+                    self.__open_segment(1 if displacement > 0 else -1, 0)
+                    self.__write_until(self.__num_rows)
+                if self.__segment is not None:
+                    self.__segment.finish()
+                for segment in self.__segments:
+                    segment.relabel(self.label)
+        except Exception:
+            self.__fail()
+
+    def __fail(self) -> None:
+        self.__failed = True
+        if self.__segment is not None:
+            self.__segment.close()
+        logger.exception(
+            "測定中の分割に失敗したので中止しました. 測定後にTMR_splitで分割してください"
+        )
+
+    def __add_row(self, row: List[float]) -> None:
+        index = self.__num_rows
+        self.__rows.append(row)
+        self.__num_rows += 1
+        if index < self.__step:
+            return
+
+        temp_grad = (
+            row[self.T_index]
+            - self.__rows[index - self.__step - self.__first_index][self.T_index]
+        )
+        value = 1 if temp_grad > 0 else -1
+        if self.__threshold is not None and abs(temp_grad) < self.__threshold:
+            value = 0
+        self.__samples.append(value)
+        self.__sum += value
+        if len(self.__samples) > self.__sample_num:
+            self.__sum -= self.__samples.popleft()
+
+        count = index - self.__step + 1
+        if count >= self.__sample_num:
+            self.__judge(count)
+
+    def __judge(self, count: int) -> None:
+        """heating_cooling_splitの状態遷移をcount点目について1回行う"""
+        if self.__sum > self.__cutout_num:
+            new_state = 1
+        elif self.__sum < self.__cutout_num * (-1):
+            new_state = -1
+        else:
+            new_state = 0
+
+        if self.__state != 0:
+            self.__write_until(count)
+        if self.__state != new_state:
+            # 同じ向きで再開したので前の範囲を延ばす
+            if self.__previous_state == new_state:
+                self.__write_until(count)
+            else:
+                if new_state != 0:
+                    self.__open_segment(new_state, count - self.__sample_num)
+                    self.__write_until(count)
+                    self.__previous_state = new_state
+        self.__state = new_state
+
+        keep_from = count + 1 - self.__sample_num
+        if self.__segment is not None:
+            keep_from = min(keep_from, self.__segment.written_upto)
+        while self.__first_index < keep_from:
+            self.__rows.popleft()
+            self.__first_index += 1
+
+        if (
+            self.__segment is not None
+            and time.monotonic() - self.__last_flush >= self.__flush_interval
+        ):
+            self.__segment.flush()
+            self.__last_flush = time.monotonic()
+
+    def __open_segment(self, state: int, start: int) -> None:
+        if self.__segment is not None:
+            self.__segment.finish()
+        state_name = "heating" if state == 1 else "cooling"
+        self.__segment = OnlineTMRSplitter.Segment(
+            self, self.__segment_count, state_name, start
+        )
+        self.__segments.append(self.__segment)
+        self.__segment_count += 1
+
+    def __write_until(self, end: int) -> None:
+        segment = self.__segment
+        if end <= segment.written_upto:
+            return
+        offset = self.__first_index
+        segment.write(
+            list(islice(self.__rows, segment.written_upto - offset, end - offset))
+        )
+        segment.written_upto = end
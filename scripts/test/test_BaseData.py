@@ -80,3 +80,59 @@ class TestLinkamT95IO(unittest.TestCase):
 
         data = Data(0)
         self.assertEqual(data.x, 100)
+        self.assertEqual(list(data), [100])  # 値を入れていない変数は飛ばす
+
+    def test5(self):
+        # 変数は__slots__になる
+        class Data(BaseData):
+            x: "[mV]"
+
+        data = Data(1)
+        self.assertFalse(hasattr(data, "__dict__"))
+        self.assertEqual(Data.__slots__, ("x",))
+        self.assertEqual(list(data), [1])
+        self.assertEqual(str(data), "1")
+        with self.assertRaises(BaseData.BaseDataError):
+            data.y = 100
+
+    def test6(self):
+        # コンストラクタを自動生成したときはアノテーションの順(to_labelと同じ列の順)に並ぶ
+        class Data(BaseData):
+            y: "[m]"
+            x: "[mV]"
+
+        data = Data(x=1, y=2)
+        self.assertEqual(list(data), [2, 1])
+        self.assertEqual(str(data), "2,1")
+        self.assertEqual(Data.to_label(), "0:y [m],  1:x [mV]")
+
+        # コンストラクタを書いたときは今まで通り代入した順に並び､ 変数は__slots__にならない
+        class Data(BaseData):
+            x: "[mV]"
+            y: "[m]"
+
+            def __init__(self, x, y) -> None:
+                self.y = y
+                self.x = x
+
+        data = Data(1, 2)
+        self.assertTrue(hasattr(data, "__dict__"))
+        self.assertEqual(list(data), [2, 1])
+        self.assertEqual(str(data), "2,1")
+
+    def test7(self):
+        # コンストラクタを書いたときは今まで通りデフォルト値を設定でき､ 代入もできる
+        class Data(BaseData):
+            x: "[mV]" = 5
+            y: "[m]"
+
+            def __init__(self, y) -> None:
+                self.y = y
+
+        data = Data(3)
+        self.assertEqual(data.x, 5)
+        self.assertEqual(list(data), [3])  # 代入していない変数は入らない
+        data.x = 4
+        self.assertEqual(list(data), [3, 4])
+        with self.assertRaises(BaseData.BaseDataError):
+            data.z = 100
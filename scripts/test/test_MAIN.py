@@ -0,0 +1,68 @@
+import multiprocessing
+import signal
+import sys
+import time
+import unittest
+from unittest import mock
+
+sys.path.append("../")
+
+import MAIN
+
+
+class TestParseArgs(unittest.TestCase):
+    def test_headless(self):
+        args = MAIN.parse_args(
+            ["MEAS", "--headless", "--define", "a.def", "--macro", "b.py"]
+        )
+        self.assertTrue(args.headless)
+        self.assertEqual(
+            (args.mode, args.define, args.macro), ("MEAS", "a.def", "b.py")
+        )
+        self.assertEqual(MAIN.parse_args([]).mode, "")  # 引数なしのときはモードを聞く
+
+    def test_error(self):
+        with mock.patch("sys.stderr"):
+            for argv in (
+                ["MEAS", "--headless", "--define", "a.def"],  # マクロがない
+                ["MEAS", "--headless", "--macro", "b.py"],  # 定義ファイルがない
+                ["SPLIT", "--headless", "--define", "a.def", "--macro", "b.py"],
+            ):
+                with self.assertRaises(SystemExit):
+                    MAIN.parse_args(argv)
+
+
+def sleep_forever(ready):
+    ready.set()
+    while True:
+        time.sleep(1)
+
+
+@unittest.skipIf(sys.platform == "win32", "Windowsではシグナルを使わない")
+class TestOnForcedTermination(unittest.TestCase):
+    def setUp(self):
+        for signum in (signal.SIGTERM, signal.SIGHUP):
+            self.addCleanup(signal.signal, signum, signal.getsignal(signum))
+
+    def test_forked_process_terminates(self):
+        # forkで作ったプロセス(グラフのプロセス)は測定を終わらせる処理を引き継がずにterminateで終了する
+        called = []
+        MAIN.on_forced_termination(lambda: called.append(True))
+        context = multiprocessing.get_context("fork")
+        ready = context.Event()
+        process = context.Process(target=sleep_forever, args=(ready,), daemon=True)
+        process.start()
+        # fork直後に送ったシグナルは子プロセスで捨てられることがあるので待つ
+        self.assertTrue(ready.wait(5))
+        process.terminate()
+        process.join(5)
+        self.assertFalse(process.is_alive())
+        self.assertEqual(process.exitcode, -signal.SIGTERM)
+        self.assertEqual(called, [])
+
+        signal.raise_signal(signal.SIGTERM)  # 測定のプロセスでは渡した関数を呼ぶ
+        self.assertEqual(called, [True])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+
+sys.path.append("../")
+
+import calibration
+from calibration import CalibrationError, TMRCalibrationManager
+
+
+class TestTMRCalibrationManager(unittest.TestCase):
+    def setUp(self):
+        self.dirpath = tempfile.mkdtemp()
+        self.filepath = os.path.join(self.dirpath, "calib.txt")
+        with open(self.filepath, "w", encoding="utf-8") as f:
+            # 1列目が温度､ 2列目が抵抗値. 抵抗値の昇順には並んでいない
+            f.write("T [K],R [ohm]\n300,110\n100,30\n200,70\n")
+        self.manager = TMRCalibrationManager()
+        self.manager.set_own_calib_file(self.filepath)
+
+    def tearDown(self):
+        shutil.rmtree(self.dirpath)
+
+    def test_calibration(self):
+        self.assertEqual(self.manager.calibration(30), 100)
+        self.assertEqual(self.manager.calibration(50), 150)
+        self.assertEqual(self.manager.calibration(90), 250)
+        self.assertIsInstance(self.manager.calibration(50), float)
+
+    def test_extrapolate(self):
+        # 範囲外は両端の区間を延長する
+        self.assertEqual(self.manager.calibration(10), 50)
+        self.assertEqual(self.manager.calibration(130), 350)
+
+    def test_calibration_many(self):
+        x = np.array([[10, 30, 50], [90, 110, 130]])
+        expected = [
+            [self.manager.calibration(value) for value in row] for row in x.tolist()
+        ]
+        np.testing.assert_array_equal(self.manager.calibration_many(x), expected)
+        np.testing.assert_array_equal(self.manager.calibration_many([50.0]), [150])
+
+    def test_error(self):
+        with self.assertRaises(CalibrationError):
+            TMRCalibrationManager().calibration(50)
+        with self.assertRaises(CalibrationError):
+            self.manager.calibration("abc")
+        with self.assertRaises(CalibrationError):
+            self.manager.set_own_calib_file(os.path.join(self.dirpath, "none.txt"))
+
+
+class TestCalibrationCache(unittest.TestCase):
+    def setUp(self):
+        self.dirpath = tempfile.mkdtemp()
+        self.filepath = os.path.join(self.dirpath, "calib.txt")
+        self.write("T [K],R [ohm]\n300,110\n100,30\n200,70\n")
+        patcher = mock.patch.object(
+            calibration, "SHARED_VARIABLES", SimpleNamespace(TEMPDIR=Path(self.dirpath))
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.dirpath)
+
+    def write(self, text):
+        with open(self.filepath, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def load(self):
+        manager = TMRCalibrationManager()
+        manager.set_own_calib_file(self.filepath)
+        return manager
+
+    def test_use_cache(self):
+        self.assertEqual(self.load().calibration(50), 150)
+        self.assertEqual(
+            len(os.listdir(os.path.join(self.dirpath, "calibration_cache"))), 1
+        )
+
+        # 2回目はファイルを解析しない
+        with mock.patch.object(
+            calibration, "get_encode_type", side_effect=AssertionError
+        ):
+            self.assertEqual(self.load().calibration(50), 150)
+
+            # 中身が同じならmtimeが変わってもキャッシュを使う
+            stat = os.stat(self.filepath)
+            os.utime(self.filepath, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+            self.assertEqual(self.load().calibration(50), 150)
+
+    def test_file_changed(self):
+        self.load()
+        self.write("T [K],R [ohm]\n300,110\n100,30\n400,70\n")
+        self.assertEqual(self.load().calibration(50), 250)
+
+    def test_broken_cache(self):
+        self.load()
+        cache_dir = os.path.join(self.dirpath, "calibration_cache")
+        for filename in os.listdir(cache_dir):
+            with open(os.path.join(cache_dir, filename), "wb") as f:
+                f.write(b"broken")
+        self.assertEqual(self.load().calibration(50), 150)
+
+
+if __name__ == "__main__":
+    unittest.main()
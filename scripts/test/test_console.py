@@ -0,0 +1,56 @@
+import os
+import sys
+import threading
+import unittest
+
+sys.path.append("../")
+
+import console
+
+
+@unittest.skipIf(sys.platform == "win32", "Windowsではコンソールをパイプにできない")
+class TestConsoleReader(unittest.TestCase):
+    def setUp(self):
+        self.read_fd, self.write_fd = os.pipe()
+        self.addCleanup(os.close, self.read_fd)
+        self.reader = console.ConsoleReader(self.read_fd)
+
+    def tearDown(self):
+        if self.write_fd is not None:
+            os.close(self.write_fd)
+
+    def test_readline(self):
+        os.write(self.write_fd, "a\nコマンド 2\r\nc".encode("utf-8"))
+        self.assertEqual(self.reader.readline(), "a")
+        # まとめて来た行も1行ずつ返す
+        self.assertEqual(self.reader.readline(), "コマンド 2")
+        os.close(self.write_fd)  # 改行のない最後の行は返さずに終わる
+        self.write_fd = None
+        self.assertIsNone(self.reader.readline())
+
+    def test_leave_next_line(self):
+        # 次の行は読まずに残しておくので､ closeした後のinputで読める
+        os.write(self.write_fd, "a\nenter\n".encode("utf-8"))
+        self.assertEqual(self.reader.readline(), "a")
+        self.reader.close()
+        os.set_blocking(self.read_fd, False)  # 読まれてしまっていたときに待たないように
+        self.assertEqual(os.read(self.read_fd, 100), b"enter\n")
+
+    def test_close(self):
+        # 入力を待っている間にcloseすると待つのをやめる
+        result = []
+        thread = threading.Thread(
+            target=lambda: result.append(self.reader.readline()), daemon=True
+        )
+        thread.start()
+        thread.join(0.1)
+        self.assertTrue(thread.is_alive())
+        self.reader.close()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(result, [None])
+        self.reader.close()  # 2回目は何もしない
+
+
+if __name__ == "__main__":
+    unittest.main()
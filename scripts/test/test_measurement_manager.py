@@ -0,0 +1,135 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+sys.path.append("../")
+
+import measurement_manager as mm
+
+
+class TestSetFile(unittest.TestCase):
+    def set_file(self, *args, **kwargs):
+        file_manager = mock.Mock()
+        manager = SimpleNamespace(file_manager=file_manager, headless=False)
+        with mock.patch.object(
+            mm, "_measurement_manager", manager, create=True
+        ), mock.patch.object(
+            mm, "USER_VARIABLES", SimpleNamespace(DATADIR="data")
+        ), mock.patch.object(
+            mm, "get_date_text", return_value="221018-120000"
+        ):
+            mm.set_file(*args, **kwargs)
+        return file_manager.set_file.call_args.kwargs["filepath"]
+
+    def test_extension(self):
+        self.assertEqual(
+            self.set_file("foo", format="npy"), "data/foo221018-120000.npy"
+        )
+        self.assertEqual(
+            self.set_file("foo", add_date=False, format="npy"), "data/foo.npy"
+        )
+        # txtのときは今まで通りつけない
+        self.assertEqual(self.set_file("foo", add_date=False), "data/foo")
+        # 拡張子があればそのまま
+        self.assertEqual(self.set_file("foo.dat", add_date=False), "data/foo.dat")
+        self.assertIsNone(self.set_file())  # ダイアログを出す
+
+
+original_write = mm.FileManager.FileIO.write
+
+
+def slow_write(self, text):
+    time.sleep(0.05)
+    original_write(self, text)
+
+
+class TestMeasureStart(unittest.TestCase):
+    def setUp(self):
+        self.dirpath = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dirpath)
+
+    def run_macro(self, filename, **set_file_kwargs):
+        """3回目のupdateでエラーを出すマクロを動かしてファイルの中身を返す"""
+        filepath = os.path.join(self.dirpath, filename)
+        manager = mm.MeasurementManager(None, headless=True)
+        count = 0
+
+        def start():
+            manager.file_manager.set_file(filepath=filepath, **set_file_kwargs)
+
+        def update():
+            nonlocal count
+            count += 1
+            if count == 3:
+                raise RuntimeError("update error")
+            manager.file_manager.save(count, count * 2)
+
+        manager.macro = SimpleNamespace(
+            start=start,
+            update=update,
+            on_command=None,
+            end=None,
+            split=None,
+            after=None,
+        )
+        with self.assertRaises(RuntimeError):
+            manager.measure_start()
+        with open(filepath) as f:
+            return f.read()
+
+    def test_update_error(self):
+        # updateでエラーが出てもバッファーに残っていた行はファイルに書き出される
+        self.assertEqual(self.run_macro("rows.txt", flush_rows=100), "1,2\n2,4\n")
+        self.assertEqual(
+            self.run_macro("interval.txt", flush_rows=0, flush_interval=60),
+            "1,2\n2,4\n",
+        )
+
+    def test_update_error_async(self):
+        # 書き込みスレッドのキューに残っていた行もmeasure_startを抜ける前に書き出される
+        with mock.patch.object(
+            mm.FileManager.FileIO, "write", side_effect=slow_write, autospec=True
+        ):
+            self.assertEqual(
+                self.run_macro("async.txt", async_write=True), "1,2\n2,4\n"
+            )
+
+    def test_loop_profile_end(self):
+        # end関数の中でのsaveもループの時間のcsvの最後の1行になる
+        filepath = os.path.join(self.dirpath, "profile.txt")
+        csv_filepath = os.path.join(self.dirpath, "profile.csv")
+        manager = mm.MeasurementManager(None, headless=True)
+
+        def start():
+            manager.file_manager.set_file(filepath=filepath)
+            manager.loop_profile = True
+            manager.loop_profile_csv = csv_filepath
+
+        def end():
+            mm.save(0, 0)
+
+        manager.macro = SimpleNamespace(
+            start=start,
+            update=lambda: False,
+            on_command=None,
+            end=end,
+            split=None,
+            after=None,
+        )
+        with mock.patch.object(mm, "_measurement_manager", manager, create=True):
+            manager.measure_start()
+        with open(csv_filepath, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        self.assertEqual(len(lines), 3)  # ヘッダー, update, end
+        update, save, plot, command = map(int, lines[2].split(",")[2:])
+        self.assertEqual((update, plot, command), (0, 0, 0))
+        self.assertGreater(save, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,490 @@
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+sys.path.append("../")
+
+import console
+import measurement_manager_support
+import numpy as np
+import split
+from basedata import BaseData
+from measurement_manager_support import (
+    CommandReceiver,
+    FileManager,
+    LoopProfiler,
+    MeasurementState,
+    MeasurementStep,
+    PlotAgency,
+    UpdateScheduler,
+)
+
+
+class FileTestCase(unittest.TestCase):
+    """一時フォルダにファイルを作るテスト"""
+
+    def setUp(self):
+        self.dirpath = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dirpath)
+        self.file_manager = FileManager()
+
+    def path(self, filename):
+        return os.path.join(self.dirpath, filename)
+
+    def read(self, filename):
+        with open(self.path(filename), encoding="utf-8") as f:
+            return f.read()
+
+
+class FakeMonotonic:
+    """time.monotonicの代わりに進める時計"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestFileIO(FileTestCase):
+    def test_save(self):
+        # ファイルを作る前に書いた分は作ったときに書き込む
+        self.file_manager.write("label\n")
+        filepath = self.path("data.txt")
+        self.file_manager.set_file(filepath=filepath)
+        self.assertEqual(self.file_manager.filepath, filepath)
+        self.file_manager.save(1, 2.5, "a")
+        self.file_manager.save((3, 4))
+        self.file_manager.close()
+        self.assertEqual(self.read("data.txt"), "label\n1,2.5,a\n3,4\n")
+
+    def test_flush_rows(self):
+        fileIO = FileManager.FileIO(self.path("data.txt"), flush_rows=3)
+        self.addCleanup(fileIO.close)
+        fileIO.write("1\n")
+        fileIO.write("2\n")
+        self.assertEqual(self.read("data.txt"), "")
+        fileIO.write("3\n")
+        self.assertEqual(self.read("data.txt"), "1\n2\n3\n")
+
+    def test_flush_interval(self):
+        # 書き込みがなくても時間が経てば反映される
+        fileIO = FileManager.FileIO(
+            self.path("data.txt"), flush_rows=0, flush_interval=0.05
+        )
+        self.addCleanup(fileIO.close)
+        fileIO.write("1\n")
+        self.assertEqual(self.read("data.txt"), "")
+        deadline = time.monotonic() + 5
+        while self.read("data.txt") == "" and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.read("data.txt"), "1\n")
+
+    def test_close(self):
+        fileIO = FileManager.FileIO(self.path("data.txt"), flush_rows=0)
+        fileIO.write("1\n")
+        fileIO.write("2\n")
+        self.assertEqual(self.read("data.txt"), "")
+        fileIO.close()
+        self.assertEqual(self.read("data.txt"), "1\n2\n")
+
+    def test_fsync_interval(self):
+        clock = FakeMonotonic()
+        with mock.patch.object(
+            measurement_manager_support.time, "monotonic", clock
+        ), mock.patch.object(measurement_manager_support.os, "fsync") as fsync:
+            fileIO = FileManager.FileIO(
+                self.path("data.txt"), flush_rows=1, fsync_interval=10
+            )
+            clock.now = 5
+            fileIO.write("1\n")
+            self.assertEqual(fsync.call_count, 0)
+            clock.now = 10
+            fileIO.write("2\n")
+            self.assertEqual(fsync.call_count, 1)
+            fileIO.close()  # 閉じるときは必ず
+            self.assertEqual(fsync.call_count, 2)
+
+            # 反映しない設定では閉じるまでfsyncもしない
+            fileIO = FileManager.FileIO(
+                self.path("other.txt"), flush_rows=0, fsync_interval=10
+            )
+            clock.now = 100
+            fileIO.write("1\n")
+            self.assertEqual(fsync.call_count, 2)
+            fileIO.close()
+            self.assertEqual(fsync.call_count, 3)
+
+
+class SlowFileIO:
+    """gateがセットされるまで書き込みが止まるFileIOの代わり"""
+
+    filepath = "slow.txt"
+
+    def __init__(self, error_text=None):
+        self.rows = []
+        self.gate = threading.Event()
+        self.started = threading.Event()
+        self.closed = False
+        self.__error_text = error_text
+
+    def write(self, text):
+        self.started.set()
+        self.gate.wait()
+        if text == self.__error_text:
+            raise OSError("disk full")
+        self.rows.append(text)
+
+    def close(self):
+        self.closed = True
+
+
+class TestAsyncFileIO(FileTestCase):
+    def test_async_write(self):
+        self.file_manager.set_file(filepath=self.path("data.txt"), async_write=True)
+        for i in range(100):
+            self.file_manager.save(i)
+        self.file_manager.drain()
+        self.file_manager.close()
+        self.assertEqual(self.read("data.txt"), "".join(f"{i}\n" for i in range(100)))
+
+    def test_backpressure(self):
+        fileIO = SlowFileIO()
+        asyncIO = FileManager.AsyncFileIO(fileIO, queue_size=2)
+        self.addCleanup(asyncIO.close)
+        self.addCleanup(fileIO.gate.set)
+        asyncIO.write("1")
+        # 1つ目は書き込みスレッドが取り出して止まっている
+        self.assertTrue(fileIO.started.wait(5))
+        asyncIO.write("2")
+        asyncIO.write("3")  # ここでキューがいっぱい
+        writer = threading.Thread(target=asyncIO.write, args=("4",), daemon=True)
+        writer.start()
+        writer.join(0.1)
+        self.assertTrue(writer.is_alive())  # 空きができるまで待つ
+        fileIO.gate.set()
+        writer.join(5)
+        self.assertFalse(writer.is_alive())
+        asyncIO.drain()
+        self.assertEqual(fileIO.rows, ["1", "2", "3", "4"])
+
+    def test_drain(self):
+        fileIO = SlowFileIO()
+        asyncIO = FileManager.AsyncFileIO(fileIO)
+        self.addCleanup(asyncIO.close)
+        self.addCleanup(fileIO.gate.set)
+        for text in ("1", "2", "3"):
+            asyncIO.write(text)
+        drainer = threading.Thread(target=asyncIO.drain, daemon=True)
+        drainer.start()
+        drainer.join(0.1)
+        self.assertTrue(drainer.is_alive())  # 書き込みが終わるまで戻らない
+        fileIO.gate.set()
+        drainer.join(5)
+        self.assertFalse(drainer.is_alive())
+        self.assertEqual(fileIO.rows, ["1", "2", "3"])
+
+    def test_error(self):
+        # 書き込みスレッドで起きたエラーは測定側のスレッドにFileErrorとして届く
+        fileIO = SlowFileIO(error_text="2")
+        fileIO.gate.set()
+        asyncIO = FileManager.AsyncFileIO(fileIO)
+        asyncIO.write("1")
+        asyncIO.write("2")
+        with self.assertRaises(FileManager.FileError) as cm:
+            asyncIO.drain()
+        self.assertIn("disk full", cm.exception.message)
+        self.assertIsInstance(cm.exception.__cause__, OSError)
+        with self.assertRaises(FileManager.FileError):
+            asyncIO.write("3")
+        with self.assertRaises(FileManager.FileError):
+            asyncIO.close()
+        self.assertTrue(fileIO.closed)  # エラーがあってもファイルは閉じる
+        self.assertEqual(fileIO.rows, ["1"])
+
+
+class TestNpyFileIO(FileTestCase):
+    def test_npy(self):
+        filepath = self.path("data.npy")
+        self.file_manager.set_file(filepath=filepath, format="npy")
+        self.file_manager.save(1, 2)
+        self.file_manager.save(3, 4)
+        self.file_manager.close()
+        self.assertEqual(np.load(filepath).tolist(), [[1, 2], [3, 4]])
+        with self.assertRaises(FileManager.FileError):
+            FileManager().set_file(filepath=self.path("other.npy"), format="csv")
+
+    def test_grow(self):
+        # 最初に確保した行数を超えたら広げてヘッダーの行数も書き直す
+        filepath = self.path("data.npy")
+        fileIO = FileManager.NpyFileIO(filepath)
+        self.addCleanup(fileIO.close)
+        rows = FileManager.NpyFileIO.INITIAL_ROWS + 5
+        for i in range(rows):
+            fileIO.write_row([i, 2 * i])
+        data = np.load(filepath)  # 閉じる前でも読める
+        self.assertEqual(data.shape, (rows, 2))
+        self.assertEqual(data[-1].tolist(), [rows - 1, 2 * (rows - 1)])
+
+    def test_flush_interval(self):
+        filepath = self.path("data.npy")
+        fileIO = FileManager.NpyFileIO(filepath, flush_rows=0, flush_interval=0.05)
+        self.addCleanup(fileIO.close)
+        fileIO.write_row([1, 2])
+        deadline = time.monotonic() + 5
+        while len(np.load(filepath)) == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(np.load(filepath).tolist(), [[1, 2]])
+
+    def test_label(self):
+        class Data(BaseData):
+            x: "[K]"
+            y: "[V]"
+
+        filepath = self.path("data.npy")
+        self.file_manager.set_file(filepath=filepath, format="npy")
+        self.file_manager.write("memo\n")
+        self.file_manager.save(Data(1, 2))
+        self.file_manager.save(Data(3, 4))
+        self.file_manager.close()
+        self.assertEqual(self.read("data_label.txt"), "memo\n0:x [K],  1:y [V]\n")
+
+        data, filename, dirpath, label = split.file_open(filepath)
+        self.assertEqual(np.asarray(data).tolist(), [[1, 2], [3, 4]])
+        self.assertEqual(filename, "data")
+        self.assertEqual(dirpath, self.dirpath)
+        self.assertEqual(label, "memo\n0:x [K],  1:y [V]\n")
+
+
+class TestOnlineSplitIO(FileTestCase):
+    def test_online_split(self):
+        self.file_manager.set_online_split(
+            T_index=0, f_index=1, freq_num=1, sample_and_cutout_num=(5, 3), step=1
+        )
+        self.file_manager.set_file(filepath=self.path("data.txt"))
+        self.file_manager.write("0:T,  1:f\n")
+        for i in range(20):
+            self.file_manager.save(float(i), 1000.0)
+        self.file_manager.close()
+        self.assertEqual(self.read("data.txt").count("\n"), 21)
+        self.assertTrue(
+            os.path.isfile(
+                self.path(os.path.join("data_0_heating", "data_0_heating_all.txt"))
+            )
+        )
+
+    def test_set_online_split_after_set_file(self):
+        self.file_manager.set_file(filepath=self.path("data.txt"))
+        self.addCleanup(self.file_manager.close)
+        with self.assertRaises(FileManager.FileError):
+            self.file_manager.set_online_split(T_index=2, f_index=1)
+
+
+class TestNoPlotAgency(unittest.TestCase):
+    def test_void(self):
+        plot_agency = PlotAgency.NoPlotAgency()
+        plot_agency.prewarm()
+        # キーワード引数でも何もしない
+        plot_agency.set_plot_info(line=True, max_points=100)
+        plot_agency.plot(1, 2, label="a")
+        self.assertFalse(plot_agency.is_plot_window_alive())
+
+
+class TestLoopProfiler(unittest.TestCase):
+    def test_summary(self):
+        profiler = LoopProfiler()
+        for elapsed_ns in (1000, 1500, 3000, 100000):
+            profiler.record(LoopProfiler.UPDATE, elapsed_ns)
+        profiler.record(LoopProfiler.SAVE, 0)
+        summary = profiler.summary()
+        update = summary["update"]
+        self.assertEqual(update["count"], 4)
+        self.assertEqual(update["total"], 105500)
+        self.assertEqual(update["max"], 100000)
+        self.assertEqual(update["histogram"][10], 1)  # 1000は[512, 1024)
+        self.assertEqual(update["histogram"][11], 1)  # 1500は[1024, 2048)
+        self.assertEqual(update["histogram"][17], 1)
+        self.assertEqual(update["p50"], 2048)  # ビンの上端
+        self.assertEqual(update["p99"], 131072)
+        self.assertEqual(summary["save"]["count"], 1)
+        self.assertEqual(summary["save"]["p99"], 0)
+        self.assertEqual(summary["command"]["count"], 0)
+
+    def test_csv(self):
+        dirpath = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, dirpath)
+        filepath = os.path.join(dirpath, "profile.csv")
+        profiler = LoopProfiler()
+        profiler.set_csv(filepath)
+        profiler.record(LoopProfiler.SAVE, 10)
+        profiler.record(LoopProfiler.SAVE, 20)
+        profiler.record(LoopProfiler.UPDATE, 100)
+        profiler.end_iteration()
+        profiler.record_iteration(LoopProfiler.COMMAND, 5)
+        profiler.close()
+        self.assertEqual(profiler.iteration_count, 2)
+        with open(filepath, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        self.assertEqual(
+            lines[0], "iteration,time [s],update [ns],save [ns],plot [ns],command [ns]"
+        )
+        self.assertEqual(lines[1].split(",")[2:], ["100", "30", "0", "0"])
+        self.assertEqual(lines[2].split(",")[2:], ["0", "0", "0", "5"])
+        with self.assertRaises(LoopProfiler.LoopProfilerError):
+            profiler.set_csv(None)
+
+        # 閉じた後や2回目のclose, csvを設定していないときのcloseでも記録はできる
+        profiler.close()
+        profiler.record(LoopProfiler.UPDATE, 100)
+        profiler.end_iteration()
+        profiler.record_iteration(LoopProfiler.UPDATE, 100)
+        LoopProfiler().close()
+        self.assertEqual(profiler.summary()["update"]["count"], 3)
+        self.assertEqual(profiler.iteration_count, 4)
+
+
+class FakeClock:
+    """perf_counterとsleepの代わり. sleepすると時刻が進む"""
+
+    def __init__(self):
+        self.now = 100.0
+
+    def perf_counter(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestUpdateScheduler(unittest.TestCase):
+    def run_updates(self, scheduler, durations):
+        """updateにdurations秒ずつかかるとして､ updateを呼んだ時刻(最初からの秒数)を返す"""
+        clock = FakeClock()
+        times = []
+        time_module = measurement_manager_support.time
+        with mock.patch.object(
+            time_module, "perf_counter", clock.perf_counter
+        ), mock.patch.object(time_module, "sleep", clock.sleep):
+            for duration in durations:
+                # 待っている間はコマンドを確認しに戻る
+                while not scheduler.wait(max_wait=0.1):
+                    pass
+                times.append(round(clock.now - 100, 9))
+                clock.now += duration
+        return times
+
+    def test_grid(self):
+        scheduler = UpdateScheduler(0.5)
+        # 処理の時間によらず0.5秒ごとに呼ぶ
+        self.assertEqual(
+            self.run_updates(scheduler, [0.1, 0.3, 0.45, 0.2]), [0, 0.5, 1.0, 1.5]
+        )
+        summary = scheduler.summary()
+        self.assertEqual((summary["count"], summary["overrun_count"]), (4, 0))
+        self.assertEqual(summary["jitter_max"], 0)
+
+    def test_overrun(self):
+        scheduler = UpdateScheduler(0.5)
+        with self.assertLogs(measurement_manager_support.logger, "WARNING"):
+            times = self.run_updates(scheduler, [0.1, 1.2, 0.1, 0.1])
+        # 1.0の時刻は飛ばして1.7にすぐ呼び､ その後は元の格子に戻る
+        self.assertEqual(times, [0, 0.5, 1.7, 2.0])
+        summary = scheduler.summary()
+        self.assertEqual((summary["count"], summary["overrun_count"]), (4, 1))
+        self.assertAlmostEqual(summary["jitter_max"], 0.2)
+        self.assertAlmostEqual(summary["jitter_mean"], 0.05)
+
+    def test_interrupt(self):
+        scheduler = UpdateScheduler(10)
+        self.assertTrue(scheduler.wait())
+        interrupt = threading.Event()
+        threading.Timer(0.05, interrupt.set).start()
+        start = time.perf_counter()
+        # コマンドが来たらすぐに起きる
+        self.assertFalse(scheduler.wait(max_wait=5, interrupt=interrupt))
+        self.assertLess(time.perf_counter() - start, 1)
+
+    def test_interval_error(self):
+        for interval in (0, -1, "1"):
+            with self.assertRaises(UpdateScheduler.UpdateSchedulerError):
+                UpdateScheduler(interval)
+
+
+class TestCommandReceiver(unittest.TestCase):
+    def setUp(self):
+        self.state = MeasurementState()
+        self.state.current_step = MeasurementStep.UPDATE
+        self.receiver = CommandReceiver(self.state)
+        self.addCleanup(self.receiver.close)
+
+    def test_queue(self):
+        self.assertIsNone(self.receiver.get_command())
+        self.receiver.put_command("a")
+        self.receiver.put_command("b")
+        self.assertTrue(self.receiver.arrived.is_set())
+        self.assertEqual(self.receiver.get_command(), "a")
+        self.assertTrue(self.receiver.arrived.is_set())
+        self.assertEqual(self.receiver.get_command(), "b")
+        self.assertFalse(self.receiver.arrived.is_set())  # キューが空になったら下ろす
+        self.assertIsNone(self.receiver.get_command())
+
+    def test_socket(self):
+        self.receiver.set_source(use_console=False, port=0)
+        with mock.patch("builtins.print"):
+            self.receiver.initialize()
+        with socket.create_connection(("127.0.0.1", self.receiver.port)) as connection:
+            connection.sendall("stop\n\nnext 1\n".encode("utf-8"))
+        commands = []
+        while len(commands) < 2:
+            self.assertTrue(self.receiver.arrived.wait(5))
+            commands.append(self.receiver.get_command())
+        self.assertEqual(commands, ["stop", "next 1"])
+
+    def test_socket_close(self):
+        # closeで接続待ちのスレッドが終わる
+        self.receiver.set_source(use_console=False, port=0)
+        threads = set(threading.enumerate())
+        with mock.patch("builtins.print"):
+            self.receiver.initialize()
+        (thread,) = set(threading.enumerate()) - threads
+        self.receiver.close()
+        self.assertFalse(thread.is_alive())
+        with self.assertRaises(OSError):
+            socket.create_connection(
+                ("127.0.0.1", self.receiver.port), timeout=1
+            ).close()
+
+    @unittest.skipIf(sys.platform == "win32", "Windowsではコンソールをパイプにできない")
+    def test_console(self):
+        # コンソールからのコマンドも待たずに届き､ closeで受け取りのスレッドが終わる
+        read_fd, write_fd = os.pipe()
+        self.addCleanup(os.close, read_fd)
+        self.addCleanup(os.close, write_fd)
+        reader = console.ConsoleReader(read_fd)
+        threads = set(threading.enumerate())
+        with mock.patch.object(console, "ConsoleReader", return_value=reader):
+            self.receiver.initialize()
+        (thread,) = set(threading.enumerate()) - threads
+        start = time.perf_counter()
+        os.write(write_fd, b"stop\n")
+        self.assertTrue(self.receiver.arrived.wait(5))
+        self.assertLess(time.perf_counter() - start, 0.05)
+        self.assertEqual(self.receiver.get_command(), "stop")
+        self.receiver.close()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+
+    def test_source_error(self):
+        for kwargs in (dict(use_console=1), dict(port=-1), dict(port="50000")):
+            with self.assertRaises(CommandReceiver.CommandReceiverError):
+                self.receiver.set_source(**kwargs)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,409 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import warnings
+from multiprocessing import Pipe, Value
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import numpy as np
+
+sys.path.append("../")
+
+import plot
+from plot_buffer import PlotBuffer
+
+
+class TestPlotWindow(unittest.TestCase):
+    def setUp(self):
+        self.plot_buffer = PlotBuffer(capacity=1000)
+        self.addCleanup(self.plot_buffer.close)
+
+    def make_window(self, **kwargs):
+        plot_info = dict(
+            xlog=False,
+            ylog=False,
+            renew_interval=0,
+            flowwidth=0,
+            line=False,
+            legend=False,
+        )
+        plot_info.update(kwargs)
+        window = plot.PlotWindow(self.plot_buffer, Value("i", 0), **plot_info)
+        self.addCleanup(plot.plt.close, window._figure)
+        return window
+
+    def line_data(self, window, label):
+        line = window.linedict[label].line
+        return (
+            np.asarray(line.get_xdata()).tolist(),
+            np.asarray(line.get_ydata()).tolist(),
+        )
+
+    def test_renew_window(self):
+        window = self.make_window()
+        self.plot_buffer.write(0, 1, "a")
+        self.plot_buffer.write_many([1, 2, 3], [2, 3, 4], "b")
+        self.plot_buffer.write(4, 5, "a")
+        window.renew_window()
+        self.assertEqual(self.line_data(window, "a"), ([0, 4], [1, 5]))
+        self.assertEqual(self.line_data(window, "b"), ([1, 2, 3], [2, 3, 4]))
+        # 色は初めて出てきたラベルの順
+        self.assertEqual(window.linedict["a"].line.get_color(), plot.colormap[0])
+        self.assertEqual(window.linedict["b"].line.get_color(), plot.colormap[1])
+
+        self.plot_buffer.write_many([5, 6], [-1, 7], "a")
+        window.renew_window()
+        self.assertEqual(self.line_data(window, "a"), ([0, 4, 5, 6], [1, 5, -1, 7]))
+        self.assertEqual(
+            (window.min_x, window.max_x, window.min_y, window.max_y), (0, 6, -1, 7)
+        )
+
+    def test_flowwidth(self):
+        window = self.make_window(flowwidth=10)
+        self.plot_buffer.write_many(np.arange(50), np.arange(50), "a")
+        window.renew_window()
+        self.plot_buffer.write_many(np.arange(50, 100), np.arange(50), "a")
+        window.renew_window()
+        # 横幅の外の点は1点だけ残して消す
+        self.assertEqual(window.linedict["a"].xarray.tolist(), list(range(88, 100)))
+        self.assertEqual(window._ax.get_xlim(), (89, 99))
+
+    def test_blit(self):
+        window = self.make_window(blit=True, legend=True)
+        self.assertTrue(window.blit)
+        full_draws = []
+        window._figure.canvas.mpl_connect("draw_event", full_draws.append)
+        self.plot_buffer.write_many([0, 10], [0, 10], "a")
+        window.renew_window()
+        self.assertEqual(len(full_draws), 1)  # 最初は背景を作る
+        self.assertEqual(window._ax.get_xlim(), (-1, 11))  # 余白をつけて広げる
+
+        # 余白の中なら線だけを描き直す
+        self.plot_buffer.write_many([10.5, 10.8], [-0.5, 10.9], "a")
+        window.renew_window()
+        self.assertEqual(len(full_draws), 1)
+        self.assertEqual(self.line_data(window, "a")[0], [0, 10, 10.5, 10.8])
+        # 線だけを描き直した画面は全体を描き直したときと同じ
+        blitted = np.asarray(window._figure.canvas.buffer_rgba()).copy()
+        window._figure.canvas.draw()
+        np.testing.assert_array_equal(
+            blitted, np.asarray(window._figure.canvas.buffer_rgba())
+        )
+
+        # はみ出したり凡例が増えたりしたら全体を描き直す
+        full_draws.clear()
+        self.plot_buffer.write(20, 5, "a")
+        window.renew_window()
+        self.assertEqual(len(full_draws), 1)
+        self.plot_buffer.write(15, 5, "b")
+        window.renew_window()
+        self.assertEqual(len(full_draws), 2)
+
+    def test_blit_flowwidth(self):
+        window = self.make_window(blit=True, flowwidth=10)
+        self.plot_buffer.write_many(np.arange(50), np.arange(50), "a")
+        window.renew_window()
+        self.assertEqual(window._ax.get_xlim(), (40, 50))
+        self.plot_buffer.write(49.5, 0, "a")
+        window.renew_window()
+        # 右端を超えるまでは動かさない
+        self.assertEqual(window._ax.get_xlim(), (40, 50))
+        self.plot_buffer.write_many(np.arange(50, 100), np.arange(50), "a")
+        window.renew_window()
+        self.assertEqual(window._ax.get_xlim(), (90, 100))
+        self.assertEqual(window.linedict["a"].xarray.tolist(), list(range(89, 100)))
+
+    def test_run_adaptive(self):
+        window = self.make_window(max_fps=30)
+        window.isfinish.value = 1
+        self.plot_buffer.write_many([0, 1], [2, 3], "a")
+        with warnings.catch_warnings():  # Aggではshowできないという警告は無視する
+            warnings.simplefilter("ignore", UserWarning)
+            window.run()
+        # 終了するときに残った点も描く
+        self.assertEqual(self.line_data(window, "a"), ([0, 1], [2, 3]))
+        self.assertEqual(self.plot_buffer.pending_count, 0)
+
+    def test_extend_range(self):
+        self.assertEqual(
+            plot.extend_range(np.array([1.0, 3.0]), None, None), (1, 3, True)
+        )
+        self.assertEqual(plot.extend_range(np.array([2.0]), None, None), (2, 2, False))
+        self.assertEqual(
+            plot.extend_range(np.array([np.nan, 2.0]), 1, 3), (1, 3, False)
+        )
+        self.assertEqual(plot.extend_range(np.array([0.0]), 1, 3), (0, 3, True))
+
+
+class TestSnapshotWindow(unittest.TestCase):
+    def setUp(self):
+        self.plot_buffer = PlotBuffer(capacity=1000)
+        self.addCleanup(self.plot_buffer.close)
+        self.dirpath = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dirpath)
+
+    def make_window(self, filename, snapshot_interval=60):
+        plot_info = dict(
+            xlog=False,
+            ylog=False,
+            renew_interval=0,
+            flowwidth=0,
+            line=False,
+            legend=True,
+        )
+        window = plot.SnapshotWindow(
+            self.plot_buffer,
+            Value("i", 0),
+            os.path.join(self.dirpath, filename),
+            snapshot_interval,
+            **plot_info
+        )
+        self.addCleanup(plot.plt.close, window._figure)
+        return window
+
+    def test_run(self):
+        for filename, header in (("plot.png", b"\x89PNG"), ("plot.svg", b"<?xml")):
+            window = self.make_window(filename)
+            window.isfinish.value = 1
+            self.plot_buffer.write_many([0, 1, 2], [2, 3, 1], "a")
+            window.run()  # 終了するときに保存する
+            with open(window.snapshot_path, "rb") as f:
+                self.assertTrue(f.read().startswith(header))
+            self.assertEqual(window.linedict["a"].xarray.tolist(), [0, 1, 2])
+        # 一時ファイルは残らない
+        self.assertEqual(sorted(os.listdir(self.dirpath)), ["plot.png", "plot.svg"])
+
+    def test_save_only_when_changed(self):
+        window = self.make_window("plot.png")
+        window.save_snapshot()
+        self.assertFalse(os.path.exists(window.snapshot_path))
+        self.plot_buffer.write(0, 1, "a")
+        window.renew_window()
+        window.save_snapshot()
+        mtime = os.stat(window.snapshot_path).st_mtime_ns
+        window.renew_window()
+        window.save_snapshot()
+        self.assertEqual(os.stat(window.snapshot_path).st_mtime_ns, mtime)
+
+    def test_save_error(self):
+        # 保存先に書き込めなくても警告だけ出してプロットは続ける
+        window = self.make_window(os.path.join("missing", "plot.png"))
+        window.isfinish.value = 1
+        self.plot_buffer.write(0, 1, "a")
+        with self.assertLogs(plot.logger, "WARNING"):
+            window.run()
+        self.assertFalse(os.path.exists(window.snapshot_path))
+
+        # 書き込めるようになったら次の保存で保存される
+        os.mkdir(os.path.join(self.dirpath, "missing"))
+        window.save_snapshot()
+        self.assertEqual(
+            os.listdir(os.path.join(self.dirpath, "missing")), ["plot.png"]
+        )
+
+    def test_start_plot_window(self):
+        path = os.path.join(self.dirpath, "start.png")
+        isfinish = Value("i", 1)
+        self.plot_buffer.write(0, 1, "a")
+        plot_info = dict(
+            xlog=False,
+            ylog=False,
+            renew_interval=0,
+            flowwidth=0,
+            line=False,
+            legend=False,
+        )
+        plot_info.update(max_points=0, blit=True, max_fps=0)
+        plot_info.update(snapshot_interval=1, snapshot_format="png", snapshot_path=path)
+        plot.start_plot_window(self.plot_buffer, isfinish, plot_info)
+        self.assertTrue(os.path.isfile(path))
+
+    def test_wait_plot_info(self):
+        path = os.path.join(self.dirpath, "wait.png")
+        isfinish = Value("i", 1)
+        self.plot_buffer.write(0, 1, "a")
+        plot_info = dict(
+            xlog=False,
+            ylog=False,
+            renew_interval=0,
+            flowwidth=0,
+            line=False,
+            legend=False,
+        )
+        plot_info.update(snapshot_interval=1, snapshot_path=path)
+        receiver, sender = Pipe(duplex=False)
+        sender.send(plot_info)
+        plot.wait_plot_info(self.plot_buffer, isfinish, receiver)
+        self.assertTrue(os.path.isfile(path))
+
+        # plot_infoを送らずに閉じたら何もせずに終わる
+        receiver, sender = Pipe(duplex=False)
+        sender.close()
+        plot.wait_plot_info(self.plot_buffer, isfinish, receiver)
+
+
+class TestRenewScheduler(unittest.TestCase):
+    def test_after_redraw(self):
+        scheduler = plot.RenewScheduler(max_fps=10, idle_interval=1)
+        self.assertAlmostEqual(scheduler.after_redraw(0.02), 0.08)  # 1秒に10回まで
+        # 描画が重いときは描画と同じだけ待つ
+        self.assertAlmostEqual(scheduler.after_redraw(0.3), 0.3)
+
+    def test_after_idle(self):
+        scheduler = plot.RenewScheduler(max_fps=10, idle_interval=1)
+        waits = [scheduler.after_idle() for _ in range(6)]
+        self.assertEqual(waits, [0.1, 0.2, 0.4, 0.8, 1, 1])
+        scheduler.after_redraw(0.01)  # 点が来たら待ち時間を戻す
+        self.assertEqual(scheduler.after_idle(), 0.1)
+
+
+class TestLineObj(unittest.TestCase):
+    def setUp(self):
+        figure, ax = plot.plt.subplots()
+        self.addCleanup(plot.plt.close, figure)
+        (line,) = ax.plot([], [])
+        self.lineobj = plot.PlotWindow.LineObj(line)
+
+    def test_extend(self):
+        expected = []
+        for i in range(30):
+            x = np.arange(i * 100, (i + 1) * 100, dtype=np.float64)
+            self.lineobj.extend(x, -x)
+            expected.extend(x.tolist())
+        self.assertEqual(self.lineobj.xarray.tolist(), expected)
+        self.assertEqual(self.lineobj.yaaray.tolist(), [-v for v in expected])
+        self.lineobj.update_line()
+        self.assertEqual(len(self.lineobj.line.get_xdata()), 3000)
+
+    def test_readonly(self):
+        # 外から書き換えて描画中のデータを壊せない
+        self.lineobj.extend(np.array([0.0, 1.0]), np.array([2.0, 3.0]))
+        with self.assertRaises(ValueError):
+            self.lineobj.xarray[0] = 10
+        with self.assertRaises(ValueError):
+            self.lineobj.yaaray[0] = 10
+        # バッファーには書き込める
+        self.lineobj.extend(np.array([2.0]), np.array([4.0]))
+        self.assertEqual(self.lineobj.xarray.tolist(), [0.0, 1.0, 2.0])
+
+    def legacy_cut(self, xarray, xmin):
+        """1点ずつ調べていたころのflowwidthの処理で消す点の数"""
+        cut = 0
+        for i, xvalue in enumerate(xarray):
+            if xvalue < xmin:
+                continue
+            else:
+                cut = max(i - 1, 0)
+                break
+        return cut
+
+    def test_cut_before(self):
+        rng = np.random.default_rng(0)
+        # 昇順とそうでないもの
+        for x in (np.sort(rng.normal(size=300)), rng.normal(size=300)):
+            for xmin in (-10, -1, 0, 0.5, 1.5):
+                figure, ax = plot.plt.subplots()
+                (line,) = ax.plot([], [])
+                lineobj = plot.PlotWindow.LineObj(line)
+                for part in np.array_split(x, 7):
+                    lineobj.extend(part, part)
+                lineobj.cut_before(xmin)
+                expected = x[self.legacy_cut(x.tolist(), xmin) :]
+                self.assertEqual(lineobj.xarray.tolist(), expected.tolist())
+                plot.plt.close(figure)
+
+        # 全ての点がxminより前のときは最後の1点だけ残す
+        self.lineobj.extend(np.arange(10.0), np.arange(10.0))
+        self.lineobj.cut_before(100)
+        self.assertEqual(self.lineobj.xarray.tolist(), [9.0])
+
+    def test_cut(self):
+        # 先頭を消しながら追加しても容量は増え続けない
+        for i in range(100):
+            x = np.arange(i * 100, (i + 1) * 100, dtype=np.float64)
+            self.lineobj.extend(x, x)
+            self.lineobj.cut(100)
+        self.lineobj.extend(np.array([1.0]), np.array([2.0]))
+        self.assertEqual(self.lineobj.xarray.tolist(), [1.0])
+        self.assertLessEqual(
+            len(self.lineobj._LineObj__x), plot.PlotWindow.LineObj.INITIAL_CAPACITY
+        )
+
+
+class TestLevelOfDetail(unittest.TestCase):
+    def setUp(self):
+        figure, ax = plot.plt.subplots()
+        self.addCleanup(plot.plt.close, figure)
+        (line,) = ax.plot([], [])
+        self.lineobj = plot.PlotWindow.LineObj(line, max_points=1000)
+        self.rng = np.random.default_rng(0)
+
+    def test_decimate_indices(self):
+        x = self.rng.normal(size=103)
+        y = self.rng.normal(size=103)
+        indices = plot.decimate_indices(x, y, 10)
+        self.assertTrue(np.all(np.diff(indices) > 0))
+        self.assertLess(indices[-1], 100)  # 最後の半端な区間は使わない
+        for i in range(10):
+            bucket = set(range(i * 10, (i + 1) * 10)) & set(indices.tolist())
+            self.assertLessEqual(len(bucket), 6)
+            for value in (x, y):
+                part = value[i * 10 : (i + 1) * 10]
+                self.assertIn(i * 10 + int(np.argmin(part)), bucket)
+                self.assertIn(i * 10 + int(np.argmax(part)), bucket)
+
+    def check_line(self):
+        x_drawn = np.asarray(self.lineobj.line.get_xdata())
+        y_drawn = np.asarray(self.lineobj.line.get_ydata())
+        self.assertLessEqual(len(x_drawn), self.lineobj.max_points * 1.1)
+        self.assertTrue(np.all(np.diff(x_drawn) > 0))  # 順番は変わらない
+        # 外形(最初と最後の点とyの最大最小)は残る
+        self.assertEqual(x_drawn[0], self.lineobj.xarray[0])
+        self.assertEqual(x_drawn[-1], self.lineobj.xarray[-1])
+        self.assertEqual(y_drawn.max(), self.lineobj.yaaray.max())
+        self.assertEqual(y_drawn.min(), self.lineobj.yaaray.min())
+
+    def test_update_line(self):
+        for i in range(200):
+            x = np.arange(i * 500, (i + 1) * 500, dtype=np.float64)
+            self.lineobj.extend(x, self.rng.normal(size=500))
+            self.lineobj.update_line()
+            self.check_line()
+        self.assertEqual(len(self.lineobj), 100000)
+
+    def test_cut(self):
+        for i in range(100):
+            x = np.arange(i * 500, (i + 1) * 500, dtype=np.float64)
+            self.lineobj.extend(x, self.rng.normal(size=500))
+            self.lineobj.cut(300 if i > 20 else 0)
+            self.lineobj.update_line()
+            self.check_line()
+
+    def test_flowwidth(self):
+        # flowwidthで途中まで消した区間でも残っている点の最大と最小は描く
+        self.lineobj.max_points = 60
+        window = 200.5
+        end = 0
+        for i in range(300):
+            num = int(self.rng.integers(1, 50))
+            x = np.arange(end, end + num, dtype=np.float64)
+            end += num
+            self.lineobj.extend(x, self.rng.normal(size=num))
+            self.lineobj.cut_before(end - window)
+            self.lineobj.update_line()
+            if len(self.lineobj) > self.lineobj.max_points:
+                self.check_line()
+
+    def test_small(self):
+        self.lineobj.extend(np.arange(10.0), np.arange(10.0))
+        self.lineobj.update_line()
+        self.assertEqual(len(self.lineobj.line.get_xdata()), 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
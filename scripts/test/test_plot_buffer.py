@@ -0,0 +1,82 @@
+import sys
+import unittest
+from multiprocessing import Process, Queue
+
+import numpy as np
+
+sys.path.append("../")
+
+from plot_buffer import PlotBuffer
+
+
+def read_in_child(plot_buffer, queue):
+    x, y, label_ids = plot_buffer.read()
+    queue.put(
+        (x.tolist(), y.tolist(), [plot_buffer.label(i) for i in label_ids.tolist()])
+    )
+    plot_buffer.close()
+
+
+class TestPlotBuffer(unittest.TestCase):
+    def test_read_write(self):
+        plot_buffer = PlotBuffer(capacity=4)
+        self.addCleanup(plot_buffer.close)
+        self.assertTrue(plot_buffer.write(1, 2, "a"))
+        self.assertTrue(plot_buffer.write(3, 4, 5.0))
+        self.assertEqual(plot_buffer.pending_count, 2)
+        x, y, label_ids = plot_buffer.read()
+        self.assertEqual(x.tolist(), [1, 3])
+        self.assertEqual(y.tolist(), [2, 4])
+        self.assertEqual([plot_buffer.label(i) for i in label_ids], ["a", 5.0])
+        self.assertEqual(len(plot_buffer.read()[0]), 0)
+        self.assertEqual(plot_buffer.pending_count, 0)
+
+    def test_wrap_and_drop(self):
+        plot_buffer = PlotBuffer(capacity=4)
+        self.addCleanup(plot_buffer.close)
+        for i in range(3):
+            plot_buffer.write(i, i, "a")
+        plot_buffer.read()
+        for i in range(3, 8):  # 4点目まで入って5点目は捨てられる
+            plot_buffer.write(i, -i, "b")
+        self.assertEqual(plot_buffer.dropped_count, 1)
+        x, y, label_ids = plot_buffer.read()
+        self.assertEqual(x.tolist(), [3, 4, 5, 6])
+        np.testing.assert_array_equal(label_ids, [1, 1, 1, 1])
+
+    def test_write_many(self):
+        plot_buffer = PlotBuffer(capacity=5)
+        self.addCleanup(plot_buffer.close)
+        plot_buffer.write(0, 0, "a")
+        plot_buffer.write(1, 1, "a")
+        plot_buffer.read()
+        # 末尾から先頭に回り込み､ 入りきらない1点は捨てられる
+        self.assertEqual(
+            plot_buffer.write_many(np.arange(2, 8), [2, 3, 4, 5, 6, 7], "b"), 5
+        )
+        self.assertEqual(plot_buffer.dropped_count, 1)
+        x, y, label_ids = plot_buffer.read()
+        self.assertEqual(x.tolist(), [2, 3, 4, 5, 6])
+        self.assertEqual(y.tolist(), [2, 3, 4, 5, 6])
+        self.assertEqual({plot_buffer.label(i) for i in label_ids}, {"b"})
+        self.assertEqual(plot_buffer.write_many([], [], "c"), 0)
+        with self.assertRaises(ValueError):
+            plot_buffer.write_many([1, 2], [1], "b")
+
+    def test_other_process(self):
+        plot_buffer = PlotBuffer()
+        self.addCleanup(plot_buffer.close)
+        for i in range(100):
+            plot_buffer.write(i, i * 2, f"label{i % 3}")
+        queue = Queue()
+        process = Process(target=read_in_child, args=(plot_buffer, queue))
+        process.start()
+        x, y, labels = queue.get(timeout=30)
+        process.join()
+        self.assertEqual(x, list(range(100)))
+        self.assertEqual(y, [i * 2 for i in range(100)])
+        self.assertEqual(labels, [f"label{i % 3}" for i in range(100)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,443 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from itertools import product
+
+import numpy as np
+
+sys.path.append("../")
+
+import split
+
+
+def legacy_file_open(filepath, encoding="utf-8"):
+    """1行ずつfloatに変換していたころのfile_openと同じ処理"""
+    label = ""
+    data = []
+    with open(filepath, "r", encoding=encoding) as file:
+        while True:
+            line_raw = file.readline()
+            line = line_raw.strip()
+            if line == "":
+                break
+            try:
+                data.append([float(s) for s in line.split(",")])
+            except Exception:
+                label += line_raw
+    return data, label
+
+
+def legacy_heating_cooling_split(
+    data, T_index, sample_and_cutout_num=(150, 120), step=10, threshold=None
+):
+    """1点ずつリングバッファで判定していたころのheating_cooling_splitと同じ処理"""
+    if step == 0:
+        step = 1
+    sample_num, cutout_num = sample_and_cutout_num
+
+    def temp_judge(temp_grad):
+        value = 1 if temp_grad > 0 else -1
+        if threshold is not None and abs(temp_grad) < threshold:
+            value = 0
+        return value
+
+    samples_hc = []
+    count = 0
+    for i in range(sample_num):
+        if count >= len(data) - step:
+            return [data]
+        samples_hc.append(
+            temp_judge(data[count + step][T_index] - data[count][T_index])
+        )
+        count += 1
+
+    previous_state = -5
+    state = 0
+    split_points_hc = []
+    while True:
+        sum_count = sum(samples_hc)
+        if sum_count > cutout_num:
+            new_state = 1
+        elif sum_count < cutout_num * (-1):
+            new_state = -1
+        else:
+            new_state = 0
+
+        if state != new_state:
+            if previous_state == new_state:
+                del split_points_hc[-1]
+            else:
+                if state != 0:
+                    split_points_hc.append(count)
+                if new_state != 0:
+                    split_points_hc.append(count - sample_num)
+                    previous_state = new_state
+
+        if count >= len(data) - step:
+            if len(split_points_hc) % 2 == 1:
+                split_points_hc.append(count)
+            break
+
+        state = new_state
+        samples_hc[count % sample_num] = temp_judge(
+            data[count + step][T_index] - data[count][T_index]
+        )
+        count += 1
+
+    return [
+        data[split_points_hc[i] : split_points_hc[i + 1]]
+        for i in range(0, len(split_points_hc), 2)
+    ]
+
+
+def make_temperature_data(rows, seed, noise=0.05):
+    """昇温･降温･保持を繰り返す温度データ(2列目が温度)"""
+    rng = np.random.default_rng(seed)
+    rate = rng.choice([-1.0, 0.0, 1.0], size=rows // 200 + 1).repeat(200)[:rows]
+    temperature = 300 + np.cumsum(rate * 0.1 + rng.normal(0, noise, rows))
+    return np.column_stack([np.arange(rows), temperature])
+
+
+class TestFileOpen(unittest.TestCase):
+    def setUp(self):
+        self.dirpath = tempfile.mkdtemp()
+        self.count = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.dirpath)
+
+    def check(self, text):
+        self.count += 1
+        filepath = os.path.join(self.dirpath, f"data{self.count}.txt")
+        with open(filepath, "w", encoding="utf-8") as f:
+            f.write(text)
+
+        data, filename, dirpath, label = split.file_open(filepath)
+        expected_data, expected_label = legacy_file_open(filepath)
+
+        self.assertEqual(filename, f"data{self.count}")
+        self.assertEqual(dirpath, self.dirpath)
+        self.assertEqual(label, expected_label)
+        self.assertEqual(len(data), len(expected_data))
+        for row, expected_row in zip(data, expected_data):
+            np.testing.assert_array_equal(row, expected_row)  # nan同士も等しいとみなす
+        return data, label
+
+    def test_label_block(self):
+        data, label = self.check(
+            "s=1[mm2], d=2[mm]\n0:x [s],  1:y [K]\n0,1.5\n1,2.5\n2,-3e-5\n"
+        )
+        self.assertIsInstance(data, np.ndarray)
+        self.assertEqual(data.shape, (3, 2))
+        self.assertEqual(label, "s=1[mm2], d=2[mm]\n0:x [s],  1:y [K]\n")
+
+    def test_no_trailing_newline(self):
+        data, _ = self.check("x,y\n1,2\n3,4")
+        self.assertEqual(data.shape, (2, 2))
+
+    def test_label_in_middle(self):
+        # 途中にラベル行があっても1行ずつ読んだときと同じになる
+        data, label = self.check("x,y\n1,2\ncomment\n3,4\n")
+        self.assertEqual(label, "x,y\ncomment\n")
+
+    def test_ragged(self):
+        self.check("x\n1,2\n3,4,5\n6\n")
+
+    def test_blank_line(self):
+        # 空白だけの行より後ろは読まない
+        data, _ = self.check("x\n1,2\n  \n3,4\n")
+        self.assertEqual(len(data), 1)
+
+    def test_float_format(self):
+        self.check("1_0, 2 \nnan,inf\n1,\n+.5,-Infinity\n")
+
+    def test_encoding(self):
+        # ラベルが先頭にないShift_JISのファイルとCRLFのファイル
+        filepath = os.path.join(self.dirpath, "sjis.txt")
+        text = "1,2\n" * 10000 + "温度を変更\n3,4\n"
+        with open(filepath, "w", encoding="shift_jis") as f:
+            f.write(text)
+        data, _, _, label = split.file_open(filepath)
+        self.assertEqual(label, "温度を変更\n")
+        self.assertEqual(len(data), 10001)
+
+        filepath = os.path.join(self.dirpath, "crlf.txt")
+        with open(filepath, "w", encoding="utf-8", newline="\r\n") as f:
+            f.write("ラベル\n1,2\n3,4\n")
+        data, _, _, label = split.file_open(filepath)
+        self.assertEqual(label, "ラベル\n")
+        self.assertEqual(data.shape, (2, 2))
+
+    def test_no_data(self):
+        filepath = os.path.join(self.dirpath, "label_only.txt")
+        with open(filepath, "w", encoding="utf-8") as f:
+            f.write("label\n")
+        with self.assertRaises(split.SplitError):
+            split.file_open(filepath)
+
+
+class TestHeatingCoolingSplit(unittest.TestCase):
+    def check(self, data, **kwargs):
+        result = split.heating_cooling_split(data, T_index=1, **kwargs)
+        expected = legacy_heating_cooling_split(data, T_index=1, **kwargs)
+        self.assertEqual(len(result), len(expected))
+        for segment, expected_segment in zip(result, expected):
+            np.testing.assert_array_equal(segment, expected_segment)
+        return result
+
+    def test_same_as_legacy(self):
+        for seed in range(5):
+            data = make_temperature_data(5000, seed)
+            for threshold in (None, 0, 0.05):
+                for step in (0, 1, 10):
+                    self.check(
+                        data,
+                        sample_and_cutout_num=(50, 30),
+                        step=step,
+                        threshold=threshold,
+                    )
+
+    def test_list_input(self):
+        data = make_temperature_data(3000, 10).tolist()
+        result = self.check(data, sample_and_cutout_num=(100, 60), step=5, threshold=0)
+        self.assertIsInstance(result[0], list)
+
+    def test_too_few_data(self):
+        data = make_temperature_data(100, 0)
+        result = self.check(data, sample_and_cutout_num=(95, 60), step=10)
+        self.assertEqual(len(result), 1)
+        self.check(data, sample_and_cutout_num=(90, 60), step=10)
+
+
+class TestCyclicSplit(unittest.TestCase):
+    def legacy_cyclic_split(self, data, cycle_num):
+        new_data = [[] for i in range(cycle_num)]
+        for count, row in enumerate(data):
+            new_data[count % cycle_num].append(row)
+        return new_data
+
+    def test_same_as_legacy(self):
+        for rows in (1, 15, 16, 17, 100):
+            data = make_temperature_data(rows, 0)
+            for cycle_num in (1, 3, 16):
+                result = split.cyclic_split(data, cycle_num)
+                expected = self.legacy_cyclic_split(data.tolist(), cycle_num)
+                self.assertEqual([r.tolist() for r in result], expected)
+                self.assertEqual(split.cyclic_split(data.tolist(), cycle_num), expected)
+
+    def test_view(self):
+        # numpyの配列はコピーされない
+        data = make_temperature_data(100, 0)
+        for split_data in split.cyclic_split(data, 16):
+            self.assertTrue(np.shares_memory(split_data, data))
+
+
+class TestCreateFile(unittest.TestCase):
+    def setUp(self):
+        self.dirpath = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dirpath)
+
+    def read(self, filename):
+        with open(os.path.join(self.dirpath, filename), "r", encoding="utf-8") as f:
+            return f.read()
+
+    def test_text(self):
+        data = [[0.1, 1e-05, 2], [3.0, 1e16, -4.5]]
+        expected = "label\n0.1,1e-05,2\n3.0,1e+16,-4.5\n"
+
+        split.create_file(
+            os.path.join(self.dirpath, "list.txt"), data, label="label\n", chunk_rows=1
+        )
+        self.assertEqual(self.read("list.txt"), expected)
+
+        array = np.array(data, dtype=np.float64)
+        split.create_file(
+            os.path.join(self.dirpath, "array.txt"), array, label="label\n"
+        )
+        self.assertEqual(self.read("array.txt"), expected.replace(",2\n", ",2.0\n"))
+
+        with self.assertRaises(split.SplitError):
+            split.create_file(os.path.join(self.dirpath, "list.txt"), data)
+
+    def test_fmt(self):
+        data = np.arange(6, dtype=np.float64).reshape(3, 2)
+        split.create_file(
+            os.path.join(self.dirpath, "dir", "fmt.txt"), data, fmt="%.2f", chunk_rows=2
+        )
+        self.assertEqual(os.listdir(self.dirpath), ["dir"])
+        self.assertEqual(
+            self.read(os.path.join("dir", "fmt.txt")),
+            "0.00,1.00\n2.00,3.00\n4.00,5.00\n",
+        )
+
+
+class TestTMRSplit(unittest.TestCase):
+    def setUp(self):
+        self.dirpath = tempfile.mkdtemp()
+        data = make_temperature_data(4000, 3)
+        frequency = 10 ** (3 + (np.arange(len(data)) % 4) * 0.5)
+        data = np.column_stack([data, frequency])
+        self.filepath = os.path.join(self.dirpath, "tmr.txt")
+        split.create_file(self.filepath, data, label="0:time,  1:T,  2:f\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.dirpath)
+
+    def run_split(self, name, **kwargs):
+        split.TMR_split(
+            self.filepath,
+            T_index=1,
+            f_index=2,
+            freq_num=4,
+            sample_and_cutout_num=(50, 30),
+            step=5,
+            name_temperaturesplitfolder=name,
+            name_frequencesplitfile=name,
+            **kwargs,
+        )
+        files = {}
+        for root, _, filenames in os.walk(self.dirpath):
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                if name in path:
+                    with open(path, "r", encoding="utf-8") as f:
+                        files[path.replace(name, "")] = f.read()
+        return files
+
+    def test_parallel(self):
+        # 並列に作成しても順番に作成したときと同じファイルができる
+        expected = self.run_split("serial")
+        self.assertGreater(len(expected), 5)
+        self.assertEqual(self.run_split("thread", workers=4), expected)
+        self.assertEqual(
+            self.run_split("process", workers=2, use_process=True), expected
+        )
+
+    def test_duplicate(self):
+        with self.assertRaises(split.SplitError):
+            split.create_files([("a.txt", [[1]]), ("a.txt", [[2]])], workers=2)
+
+
+class TestOnlineTMRSplitter(unittest.TestCase):
+    def setUp(self):
+        self.dirpath = tempfile.mkdtemp()
+        self.filepath = os.path.join(self.dirpath, "tmr.txt")
+        self.args = dict(
+            T_index=1, f_index=2, freq_num=4, sample_and_cutout_num=(50, 30), step=5
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.dirpath)
+
+    def make_data(self, rows, seed, noise=0.05):
+        data = make_temperature_data(rows, seed, noise)
+        frequency = 10 ** (3 + (np.arange(len(data)) % 4) * 0.5)
+        return np.column_stack([data, frequency])
+
+    def make_text(self, data):
+        # 測定の途中と最後(endの中でのsaveなど)にもラベルの行を入れる
+        lines = [",".join(map(str, row)) + "\n" for row in data.tolist()]
+        half = len(lines) // 2
+        return (
+            "0:time,  1:T,  2:f\n"
+            + "".join(lines[:half])
+            + "mid\n"
+            + "".join(lines[half:])
+            + "fin\n"
+        )
+
+    def read_files(self, name):
+        files = {}
+        for root, _, filenames in os.walk(self.dirpath):
+            for filename in filenames:
+                if filename.startswith(name):
+                    path = os.path.join(root, filename)
+                    with open(path, "r", encoding="utf-8") as f:
+                        files[os.path.relpath(path, self.dirpath).replace(name, "")] = (
+                            f.read()
+                        )
+        return files
+
+    def run_online(self, text, name, **kwargs):
+        splitter = split.OnlineTMRSplitter(
+            self.filepath,
+            name_temperaturesplitfolder=name,
+            name_frequencesplitfile=name,
+            **self.args,
+            **kwargs,
+        )
+        for line in text.splitlines(keepends=True):
+            splitter.feed_text(line)
+        splitter.close()
+        return self.read_files(name)
+
+    def test_same_as_TMR_split(self):
+        # 1行ずつ渡してもTMR_splitで後から分割したときと同じファイルができる
+        # ノイズが大きいと判定の向きと最初と最後の温度の差の向きが食い違う範囲ができる
+        for seed, rows, threshold, noise in product(
+            range(4), (40, 3000), (0, 0.05), (0.05, 1.0)
+        ):
+            text = self.make_text(self.make_data(rows, seed, noise))
+            with open(self.filepath, "w", encoding="utf-8") as f:
+                f.write(text)
+            name = f"{seed}_{rows}_{threshold}_{noise}_"
+            split.TMR_split(
+                self.filepath,
+                name_temperaturesplitfolder="offline" + name,
+                name_frequencesplitfile="offline" + name,
+                threshold=threshold,
+                **self.args,
+            )
+            expected = self.read_files("offline" + name)
+            self.assertGreater(len(expected), 0)
+            online = self.run_online(text, "online" + name, threshold=threshold)
+            self.assertEqual(online, expected)
+            os.remove(self.filepath)
+
+    def test_blank_line(self):
+        # file_openと同じく空白だけの行より後ろは分割しない
+        data = self.make_data(3000, 1)
+        lines = [",".join(map(str, row)) + "\n" for row in data.tolist()]
+        text = (
+            "0:time,  1:T,  2:f\n"
+            + "".join(lines[:1500])
+            + "\n"
+            + "".join(lines[1500:])
+        )
+        with open(self.filepath, "w", encoding="utf-8") as f:
+            f.write(text)
+        split.TMR_split(
+            self.filepath,
+            name_temperaturesplitfolder="offline",
+            name_frequencesplitfile="offline",
+            **self.args,
+        )
+        expected = self.read_files("offline")
+        self.assertGreater(len(expected), 0)
+
+        splitter = split.OnlineTMRSplitter(
+            self.filepath,
+            name_temperaturesplitfolder="online",
+            name_frequencesplitfile="online",
+            **self.args,
+        )
+        for line in text.splitlines(keepends=True):
+            splitter.feed_text(line)
+        splitter.close()
+        self.assertEqual(self.read_files("online"), expected)
+
+    def test_error_does_not_raise(self):
+        # 分割に失敗しても測定を止めないように例外は投げない
+        text = self.make_text(self.make_data(3000, 0))
+        self.run_online(text, "dup")
+        with self.assertLogs("split", level="ERROR"):
+            files = self.run_online(text, "dup")
+        self.assertGreater(len(files), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,19 +1,23 @@
 """その他諸々の便利関数"""
 import datetime
-import tkinter.filedialog as tkfd
 from pathlib import Path
-from tkinter import Tk
+from typing import Optional
 
 from chardet.universaldetector import UniversalDetector
 
 
-def get_encode_type(path: str) -> str:
-    """テキストファイルの文字コードを判別する. ほぼコピペ"""
+def get_encode_type(path: str, max_bytes: Optional[int] = None) -> str:
+    """テキストファイルの文字コードを判別する. ほぼコピペ
+
+    max_bytesを指定したときはファイルの先頭からその分だけを見て判別する
+    """
     detector = UniversalDetector()
+    read_bytes = 0
     with open(path, mode="rb") as f:
         for binary in f:
             detector.feed(binary)
-            if detector.done:
+            read_bytes += len(binary)
+            if detector.done or (max_bytes is not None and read_bytes >= max_bytes):
                 break
     detector.close()
     encode_type = detector.result["encoding"]
@@ -36,6 +40,10 @@ def get_encode_type(path: str) -> str:
 
 def ask_open_filename(filetypes=None, title=None, initialdir=None, initialfile=None):
     """ファイル選択ダイアログをつくってファイルを返す関数"""
+    # ダイアログを使わないとき(--headless)はtkinterがなくても動くようにここで読み込む
+    import tkinter.filedialog as tkfd
+    from tkinter import Tk
+
     tk = Tk()
 
     # ファイルダイアログでファイルを取得
@@ -54,6 +62,9 @@ def ask_open_filename(filetypes=None, title=None, initialdir=None, initialfile=N
 
 def ask_save_filename(filetypes=None, title=None, initialdir=None, initialfile=None,defaultextension=None):
     """ファイル選択ダイアログをつくってファイルを返す関数"""
+    import tkinter.filedialog as tkfd
+    from tkinter import Tk
+
     tk = Tk()
 
     # ファイルダイアログでファイルを取得